@@ -1,99 +1,286 @@
+from dataclasses import dataclass
+from typing import Literal
+
 import numpy as np
 import pandas as pd
 from cointegration import BestPair
+from costs import CostModel, PairCosts, cost_returns, pair_costs
+from hedge import SpreadModel
+from metrics import batch_metrics, infer_bars_per_year
+from signals import position_kernel, replay, rolling_zscores
+
 
+@dataclass
+class GridBacktestResult:
+    windows: np.ndarray
+    zscore_mults: np.ndarray
+    metrics: dict[str, np.ndarray]
 
-def backtest(best_pair: BestPair, zscore_mult: float) -> pd.DataFrame:
-    df = pd.DataFrame(
-        {
-            "S1": best_pair.series1,
-            "S2": best_pair.series2,
-            "spread": best_pair.spread,
-            "zscore": best_pair.zscore,
+    def best(self, metric: str = "Sharpe Ratio") -> dict[str, float]:
+        values = np.where(
+            np.isfinite(self.metrics[metric]), self.metrics[metric], -np.inf
+        )
+        i, j = np.unravel_index(np.argmax(values), values.shape)
+        return {
+            "window": int(self.windows[i]),
+            "zscore_mult": float(self.zscore_mults[j]),
+            metric: float(self.metrics[metric][i, j]),
         }
-    ).dropna()
-
-    pos_s1 = np.zeros(len(df))
-    pos_s2 = np.zeros(len(df))
-    current_pos_s1 = 0
-    current_pos_s2 = 0
-
-    zscores = df["zscore"].values
-
-    for i in range(len(df)):
-        z = zscores[i]
-
-        # Cierre de posiciones al cruzar la media (zscore = 0)
-        # Si venimos de un spread alto (S1 en corto) y el zscore baja de 0 (o lo toca)
-        if current_pos_s1 == -1 and z <= 0:
-            current_pos_s1 = 0
-            current_pos_s2 = 0
-        # Si venimos de un spread bajo (S1 en largo) y el zscore sube de 0 (o lo toca)
-        elif current_pos_s1 == 1 and z >= 0:
-            current_pos_s1 = 0
-            current_pos_s2 = 0
-
-        # Entradas (reversión a la media)
-        if z > zscore_mult:
-            # Spread (S1 - S2) es muy alto. Esperamos que baje.
-            # Corto en S1, Largo en S2
-            current_pos_s1 = -1
-            current_pos_s2 = 1
-        elif z < -zscore_mult:
-            # Spread es muy bajo. Esperamos que suba.
-            # Largo en S1, Corto en S2
-            current_pos_s1 = 1
-            current_pos_s2 = -1
-
-        pos_s1[i] = current_pos_s1
-        pos_s2[i] = current_pos_s2
+
+    def to_frame(self) -> pd.DataFrame:
+        index = pd.MultiIndex.from_product(
+            [self.windows, self.zscore_mults], names=["window", "zscore_mult"]
+        )
+        return pd.DataFrame(
+            {name: values.ravel() for name, values in self.metrics.items()},
+            index=index,
+        )
+
+
+def backtest(
+    best_pair: BestPair, zscore_mult: float, costs: CostModel | None = None
+) -> pd.DataFrame:
+    columns = {
+        "S1": best_pair.series1,
+        "S2": best_pair.series2,
+        "spread": best_pair.spread,
+        "zscore": best_pair.zscore,
+    }
+    if best_pair.hedge_ratio is not None:
+        columns["hedge_ratio"] = best_pair.hedge_ratio
+    df = pd.DataFrame(columns).dropna()
+
+    zscores = df["zscore"].to_numpy(dtype=np.float64)
+    if costs is not None:
+        costs = costs.for_pair(best_pair.name1, best_pair.name2, df.index)
+    return _simulate(df, position_kernel(zscores, zscore_mult), costs)
+
+
+def replay_backtest(
+    series1: pd.Series,
+    series2: pd.Series,
+    window: int,
+    zscore_mult: float,
+    spread_model: SpreadModel | None = None,
+    mode: Literal["fast", "exact"] = "fast",
+    costs: CostModel | None = None,
+) -> pd.DataFrame:
+    # Backtest con el motor de señales del bot en vivo (signals.replay): con
+    # mode="exact" el histórico pasa vela a vela por el mismo estado que usa
+    # live_strategy. Mismas columnas que backtest()
+    signals = replay(series1, series2, window, zscore_mult, spread_model, mode)
+
+    columns = {
+        "S1": series1,
+        "S2": series2,
+        "spread": signals["spread"],
+        "zscore": signals["zscore"],
+    }
+    if spread_model is not None and spread_model.method != "diff":
+        columns["hedge_ratio"] = signals["hedge_ratio"]
+    df = pd.DataFrame(columns)
+
+    # Igual que en backtest(), la muestra empieza con el primer z-score
+    valid = df["zscore"].notna().to_numpy()
+    first = int(np.argmax(valid)) if valid.any() else len(df)
+    df = df.iloc[first:].copy()
+    if costs is not None:
+        costs = costs.for_pair(str(series1.name), str(series2.name), df.index)
+    return _simulate(df, signals["position"].to_numpy()[first:], costs)
+
+
+def _simulate(
+    df: pd.DataFrame, pos_s1: np.ndarray, costs: PairCosts | None = None
+) -> pd.DataFrame:
+    s1 = df["S1"].to_numpy(dtype=np.float64)
+    s2 = df["S2"].to_numpy(dtype=np.float64)
+
+    if "hedge_ratio" not in df:
+        pos_s2 = 0.0 - pos_s1
+    else:
+        pos_s2 = hedge_positions(pos_s1, df["hedge_ratio"].to_numpy(), s1, s2)
+    ret_s1 = pct_change(s1)
+    ret_s2 = pct_change(s2)
+    strategy_ret = strategy_returns(pos_s1, pos_s2, ret_s1, ret_s2)
 
     df["position_s1"] = pos_s1
     df["position_s2"] = pos_s2
+    df["ret_s1"] = ret_s1
+    df["ret_s2"] = ret_s2
+    if costs is None:
+        df["strategy_ret"] = strategy_ret
+        df["equity"] = equity_curve(strategy_ret)
+        return df
 
-    # Cálculos de retorno
-    df["ret_s1"] = df["S1"].pct_change()
-    df["ret_s2"] = df["S2"].pct_change()
+    # Con costes, strategy_ret y equity son netos y se guardan también los
+    # brutos para comparar en performance_metrics
+    cost = cost_returns(pos_s1, pos_s2, costs)
+    df["gross_ret"] = strategy_ret
+    df["costs"] = cost
+    df["strategy_ret"] = np.nan_to_num(strategy_ret) - cost
+    df["gross_equity"] = equity_curve(strategy_ret)
+    df["equity"] = equity_curve(df["strategy_ret"].to_numpy())
 
-    # Se aplica un shift de 1 porque operamos en la vela siguiente a la señal
-    ret_pos_s1 = df["position_s1"].shift(1) * df["ret_s1"]
-    ret_pos_s2 = df["position_s2"].shift(1) * df["ret_s2"]
+    return df
 
-    df["strategy_ret"] = ret_pos_s1 + ret_pos_s2
-    df["equity"] = (1 + df["strategy_ret"].fillna(0)).cumprod()
 
-    return df
+def hedge_positions(
+    pos_s1: np.ndarray, hedge_ratio: np.ndarray, s1: np.ndarray, s2: np.ndarray
+) -> np.ndarray:
+    # Peso de S2 por unidad de nocional en S1: beta unidades de S2 por cada
+    # unidad de S1, es decir, un nocional beta * S2 / S1
+    return 0.0 - pos_s1 * (hedge_ratio * s2 / s1)
 
 
-def performance_metrics(df: pd.DataFrame) -> pd.DataFrame:
-    # Frecuencia asumida: 1 minuto (basado en el timeframe de 1m usado)
-    minutes_per_year = 365 * 24 * 60
+def grid_backtest(
+    series1: pd.Series | np.ndarray,
+    series2: pd.Series | np.ndarray,
+    windows: np.ndarray | list[int],
+    zscore_mults: np.ndarray | list[float],
+    max_cells: int = 4_000_000,
+    spread_model: SpreadModel | None = None,
+    costs: CostModel | PairCosts | None = None,
+    bars_per_year: float | None = None,
+) -> GridBacktestResult:
+    # Evalúa todas las combinaciones (window, zscore_mult) de una vez: los
+    # z-scores de todas las ventanas se calculan como una matriz 2-D y la
+    # máquina de estados se resuelve por lotes de ventanas x umbrales.
+    # Equivale a backtest() + performance_metrics() por combinación, salvo
+    # diferencias de redondeo (~1e-9) en el z-score rodante. Con costs, las
+    # métricas son netas de comisiones, slippage y funding.
+    costs = pair_costs(costs, series1, series2)
+    if bars_per_year is None:
+        bars_per_year = infer_bars_per_year(getattr(series1, "index", None))
+    windows = np.asarray(windows, dtype=np.int64)
+    zscore_mults = np.asarray(zscore_mults, dtype=np.float64)
 
-    total_return = df["equity"].iloc[-1] - 1.0
+    s1 = np.asarray(series1, dtype=np.float64)
+    s2 = np.asarray(series2, dtype=np.float64)
+    zscores, notional, warmup = zscore_grid(s1, s2, windows, spread_model)
+    metrics = zscore_grid_metrics(
+        zscores,
+        zscore_mults,
+        pct_change(s1),
+        pct_change(s2),
+        notional,
+        warmup + windows - 1,
+        costs,
+        bars_per_year,
+        max_cells,
+    )
+    return GridBacktestResult(windows, zscore_mults, metrics)
 
-    # Retorno Anualizado (CAGR)
-    years = len(df) / minutes_per_year
-    annualized_return = (1 + total_return) ** (1 / years) - 1.0 if years > 0 else 0.0
 
-    # Volatilidad anualizada
-    returns = df["strategy_ret"].fillna(0)
-    annualized_vol = returns.std() * np.sqrt(minutes_per_year)
+def zscore_grid(
+    s1: np.ndarray,
+    s2: np.ndarray,
+    windows: np.ndarray,
+    spread_model: SpreadModel | None = None,
+) -> tuple[np.ndarray, np.ndarray | None, int]:
+    # Z-scores de todas las ventanas (ventanas x velas), nocional de S2 por
+    # unidad de S1 (None con beta = 1) y velas de calentamiento del hedge.
+    # El spread (y su beta) no depende de la ventana ni del umbral: se
+    # construye una vez. Las velas de calentamiento del hedge (spread NaN)
+    # se descartan como las de la ventana del z-score
+    if spread_model is None or spread_model.method == "diff":
+        spread, notional = s1 - s2, None
+        warmup = 0
+    else:
+        spread, hedge_ratio = spread_model.fit(s1, s2)
+        notional = hedge_ratio * s2 / s1
+        warmup = int(np.argmax(~np.isnan(spread)))
+    zscores = np.full((len(windows), len(s1)), np.nan)
+    zscores[:, warmup:] = rolling_zscores(spread[warmup:], windows)
+    return zscores, notional, warmup
 
-    # Ratio de Sharpe (Asumiendo tasa libre de riesgo = 0)
-    sharpe_ratio = annualized_return / annualized_vol if annualized_vol != 0 else 0.0
 
-    # Maximum Drawdown (Caída máxima)
-    cummax = df["equity"].cummax()
-    drawdown = (df["equity"] - cummax) / cummax
-    max_drawdown = drawdown.min()
+def zscore_grid_metrics(
+    zscores: np.ndarray,
+    zscore_mults: np.ndarray,
+    ret_s1: np.ndarray,
+    ret_s2: np.ndarray,
+    notional: np.ndarray | None,
+    first_bar: np.ndarray,
+    costs: PairCosts | None,
+    bars_per_year: float,
+    max_cells: int = 4_000_000,
+) -> dict[str, np.ndarray]:
+    # Métricas (ventanas x umbrales) a partir de los z-scores ya calculados;
+    # la máquina de estados se resuelve por lotes de ventanas x umbrales.
+    # first_bar: primera vela con z-score de cada ventana
+    n_bars = zscores.shape[-1]
+    metrics: dict[str, np.ndarray] = {}
+
+    chunk = max(1, max_cells // max(1, len(zscore_mults) * n_bars))
+    for start in range(0, len(zscores), chunk):
+        rows = slice(start, start + chunk)
+        pos_s1 = position_kernel(zscores[rows, None, :], zscore_mults[None, :])
+        pos_s2 = 0.0 - pos_s1 if notional is None else 0.0 - pos_s1 * notional
+        strategy_ret = strategy_returns(pos_s1, pos_s2, ret_s1, ret_s2)
+        if costs is not None:
+            strategy_ret -= cost_returns(pos_s1, pos_s2, costs)
+
+        # Antes de completar la ventana no hay z-score ni posición: esas velas
+        # quedan fuera de la muestra, igual que con el dropna de backtest()
+        valid = np.arange(n_bars) >= first_bar[rows, None, None]
+        strategy_ret = np.where(valid & ~np.isnan(strategy_ret), strategy_ret, 0.0)
+
+        chunk_metrics = batch_metrics(strategy_ret, bars_per_year, pos_s1, valid)
+        for name, values in chunk_metrics.items():
+            if name not in metrics:
+                metrics[name] = np.empty((len(zscores), len(zscore_mults)))
+            metrics[name][rows] = values
+    return metrics
+
+
+def pct_change(prices: np.ndarray) -> np.ndarray:
+    ret = np.empty_like(prices)
+    ret[..., 0] = np.nan
+    ret[..., 1:] = prices[..., 1:] / prices[..., :-1] - 1
+    return ret
+
+
+def strategy_returns(
+    pos_s1: np.ndarray, pos_s2: np.ndarray, ret_s1: np.ndarray, ret_s2: np.ndarray
+) -> np.ndarray:
+    # Se aplica un shift de 1 porque operamos en la vela siguiente a la señal
+    strategy_ret = np.empty(np.broadcast_shapes(pos_s1.shape, ret_s1.shape))
+    strategy_ret[..., 0] = np.nan
+    strategy_ret[..., 1:] = (
+        pos_s1[..., :-1] * ret_s1[..., 1:] + pos_s2[..., :-1] * ret_s2[..., 1:]
+    )
+    return strategy_ret
+
+
+def equity_curve(strategy_ret: np.ndarray) -> np.ndarray:
+    return np.cumprod(1 + np.where(np.isnan(strategy_ret), 0.0, strategy_ret), axis=-1)
+
+
+def performance_metrics(
+    df: pd.DataFrame, bars_per_year: float | None = None
+) -> pd.DataFrame:
+    # Anualización con la frecuencia de las velas del índice (15m por defecto)
+    if bars_per_year is None:
+        bars_per_year = infer_bars_per_year(df.index)
+
+    positions = df["position_s1"] if "position_s1" in df else None
+    metrics = {"Strategy": _frame_metrics(df["strategy_ret"], positions, bars_per_year)}
+
+    # Backtest con costes: "Strategy" es la curva neta y "Gross" la bruta
+    if "gross_ret" in df:
+        metrics["Gross"] = _frame_metrics(df["gross_ret"], positions, bars_per_year)
+        metrics["Strategy"]["Costs (%)"] = df["costs"].sum() * 100
+        metrics["Gross"]["Costs (%)"] = 0.0
+
+    return pd.DataFrame(metrics)
 
-    metrics = {
-        "Total Return (%)": total_return * 100,
-        "Annualized Return (%)": annualized_return * 100,
-        "Annualized Volatility (%)": annualized_vol * 100,
-        "Sharpe Ratio": sharpe_ratio,
-        "Max Drawdown (%)": max_drawdown * 100,
-    }
 
-    # Retornarlo como dataframe, traspuesto para mejor lectura si hay múltiples columnas luego
-    return pd.DataFrame(metrics, index=["Strategy"]).T
+def _frame_metrics(
+    strategy_ret: pd.Series, positions: pd.Series | None, bars_per_year: float
+) -> dict[str, float]:
+    metrics = batch_metrics(
+        strategy_ret.to_numpy(dtype=np.float64),
+        bars_per_year,
+        positions=None if positions is None else positions.to_numpy(dtype=np.float64),
+    )
+    return {name: float(value) for name, value in metrics.items()}
@@ -0,0 +1,672 @@
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from statsmodels.tsa.stattools import coint
+
+from backtest import (
+    backtest,
+    grid_backtest,
+    performance_metrics,
+    position_kernel,
+    replay_backtest,
+)
+from cointegration import (
+    BestPair,
+    PairScreen,
+    WalkForwardCointegration,
+    cointegration_test,
+)
+from costs import CostModel
+from data.frame_io import read_frame, write_frame
+from data.price_matrix import PriceMatrix
+from hedge import SpreadModel
+from metrics import StreamingMetrics, batch_metrics
+from optimize import walk_forward_optimization
+from portfolio import PortfolioPair, portfolio_backtest
+from signals import replay
+from tests.helpers import loop_positions, synthetic_prices
+
+
+def bench_cointegration(
+    sizes: tuple[int, ...] = (10, 50, 200),
+    n_bars: int = 2880,
+    n_jobs: int = 4,
+    max_reference_pairs: int = 300,
+):
+    print(f"Cointegración: {n_bars} velas, motor serie (statsmodels) vs vectorizado")
+    rng = np.random.default_rng(1)
+
+    for n_symbols in sizes:
+        df = synthetic_prices(n_symbols, n_bars)
+        idx_i, idx_j = np.triu_indices(n_symbols, k=1)
+        n_pairs = len(idx_i)
+
+        start = time.perf_counter()
+        result = cointegration_test(df, engine="vectorized")
+        t_vectorized = time.perf_counter() - start
+
+        start = time.perf_counter()
+        cointegration_test(df, engine="vectorized", n_jobs=n_jobs)
+        t_parallel = time.perf_counter() - start
+
+        # En universos grandes statsmodels tarda demasiado: se mide una muestra
+        # de pares y se extrapola al total
+        sample = rng.choice(
+            n_pairs, size=min(n_pairs, max_reference_pairs), replace=False
+        )
+        max_pvalue_diff = 0.0
+        start = time.perf_counter()
+        for k in sample:
+            i, j = idx_i[k], idx_j[k]
+            _, pvalue, _ = coint(df.iloc[:, i], df.iloc[:, j])
+            max_pvalue_diff = max(
+                max_pvalue_diff, abs(pvalue - result.pvalue_matrix[i, j])
+            )
+        t_serial = (time.perf_counter() - start) * n_pairs / len(sample)
+        estimated = " (estimado)" if len(sample) < n_pairs else ""
+
+        print(
+            f"  {n_symbols:>4} símbolos / {n_pairs:>6} pares | "
+            f"statsmodels: {t_serial:8.2f}s{estimated} | "
+            f"vectorizado: {t_vectorized:7.2f}s | "
+            f"vectorizado x{n_jobs}: {t_parallel:7.2f}s | "
+            f"speedup: {t_serial / t_vectorized:6.1f}x | "
+            f"máx |Δp|: {max_pvalue_diff:.2e}"
+        )
+
+
+def bench_screen(
+    n_symbols: int = 37,
+    n_bars: int = 2880,
+    screen: PairScreen | None = None,
+    max_reference_pairs: int = 50,
+):
+    if screen is None:
+        screen = PairScreen(min_correlation=0.5, top_k=100)
+    n_pairs = n_symbols * (n_symbols - 1) // 2
+    print(f"Filtro previo: {n_symbols} símbolos / {n_pairs} pares, {screen}")
+    df = synthetic_prices(n_symbols, n_bars)
+
+    # Referencia: statsmodels sobre todos los pares (estimado con una muestra)
+    rng = np.random.default_rng(2)
+    idx_i, idx_j = np.triu_indices(n_symbols, k=1)
+    sample = rng.choice(n_pairs, size=min(n_pairs, max_reference_pairs), replace=False)
+    start = time.perf_counter()
+    for k in sample:
+        coint(df.iloc[:, idx_i[k]], df.iloc[:, idx_j[k]])
+    t_full = (time.perf_counter() - start) * n_pairs / len(sample)
+
+    start = time.perf_counter()
+    screened = cointegration_test(df, screen=screen)
+    t_screened = time.perf_counter() - start
+
+    # Pares cointegrados que el filtro deja fuera
+    expected = set(cointegration_test(df, engine="vectorized").pairs)
+    found = expected & set(screened.pairs)
+    print(
+        f"  statsmodels todos: {t_full:.2f}s (estimado) | con filtro: {t_screened:.2f}s | "
+        f"speedup: {t_full / t_screened:.1f}x | "
+        f"pares cointegrados encontrados: {len(found)}/{len(expected)}"
+    )
+
+
+def bench_backtest_kernel(
+    n_bars: int = 1_000_000, window: int = 36, zscore_mult: float = 1.6
+):
+    print(f"Backtest: máquina de estados de posiciones sobre {n_bars} velas")
+    df = synthetic_prices(2, n_bars)
+    s1, s2 = df.iloc[:, 0], df.iloc[:, 1]
+    spread = s1 - s2
+    zscore = (
+        (spread - spread.rolling(window).mean()) / spread.rolling(window).std()
+    ).dropna()
+    zscores = zscore.to_numpy()
+
+    start = time.perf_counter()
+    expected = loop_positions(zscores, zscore_mult)
+    t_loop = time.perf_counter() - start
+
+    start = time.perf_counter()
+    positions = position_kernel(zscores, zscore_mult)
+    t_kernel = time.perf_counter() - start
+
+    best_pair = BestPair(str(s1.name), str(s2.name), s1, s2, spread, zscore)
+    start = time.perf_counter()
+    backtest(best_pair, zscore_mult)
+    t_backtest = time.perf_counter() - start
+
+    print(
+        f"  bucle Python: {t_loop:.3f}s | kernel NumPy: {t_kernel:.3f}s | "
+        f"speedup: {t_loop / t_kernel:.1f}x | idénticas: {np.array_equal(expected, positions)} | "
+        f"backtest completo: {t_backtest:.3f}s"
+    )
+
+
+def bench_replay(
+    n_bars: int = 2_000_000,
+    exact_bars: int = 200_000,
+    window: int = 36,
+    zscore_mult: float = 1.6,
+):
+    print(
+        f"Replay del motor de señales: {n_bars} velas (fast), "
+        f"{exact_bars} vela a vela (exact)"
+    )
+    df = synthetic_prices(2, n_bars)
+    s1, s2 = df.iloc[:, 0], df.iloc[:, 1]
+
+    for model in (None, SpreadModel("rolling_ols", window=500)):
+        name = "diff" if model is None else model.method
+
+        start = time.perf_counter()
+        fast = replay(s1, s2, window, zscore_mult, model, "fast")
+        t_fast = time.perf_counter() - start
+
+        start = time.perf_counter()
+        exact = replay(
+            s1.iloc[:exact_bars],
+            s2.iloc[:exact_bars],
+            window,
+            zscore_mult,
+            model,
+            "exact",
+        )
+        t_exact = time.perf_counter() - start
+
+        # El modo rápido debe tomar las mismas decisiones que el bot en vivo
+        same = np.array_equal(
+            exact["position"].to_numpy(), fast["position"].to_numpy()[:exact_bars]
+        )
+        print(
+            f"  {name:<12} fast: {n_bars / t_fast / 1e6:5.1f}M velas/s | exact: "
+            f"{exact_bars / t_exact / 1e3:5.0f}k velas/s | "
+            f"mismas posiciones: {same}"
+        )
+
+
+def bench_hedge(n_bars: int = 1_000_000, window: int = 500):
+    print(f"Hedge ratio: {n_bars} velas, kernels por lotes vs vela a vela")
+    df = synthetic_prices(2, n_bars)
+    s1, s2 = df.iloc[:, 0].to_numpy(), df.iloc[:, 1].to_numpy()
+
+    for method in ("rolling_ols", "kalman"):
+        model = SpreadModel(method, window=window)
+
+        start = time.perf_counter()
+        spread, _ = model.fit(s1, s2)
+        t_batch = time.perf_counter() - start
+
+        online = model.online()
+        start = time.perf_counter()
+        for y, x in zip(s1.tolist(), s2.tolist()):
+            online.update(y, x)
+        t_online = time.perf_counter() - start
+
+        print(
+            f"  {method:<12} lote: {t_batch:.3f}s | vela a vela: "
+            f"{t_online / n_bars * 1e6:.2f} µs/vela ({t_online:.2f}s)"
+        )
+
+
+def bench_grid_backtest(
+    n_bars: int = 2880, max_reference_combos: int = 100, seed: int = 0
+):
+    windows = np.arange(10, 101)
+    zscore_mults = np.round(np.arange(1.0, 3.55, 0.05), 2)
+    n_combos = len(windows) * len(zscore_mults)
+    print(f"Barrido de parámetros: {n_combos} combinaciones sobre {n_bars} velas")
+
+    df = synthetic_prices(2, n_bars)
+    s1, s2 = df.iloc[:, 0], df.iloc[:, 1]
+    spread = s1 - s2
+
+    start = time.perf_counter()
+    grid_backtest(s1, s2, windows, zscore_mults)
+    t_grid = time.perf_counter() - start
+
+    # Referencia: una llamada a backtest + performance_metrics por combinación
+    rng = np.random.default_rng(seed)
+    sample = rng.choice(
+        n_combos, size=min(n_combos, max_reference_combos), replace=False
+    )
+    start = time.perf_counter()
+    for k in sample:
+        window = windows[k // len(zscore_mults)]
+        zscore = (spread - spread.rolling(window).mean()) / spread.rolling(window).std()
+        best_pair = BestPair("S1", "S2", s1, s2, spread, zscore.dropna())
+        performance_metrics(backtest(best_pair, zscore_mults[k % len(zscore_mults)]))
+    t_single = (time.perf_counter() - start) * n_combos / len(sample)
+
+    print(
+        f"  una a una: {t_single:.2f}s (estimado) | grid_backtest: {t_grid:.2f}s | "
+        f"speedup: {t_single / t_grid:.1f}x"
+    )
+
+
+def bench_costs(n_bars: int = 2880, backtest_bars: int = 1_000_000):
+    windows = np.arange(10, 101)
+    zscore_mults = np.round(np.arange(1.0, 3.55, 0.05), 2)
+    print(
+        f"Costes: rejilla de {len(windows) * len(zscore_mults)} combinaciones "
+        f"sobre {n_bars} velas y backtest de {backtest_bars} velas"
+    )
+    df = synthetic_prices(2, max(n_bars, backtest_bars))
+    s1, s2 = df.iloc[:n_bars, 0], df.iloc[:n_bars, 1]
+
+    # Funding cada 8 h de ±1 pb y slippage distinto en cada pata
+    funding_index = pd.date_range(df.index[0], df.index[-1], freq="8h")
+    costs = CostModel(
+        slippage_bps=2.0,
+        symbol_slippage_bps={str(s2.name): 5.0},
+        funding_rates={
+            str(s1.name): pd.Series(1e-4, index=funding_index),
+            str(s2.name): pd.Series(-1e-4, index=funding_index),
+        },
+    )
+
+    start = time.perf_counter()
+    gross = grid_backtest(s1, s2, windows, zscore_mults)
+    t_gross = time.perf_counter() - start
+    start = time.perf_counter()
+    net = grid_backtest(s1, s2, windows, zscore_mults, costs=costs)
+    t_net = time.perf_counter() - start
+
+    best_gross, best_net = gross.best(), net.best()
+    print(
+        f"  rejilla bruta: {t_gross:.2f}s | neta: {t_net:.2f}s "
+        f"(+{t_net / t_gross - 1:.0%})"
+    )
+    print(
+        f"  mejor bruto: window={best_gross['window']} "
+        f"z={best_gross['zscore_mult']} | mejor neto: window={best_net['window']} "
+        f"z={best_net['zscore_mult']}"
+    )
+
+    s1, s2 = df.iloc[:, 0], df.iloc[:, 1]
+    spread = s1 - s2
+    zscore = (spread - spread.rolling(36).mean()) / spread.rolling(36).std()
+    best_pair = BestPair(str(s1.name), str(s2.name), s1, s2, spread, zscore)
+    start = time.perf_counter()
+    backtest(best_pair, 1.6)
+    t_gross = time.perf_counter() - start
+    start = time.perf_counter()
+    df_net = backtest(best_pair, 1.6, costs=costs)
+    t_net = time.perf_counter() - start
+    trades = int(np.count_nonzero(np.diff(df_net["position_s1"].to_numpy())))
+    print(
+        f"  backtest: bruto {t_gross:.3f}s | neto {t_net:.3f}s | {trades} cambios "
+        f"de posición, costes {df_net['costs'].sum():.1%} del capital"
+    )
+
+
+def bench_metrics(
+    n_bars: int = 1_000_000, n_curves: int = 4641, curve_bars: int = 2880
+):
+    print(
+        f"Métricas: {n_bars} velas (lote y streaming) y rejilla de "
+        f"{n_curves} curvas x {curve_bars} velas"
+    )
+    rng = np.random.default_rng(0)
+    bars_per_year = 365 * 96
+    positions = np.repeat(rng.integers(-1, 2, size=n_bars // 20), 20).astype(float)
+    strategy_ret = rng.normal(scale=1e-3, size=n_bars) * (positions != 0)
+
+    start = time.perf_counter()
+    batch = batch_metrics(strategy_ret, bars_per_year, positions)
+    t_batch = time.perf_counter() - start
+
+    streaming = StreamingMetrics(bars_per_year)
+    start = time.perf_counter()
+    for k in range(0, n_bars, 96):
+        streaming.update(strategy_ret[k : k + 96], positions[k : k + 96])
+    result = streaming.result()
+    t_stream = time.perf_counter() - start
+    same = all(
+        np.isclose(result[name], batch[name], rtol=1e-9, equal_nan=True)
+        for name in batch
+    )
+    print(
+        f"  lote: {t_batch * 1000:.0f} ms | streaming por días (96 velas): "
+        f"{t_stream * 1000:.0f} ms | iguales: {same}"
+    )
+
+    curves = rng.normal(scale=1e-3, size=(n_curves, curve_bars))
+    curve_positions = np.sign(rng.normal(size=(n_curves, curve_bars)))
+    start = time.perf_counter()
+    batch_metrics(curves, bars_per_year, curve_positions)
+    t_grid = time.perf_counter() - start
+
+    index = pd.date_range("2025-01-01", periods=curve_bars, freq="15min")
+    sample = 50
+    start = time.perf_counter()
+    for k in range(sample):
+        performance_metrics(
+            pd.DataFrame(
+                {"strategy_ret": curves[k], "position_s1": curve_positions[k]},
+                index=index,
+            )
+        )
+    t_single = (time.perf_counter() - start) * n_curves / sample
+    print(
+        f"  rejilla por lotes: {t_grid:.2f}s | una a una: {t_single:.2f}s "
+        f"(estimado) | speedup: {t_single / t_grid:.1f}x"
+    )
+
+
+def bench_portfolio(
+    n_symbols: int = 100, n_pairs: int = 200, n_bars: int = 35_040, sample: int = 10
+):
+    print(
+        f"Cartera: {n_pairs} pares de {n_symbols} símbolos x {n_bars} velas "
+        f"(1 año de velas de 15m)"
+    )
+    df = synthetic_prices(n_symbols, n_bars)
+    matrix = PriceMatrix.from_frame(df, np.float32)
+    rng = np.random.default_rng(0)
+    symbols = list(df.columns)
+    pairs = []
+    for _ in range(n_pairs):
+        s1, s2 = rng.choice(n_symbols, size=2, replace=False)
+        pairs.append(
+            PortfolioPair(
+                symbols[s1],
+                symbols[s2],
+                int(rng.integers(20, 200)),
+                float(rng.uniform(1.0, 2.5)),
+            )
+        )
+
+    for allocation in ("equal", "vol_target", "max_deals"):
+        start = time.perf_counter()
+        result, peak = _traced_peak(
+            portfolio_backtest, matrix, pairs, allocation=allocation, max_deals=20
+        )
+        elapsed = time.perf_counter() - start
+        print(
+            f"  {allocation:>10}: {elapsed:.2f}s | pico {peak:.0f} MB | "
+            f"máx. deals abiertos {(result.positions != 0).sum(axis=0).max()}"
+        )
+
+    # Referencia: backtest de cada par por separado sobre el DataFrame
+    start = time.perf_counter()
+    for pair in pairs[:sample]:
+        replay_backtest(df[pair.s1], df[pair.s2], pair.window, pair.zscore_mult)
+    t_loop = (time.perf_counter() - start) * n_pairs / sample
+    print(f"  par a par: {t_loop:.2f}s (estimado, sin asignación de capital)")
+
+
+def bench_walk_forward(
+    n_symbols: int = 50,
+    n_bars: int = 2880 + 96 * 7,
+    window: int = 2880,
+    step: int = 96,
+    lag: int = 1,
+    max_reference_windows: int = 3,
+):
+    n_pairs = n_symbols * (n_symbols - 1) // 2
+    n_windows = (n_bars - window) // step + 1
+    print(
+        f"Cointegración walk-forward: {n_symbols} símbolos / {n_pairs} pares, "
+        f"ventana {window}, paso {step} ({n_windows} ventanas)"
+    )
+    df = synthetic_prices(n_symbols, n_bars)
+
+    # Histórico inicial y después una actualización por paso, como en vivo
+    scanner = WalkForwardCointegration(list(df.columns), window, lag=lag, step=step)
+    scanner.update(df.iloc[:window])
+    start = time.perf_counter()
+    for k in range(window, n_bars, step):
+        scanner.update(df.iloc[k : k + step])
+    t_incremental = (time.perf_counter() - start) / max(1, n_windows - 1)
+
+    # Referencia: test completo (vectorizado) sobre cada ventana desde cero
+    ends = range(window, n_bars + 1, step)[:max_reference_windows]
+    start = time.perf_counter()
+    for end in ends:
+        cointegration_test(df.iloc[end - window : end], engine="vectorized")
+    t_refit = (time.perf_counter() - start) / len(ends)
+
+    print(
+        f"  reajuste completo: {t_refit * 1000:.0f} ms/ventana | "
+        f"incremental: {t_incremental * 1000:.0f} ms/ventana | "
+        f"speedup: {t_refit / t_incremental:.1f}x"
+    )
+
+
+def _traced_peak(func, *args, **kwargs) -> tuple[object, float]:
+    # Resultado y pico de memoria (MB) reservado durante la llamada
+    tracemalloc.start()
+    try:
+        result = func(*args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, peak / 2**20
+
+
+def bench_walk_forward_optimization(
+    n_bars: int = 35_040, train_bars: int = 2880, test_bars: int = 672
+):
+    windows = np.arange(10, 101, 5)
+    zscore_mults = np.round(np.arange(1.0, 3.55, 0.1), 2)
+    n_folds = len(range(0, n_bars - train_bars, test_bars))
+    print(
+        f"Optimización walk-forward: {n_bars} velas, {n_folds} folds "
+        f"(train {train_bars}, test {test_bars}), {len(windows)} ventanas x "
+        f"{len(zscore_mults)} umbrales"
+    )
+    df = synthetic_prices(2, n_bars)
+    s1, s2 = df.iloc[:, 0], df.iloc[:, 1]
+
+    for spread_model in (None, SpreadModel("kalman", window=200)):
+        name = "diff" if spread_model is None else spread_model.method
+        timings = {}
+        for workers in (1, 4):
+            start = time.perf_counter()
+            walk_forward_optimization(
+                s1,
+                s2,
+                train_bars,
+                test_bars,
+                windows,
+                zscore_mults,
+                spread_model=spread_model,
+                max_workers=workers,
+            )
+            timings[workers] = time.perf_counter() - start
+
+        # Referencia: rejilla completa (spread y z-scores incluidos) sobre
+        # cada train
+        start = time.perf_counter()
+        for train_start in range(0, n_bars - train_bars, test_bars):
+            train = slice(train_start, train_start + train_bars)
+            grid_backtest(
+                s1.iloc[train],
+                s2.iloc[train],
+                windows,
+                zscore_mults,
+                spread_model=spread_model,
+            )
+        t_refit = time.perf_counter() - start
+        print(
+            f"  {name}: z-scores compartidos {timings[1]:.2f}s (1 proceso) | "
+            f"{timings[4]:.2f}s (4 procesos) | rejilla desde cero por fold: "
+            f"{t_refit:.2f}s"
+        )
+
+
+def bench_price_matrix(
+    n_symbols: int = 200, n_bars: int = 43_200, coint_symbols: int = 20
+):
+    print(
+        f"Matriz de precios: {n_symbols} símbolos x {n_bars} velas "
+        f"(30 días de velas de 1m)"
+    )
+    df = synthetic_prices(n_symbols, n_bars)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = Path(tmp) / "prices.csv"
+        df.to_csv(csv_path)
+        PriceMatrix.from_frame(df, np.float32).save_npy(Path(tmp) / "prices")
+
+        # Como bitget_example: read_csv con el índice de fechas como texto
+        start = time.perf_counter()
+        df_csv, peak_csv = _traced_peak(pd.read_csv, csv_path, index_col="datetime")
+        t_csv = time.perf_counter() - start
+        mem_csv = df_csv.memory_usage(deep=True).sum() / 2**20
+
+        start = time.perf_counter()
+        matrix, peak_npy = _traced_peak(PriceMatrix.load_npy, Path(tmp) / "prices")
+        t_npy = time.perf_counter() - start
+        mem_npy = matrix.nbytes / 2**20
+        # Se fuerza la lectura de todas las páginas del memmap
+        float(matrix.values.sum())
+
+        print(
+            f"  CSV float64: {mem_csv:7.1f} MB en memoria, pico al cargar "
+            f"{peak_csv:7.1f} MB, {t_csv:.2f}s"
+        )
+        print(
+            f"  PriceMatrix float32 (memmap): {mem_npy:7.1f} MB, pico al cargar "
+            f"{peak_npy:5.1f} MB, {t_npy * 1000:.1f} ms | "
+            f"ahorro: {1 - mem_npy / mem_csv:.0%}"
+        )
+
+        # Pico del test de cointegración sobre un subconjunto del universo
+        symbols = list(df.columns[:coint_symbols])
+        subset = df_csv[symbols]
+        _, peak_df = _traced_peak(cointegration_test, subset, engine="vectorized")
+        _, peak_pm = _traced_peak(
+            cointegration_test, matrix.select(symbols), engine="vectorized"
+        )
+        print(
+            f"  cointegración ({coint_symbols} símbolos): pico DataFrame "
+            f"{peak_df:.1f} MB | pico PriceMatrix float32 {peak_pm:.1f} MB"
+        )
+        del matrix
+
+
+def bench_frame_io(n_symbols: int = 50, n_bars: int = 35_040, repeats: int = 3):
+    print(f"E/S de precios: {n_symbols} símbolos x {n_bars} velas (1 año de 15m)")
+    df = synthetic_prices(n_symbols, n_bars)
+    pair = list(df.columns[:2])
+
+    def best_of(func) -> float:
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = Path(tmp) / "prices.csv"
+        df.to_csv(csv_path)
+        csv_size = csv_path.stat().st_size / 2**20
+
+        # Ruta anterior: read_csv y parseo de las fechas en cada lectura
+        t_csv = best_of(
+            lambda: pd.read_csv(csv_path, index_col="datetime", parse_dates=True)
+        )
+        t_csv_pair = best_of(
+            lambda: pd.read_csv(csv_path, index_col="datetime", parse_dates=True)[pair]
+        )
+        print(
+            f"  csv     : {csv_size:6.1f} MB | completo {t_csv * 1000:7.1f} ms | "
+            f"un par {t_csv_pair * 1000:7.1f} ms"
+        )
+
+        for ext in ("parquet", "feather"):
+            path = Path(tmp) / f"prices.{ext}"
+            write_frame(df, path)
+            size = path.stat().st_size / 2**20
+            loaded = read_frame(path)
+            assert loaded.index.equals(df.index)
+            assert np.array_equal(loaded.to_numpy(), df.to_numpy())
+
+            t_full = best_of(lambda path=path: read_frame(path))
+            t_pair = best_of(lambda path=path: read_frame(path, columns=pair))
+            print(
+                f"  {ext:<8}: {size:6.1f} MB | completo {t_full * 1000:7.1f} ms | "
+                f"un par {t_pair * 1000:7.1f} ms | "
+                f"{t_csv / t_full:5.1f}x más rápido, {csv_size / size:4.1f}x más pequeño"
+            )
+
+
+def _import_times(module: str) -> dict[str, int]:
+    # Tiempo acumulado (µs) de cada módulo importado según `python -X importtime`
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=Path(__file__).parent,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        times.setdefault(name.strip(), int(cumulative))
+    return times
+
+
+def bench_import_time(
+    modules: tuple[str, ...] = ("main", "live"),
+    target_ms: float = 1500,
+    repeat: int = 3,
+    top: int = 5,
+):
+    print(
+        f"Arranque: python -X importtime (mejor de {repeat}, objetivo {target_ms:.0f} ms)"
+    )
+
+    for module in modules:
+        runs = [_import_times(module) for _ in range(repeat)]
+        best = min(runs, key=lambda times: times[module])
+        total_ms = best[module] / 1000
+        status = "OK" if total_ms <= target_ms else "EXCEDE EL OBJETIVO"
+
+        # Paquetes raíz más pesados, para saber qué diferir si se supera el objetivo
+        packages = sorted(
+            (
+                (name, us)
+                for name, us in best.items()
+                if "." not in name and name != module
+            ),
+            key=lambda item: item[1],
+            reverse=True,
+        )[:top]
+        heaviest = ", ".join(f"{name} {us / 1000:.0f} ms" for name, us in packages)
+
+        print(f"  import {module}: {total_ms:7.0f} ms [{status}] | {heaviest}")
+
+
+BENCHMARKS = {
+    "cointegration": bench_cointegration,
+    "screen": bench_screen,
+    "backtest": bench_backtest_kernel,
+    "grid": bench_grid_backtest,
+    "costs": bench_costs,
+    "metrics": bench_metrics,
+    "portfolio": bench_portfolio,
+    "hedge": bench_hedge,
+    "replay": bench_replay,
+    "walkforward": bench_walk_forward,
+    "wfoptimize": bench_walk_forward_optimization,
+    "pricematrix": bench_price_matrix,
+    "frameio": bench_frame_io,
+    "importtime": bench_import_time,
+}
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        BENCHMARKS[name]()
@@ -0,0 +1,685 @@
+import argparse
+import cProfile
+import pstats
+import sys
+import time
+import tracemalloc
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+
+
+# Los módulos pesados (statsmodels, optuna, ccxt...) se importan dentro de cada
+# subcomando para que `pairs live` o `pairs --help` arranquen rápido
+
+
+class StageTimings:
+    # Tiempo de pared y pico de memoria de cada etapa de un subcomando. El pico
+    # se mide con tracemalloc (reservas de Python y NumPy), que solo se activa
+    # con --timings porque ralentiza la ejecución.
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.stages: list[tuple[str, float, float]] = []
+
+    @contextmanager
+    def __call__(self, name: str) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            _, peak = tracemalloc.get_traced_memory()
+            self.stages.append((name, elapsed_ms, peak / 2**20))
+
+    def report(self):
+        if not self.enabled or not self.stages:
+            return
+
+        print("\n⏱️  Tiempos por etapa:")
+        for name, elapsed_ms, peak_mb in self.stages:
+            print(
+                f"   {name:<14} {elapsed_ms:10.0f} ms | pico memoria: {peak_mb:8.1f} MB"
+            )
+        total_ms = sum(elapsed_ms for _, elapsed_ms, _ in self.stages)
+        print(f"   {'total':<14} {total_ms:10.0f} ms | RSS máx: {_max_rss_mb():.1f} MB")
+
+
+def _max_rss_mb() -> float:
+    try:
+        import resource
+    except ImportError:
+        return float("nan")
+
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux lo da en KB y macOS en bytes
+    return max_rss / 2**20 if sys.platform == "darwin" else max_rss / 2**10
+
+
+def _parse_date(value: str) -> datetime:
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"fecha no válida: {value!r}")
+
+
+def _prices_path(args: argparse.Namespace, reading: bool = False) -> Path:
+    if args.prices is not None:
+        return Path(args.prices)
+    path = Path(args.cache_dir) / f"ccxt_data_all_pairs_{args.timeframe}.parquet"
+    # Descargas antiguas en CSV
+    legacy = path.with_suffix(".csv")
+    if reading and not path.exists() and legacy.exists():
+        return legacy
+    return path
+
+
+def _download(args: argparse.Namespace) -> pd.DataFrame:
+    from data.candle_store import CandleStore
+    from data.ccxt_data import (
+        fetch_close_prices,
+        fetch_funding_rates,
+        from_dt_to_ts_ms,
+    )
+
+    end = args.end or datetime.now()
+    start = args.start or end - timedelta(days=args.days)
+
+    cache_dir = Path(args.cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    store = CandleStore(cache_dir / "candles.sqlite")
+    try:
+        print(
+            f"Descargando {len(args.symbols)} símbolos ({args.timeframe}) "
+            f"de {start:%Y-%m-%d %H:%M} a {end:%Y-%m-%d %H:%M}..."
+        )
+        df = fetch_close_prices(
+            symbols=args.symbols,
+            timeframe=args.timeframe,
+            start_ts_ms=from_dt_to_ts_ms(start),
+            end_ts_ms=from_dt_to_ts_ms(end),
+            max_workers=args.workers,
+            store=store,
+        )
+        if getattr(args, "funding", False):
+            print("Descargando tipos de funding...")
+            for symbol in dict.fromkeys(args.symbols):
+                fetch_funding_rates(
+                    symbol,
+                    from_dt_to_ts_ms(start),
+                    from_dt_to_ts_ms(end),
+                    store=store,
+                )
+        return df
+    finally:
+        store.close()
+
+
+def _load_prices(
+    args: argparse.Namespace,
+    timings: StageTimings,
+    columns: list[str] | None = None,
+) -> pd.DataFrame:
+    # Con --symbols se descarga (usando el almacén local); si no, se lee el
+    # fichero que deja `pairs download` (solo las columnas `columns`, si se dan)
+    from data.frame_io import read_frame
+
+    with timings("carga"):
+        if args.symbols:
+            df = _download(args)
+            if columns is not None:
+                df = df[columns]
+        else:
+            path = _prices_path(args, reading=True)
+            print(f"Leyendo precios de {path}...")
+            try:
+                df = read_frame(path, columns=columns)
+            except KeyError as e:
+                raise SystemExit(e.args[0]) from None
+
+        # Solo símbolos con histórico completo en el rango
+        df = df.dropna(axis=1, how="any")
+
+    print(f"Precios: {df.shape[0]} velas x {df.shape[1]} símbolos")
+    return df
+
+
+def _cost_model(args: argparse.Namespace, df: pd.DataFrame):
+    from costs import CostModel
+
+    if args.no_costs:
+        return None
+
+    symbol_slippage_bps = {}
+    for item in args.symbol_slippage or []:
+        symbol, _, bps = item.rpartition("=")
+        symbol_slippage_bps[symbol] = float(bps)
+    fees = dict(
+        taker_fee_bps=args.taker_fee_bps,
+        maker_fee_bps=args.maker_fee_bps,
+        maker_ratio=args.maker_ratio,
+        slippage_bps=args.slippage_bps,
+        symbol_slippage_bps=symbol_slippage_bps,
+    )
+    if not args.funding:
+        return CostModel(**fees)
+
+    from data.candle_store import CandleStore
+
+    # Funding del rango de los precios, leído del almacén de velas
+    index = pd.DatetimeIndex(df.index).as_unit("ms")
+    store = CandleStore(Path(args.cache_dir) / "candles.sqlite")
+    try:
+        costs = CostModel.from_store(
+            store, list(df.columns), int(index[0].value), int(index[-1].value), **fees
+        )
+    finally:
+        store.close()
+    print(f"Funding de {len(costs.funding_rates)}/{df.shape[1]} símbolos")
+    return costs
+
+
+def _cointegration(df: pd.DataFrame, args: argparse.Namespace, timings: StageTimings):
+    from cointegration import PairScreen, cointegration_test
+
+    screen = None
+    if any(
+        value is not None
+        for value in (args.min_correlation, args.max_half_life, args.top_k)
+    ):
+        screen = PairScreen(
+            min_correlation=args.min_correlation,
+            correlation_on=args.correlation_on,
+            max_half_life=args.max_half_life,
+            top_k=args.top_k,
+        )
+
+    with timings("cointegración"):
+        return cointegration_test(
+            df, engine=args.engine, n_jobs=args.workers, screen=screen
+        )
+
+
+def cmd_download(args: argparse.Namespace, timings: StageTimings):
+    from data.frame_io import write_frame
+
+    if not args.symbols:
+        raise SystemExit("pairs download: indica los símbolos con --symbols")
+
+    with timings("descarga"):
+        df = _download(args)
+
+    path = _prices_path(args)
+    with timings("escritura"):
+        write_frame(df, path)
+    print(f"Guardadas {df.shape[0]} velas x {df.shape[1]} símbolos en {path}")
+
+
+def cmd_scan(args: argparse.Namespace, timings: StageTimings):
+    from data.frame_io import write_frame
+
+    df = _load_prices(args, timings)
+    result = _cointegration(df, args, timings)
+
+    tickers = list(result.df.columns)
+    scan = pd.DataFrame(
+        [
+            (s1, s2, result.pvalue_matrix[tickers.index(s1), tickers.index(s2)])
+            for s1, s2 in result.pairs
+        ],
+        columns=["S1", "S2", "pvalue"],
+    ).sort_values("pvalue", ignore_index=True)
+
+    print(f"\n{len(scan)} pares cointegrados (p < 0.05):\n{scan.head(args.top)}")
+    if result.screened is not None:
+        n = len(tickers)
+        print(
+            f"Filtro previo: {result.n_tested} de {n * (n - 1) // 2} pares pasan "
+            "al test"
+        )
+        print(
+            f"Descartados por el filtro previo: "
+            f"{result.screened['reason'].value_counts().to_dict()}"
+        )
+    if args.output:
+        write_frame(scan, args.output, index=False)
+        print(f"Pares guardados en {args.output}")
+
+
+def cmd_optimize(args: argparse.Namespace, timings: StageTimings):
+    from data.frame_io import write_frame
+    from cointegration import best_pair_index
+    from optimize import (
+        optimize_pairs,
+        run_grid_optimization,
+        run_optimization,
+        walk_forward_optimization,
+    )
+
+    df = _load_prices(args, timings)
+    result = _cointegration(df, args, timings)
+    if not result.pairs:
+        print("No hay pares cointegrados que optimizar.")
+        return
+
+    costs = _cost_model(args, df)
+    with timings("optimización"):
+        if args.method == "pairs":
+            ranking = optimize_pairs(result, max_workers=args.workers, costs=costs)
+        elif args.method == "grid":
+            _, grid = run_grid_optimization(result, costs=costs)
+            ranking = grid.to_frame()
+        elif args.method == "walkforward":
+            # Parámetros elegidos fold a fold sobre el par más cointegrado
+            i, j = best_pair_index(result)
+            walk_forward = walk_forward_optimization(
+                result.df.iloc[:, i],
+                result.df.iloc[:, j],
+                train_bars=args.train_bars,
+                test_bars=args.test_bars,
+                costs=costs,
+                max_workers=args.workers,
+            )
+            ranking = walk_forward.folds
+            if args.equity_output:
+                write_frame(walk_forward.equity.to_frame(), args.equity_output)
+                print(f"Equity fuera de muestra guardada en {args.equity_output}")
+        else:
+            best_params = run_optimization(
+                result,
+                n_trials=args.n_trials,
+                # Varios procesos solo pueden compartir un estudio con storage
+                n_workers=args.workers if args.storage else 1,
+                storage=args.storage,
+                study_name=args.study_name,
+                costs=costs,
+            )
+            ranking = pd.DataFrame([best_params])
+
+    if args.output:
+        write_frame(ranking, args.output, index=False)
+        print(f"Resultados guardados en {args.output}")
+
+
+def cmd_backtest(args: argparse.Namespace, timings: StageTimings):
+    from backtest import backtest, performance_metrics, replay_backtest
+    from cointegration import find_best_pair
+    from data.frame_io import write_frame
+    from hedge import SpreadModel
+
+    df = _load_prices(args, timings, columns=args.pair)
+    missing = [s for s in args.pair or [] if s not in df.columns]
+    if missing:
+        raise SystemExit(f"Sin histórico completo para: {', '.join(missing)}")
+
+    result = _cointegration(df, args, timings)
+    spread_model = SpreadModel(
+        args.spread, window=args.hedge_window, delta=args.kalman_delta
+    )
+    best_pair = find_best_pair(result, window=args.window, spread_model=spread_model)
+    print(f"Par: {best_pair.name1} - {best_pair.name2} (spread: {args.spread})")
+
+    costs = _cost_model(args, df)
+    with timings("backtest"):
+        if args.replay is None:
+            df_backtest = backtest(best_pair, zscore_mult=args.zscore_mult, costs=costs)
+        else:
+            # Mismo motor de señales que el bot en vivo
+            df_backtest = replay_backtest(
+                best_pair.series1,
+                best_pair.series2,
+                window=args.window,
+                zscore_mult=args.zscore_mult,
+                spread_model=spread_model,
+                mode=args.replay,
+                costs=costs,
+            )
+    with timings("métricas"):
+        metrics = performance_metrics(df_backtest)
+    print(f"Performance metrics:\n{metrics}")
+
+    if args.output:
+        write_frame(df_backtest, args.output)
+        print(f"Backtest guardado en {args.output}")
+    if args.metrics_output:
+        write_frame(metrics, args.metrics_output)
+        print(f"Métricas guardadas en {args.metrics_output}")
+
+
+def cmd_portfolio(args: argparse.Namespace, timings: StageTimings):
+    from data.frame_io import write_frame
+    from portfolio import load_portfolio_pairs, portfolio_backtest
+
+    pairs = load_portfolio_pairs(args.config)
+    symbols = list(dict.fromkeys(s for pair in pairs for s in (pair.s1, pair.s2)))
+    df = _load_prices(args, timings, columns=symbols)
+    missing = [s for s in symbols if s not in df.columns]
+    if missing:
+        raise SystemExit(f"Sin histórico completo para: {', '.join(missing)}")
+    print(f"Cartera de {len(pairs)} pares (asignación: {args.allocation})")
+
+    costs = _cost_model(args, df)
+    with timings("backtest"):
+        result = portfolio_backtest(
+            df,
+            pairs,
+            allocation=args.allocation,
+            max_deals=args.max_deals,
+            target_vol=args.target_vol,
+            vol_window=args.vol_window,
+            max_leverage=args.max_leverage,
+            costs=costs,
+        )
+    with timings("métricas"):
+        metrics = result.metrics()
+        pair_metrics = result.pair_metrics()
+    print(f"Performance metrics:\n{metrics}")
+    print(f"Por par:\n{pair_metrics}")
+    print(f"Correlación de los retornos de los pares:\n{result.correlation().round(2)}")
+
+    if args.output:
+        write_frame(result.to_frame(), args.output)
+        print(f"Backtest guardado en {args.output}")
+    if args.metrics_output:
+        write_frame(pair_metrics, args.metrics_output)
+        print(f"Métricas por par guardadas en {args.metrics_output}")
+
+
+def cmd_convert(args: argparse.Namespace, timings: StageTimings):
+    from data.frame_io import read_frame, write_frame
+
+    with timings("lectura"):
+        try:
+            df = read_frame(args.source, columns=args.columns)
+        except KeyError as e:
+            raise SystemExit(e.args[0]) from None
+    with timings("escritura"):
+        write_frame(df, args.destination)
+    print(f"{args.source} -> {args.destination} ({df.shape[0]} x {df.shape[1]})")
+
+
+def cmd_live(args: argparse.Namespace, timings: StageTimings):
+    from live import live_strategy, live_stream_strategy
+    from registry import PairRegistry
+
+    cache_dir = Path(args.cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    store_path = cache_dir / "candles.sqlite"
+
+    if args.stream:
+        import asyncio
+
+        from data.candle_store import CandleStore
+
+        asyncio.run(
+            live_stream_strategy(
+                registry=PairRegistry(args.config), store=CandleStore(store_path)
+            )
+        )
+    else:
+        live_strategy(args.config, store_path=store_path)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="pairs",
+        description="Pairs trading: descarga, escaneo, optimización y trading en vivo.",
+    )
+    parser.add_argument(
+        "--timings",
+        action="store_true",
+        help="tiempo de pared y pico de memoria de cada etapa",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="perfila con cProfile y muestra las funciones más costosas",
+    )
+    parser.add_argument(
+        "--profile-output",
+        metavar="FICHERO",
+        help="guarda el perfil de cProfile (para snakeviz, pstats...)",
+    )
+
+    # Argumentos comunes de los subcomandos
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument(
+        "--cache-dir",
+        default=".",
+        help="directorio del almacén de velas y los ficheros de precios",
+    )
+    common.add_argument(
+        "--workers", type=int, default=4, help="hilos/procesos de trabajo"
+    )
+
+    data = argparse.ArgumentParser(add_help=False, parents=[common])
+    data.add_argument(
+        "--symbols", nargs="+", metavar="SÍMBOLO", help="p.ej. BTC/USDT:USDT"
+    )
+    data.add_argument("--timeframe", default="15m")
+    data.add_argument(
+        "--start", type=_parse_date, help="fecha ISO (por defecto, end - days)"
+    )
+    data.add_argument("--end", type=_parse_date, help="fecha ISO (por defecto, ahora)")
+    data.add_argument(
+        "--days", type=int, default=30, help="días de histórico si no hay --start"
+    )
+    data.add_argument(
+        "--prices",
+        help="cierres en .parquet, .feather o .csv (por defecto, el de `pairs download`)",
+    )
+
+    engine = argparse.ArgumentParser(add_help=False)
+    engine.add_argument(
+        "--engine", choices=["statsmodels", "vectorized"], default="vectorized"
+    )
+    # Filtro previo: solo se activa si se indica algún criterio
+    engine.add_argument(
+        "--min-correlation", type=float, help="correlación mínima entre las patas"
+    )
+    engine.add_argument(
+        "--correlation-on", choices=["log_prices", "returns"], default="log_prices"
+    )
+    engine.add_argument(
+        "--max-half-life", type=float, help="half-life máxima del spread (velas)"
+    )
+    engine.add_argument(
+        "--top-k", type=int, help="nº máximo de pares que pasan al test completo"
+    )
+
+    # Costes del backtest: comisiones, slippage y funding
+    costs = argparse.ArgumentParser(add_help=False)
+    costs.add_argument(
+        "--no-costs", action="store_true", help="backtest sin costes (bruto)"
+    )
+    costs.add_argument("--taker-fee-bps", type=float, default=6.0)
+    costs.add_argument("--maker-fee-bps", type=float, default=2.0)
+    costs.add_argument(
+        "--maker-ratio",
+        type=float,
+        default=0.0,
+        help="fracción del volumen ejecutada como maker",
+    )
+    costs.add_argument(
+        "--slippage-bps", type=float, default=0.0, help="slippage por defecto"
+    )
+    costs.add_argument(
+        "--symbol-slippage",
+        nargs="+",
+        metavar="SÍMBOLO=BPS",
+        help="slippage por símbolo, p.ej. SHIB/USDT:USDT=8",
+    )
+    costs.add_argument(
+        "--funding",
+        action="store_true",
+        help="aplica el funding guardado en el almacén (pairs download --funding)",
+    )
+
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    download = subparsers.add_parser(
+        "download", parents=[data], help="descarga cierres a Parquet"
+    )
+    download.add_argument(
+        "--funding",
+        action="store_true",
+        help="descarga también los tipos de funding al almacén de velas",
+    )
+    download.set_defaults(func=cmd_download)
+
+    scan = subparsers.add_parser(
+        "scan", parents=[data, engine], help="busca pares cointegrados"
+    )
+    scan.add_argument("--top", type=int, default=20, help="pares a mostrar")
+    scan.add_argument("--output", help="pares y p-valores (.parquet, .feather o .csv)")
+    scan.set_defaults(func=cmd_scan)
+
+    optimize = subparsers.add_parser(
+        "optimize",
+        parents=[data, engine, costs],
+        help="optimiza ventana y umbral de z-score",
+    )
+    optimize.add_argument(
+        "--method",
+        choices=["pairs", "grid", "optuna", "walkforward"],
+        default="pairs",
+        help="pairs: rejilla para cada par; grid: rejilla del mejor par; optuna: búsqueda con Optuna; walkforward: rejilla del mejor par por folds train/test",
+    )
+    optimize.add_argument(
+        "--train-bars", type=int, default=30 * 96, help="velas de train (walkforward)"
+    )
+    optimize.add_argument(
+        "--test-bars", type=int, default=7 * 96, help="velas de test (walkforward)"
+    )
+    optimize.add_argument(
+        "--equity-output", help="equity fuera de muestra (walkforward)"
+    )
+    optimize.add_argument("--n-trials", type=int, default=200)
+    optimize.add_argument("--storage", help="storage de Optuna (URL o journal file)")
+    optimize.add_argument("--study-name")
+    optimize.add_argument("--output", help="resultados (.parquet, .feather o .csv)")
+    optimize.set_defaults(func=cmd_optimize)
+
+    backtest = subparsers.add_parser(
+        "backtest", parents=[data, engine, costs], help="backtest de un par"
+    )
+    backtest.add_argument(
+        "--pair",
+        nargs=2,
+        metavar=("S1", "S2"),
+        help="por defecto, el par más cointegrado",
+    )
+    backtest.add_argument("--window", type=int, default=36)
+    backtest.add_argument("--zscore-mult", type=float, default=1.6)
+    backtest.add_argument(
+        "--spread",
+        choices=["diff", "ols", "rolling_ols", "kalman"],
+        default="diff",
+        help="construcción del spread (beta = 1, MCO, MCO rodante o Kalman)",
+    )
+    backtest.add_argument(
+        "--hedge-window",
+        type=int,
+        default=500,
+        help="ventana de rolling_ols / calentamiento de kalman",
+    )
+    backtest.add_argument("--kalman-delta", type=float, default=1e-4)
+    backtest.add_argument(
+        "--replay",
+        choices=["fast", "exact"],
+        help="usa el motor de señales del bot en vivo (exact: vela a vela)",
+    )
+    backtest.add_argument("--output", help="backtest (.parquet, .feather o .csv)")
+    backtest.add_argument(
+        "--metrics-output", help="métricas (.parquet, .feather o .csv)"
+    )
+    backtest.set_defaults(func=cmd_backtest)
+
+    portfolio = subparsers.add_parser(
+        "portfolio",
+        parents=[data, costs],
+        help="backtest conjunto de los pares de la configuración",
+    )
+    portfolio.add_argument(
+        "--config", default="pairs.toml", help="configuración de pares"
+    )
+    portfolio.add_argument(
+        "--allocation",
+        choices=["equal", "vol_target", "max_deals"],
+        default="equal",
+        help="reparto del capital entre los pares",
+    )
+    portfolio.add_argument(
+        "--max-deals", type=int, help="pares abiertos a la vez (max_deals)"
+    )
+    portfolio.add_argument(
+        "--target-vol",
+        type=float,
+        default=0.2,
+        help="volatilidad anual objetivo de la cartera (vol_target)",
+    )
+    portfolio.add_argument(
+        "--vol-window", type=int, default=96 * 7, help="velas para la volatilidad"
+    )
+    portfolio.add_argument("--max-leverage", type=float, default=1.0)
+    portfolio.add_argument("--output", help="equity de la cartera (.parquet, ...)")
+    portfolio.add_argument(
+        "--metrics-output", help="métricas por par (.parquet, .feather o .csv)"
+    )
+    portfolio.set_defaults(func=cmd_portfolio)
+
+    convert = subparsers.add_parser(
+        "convert", help="convierte entre Parquet, Feather y CSV (p.ej. CSV antiguos)"
+    )
+    convert.add_argument("source")
+    convert.add_argument("destination")
+    convert.add_argument(
+        "--columns", nargs="+", metavar="COLUMNA", help="solo estas columnas"
+    )
+    convert.set_defaults(func=cmd_convert)
+
+    live = subparsers.add_parser("live", parents=[common], help="trading en vivo")
+    live.add_argument("--config", default="pairs.toml", help="configuración de pares")
+    live.add_argument(
+        "--stream", action="store_true", help="modo event-driven por WebSocket"
+    )
+    live.set_defaults(func=cmd_live)
+
+    return parser
+
+
+def main(argv: list[str] | None = None):
+    args = build_parser().parse_args(argv)
+    timings = StageTimings(enabled=args.timings)
+
+    if not args.profile and args.profile_output is None:
+        try:
+            args.func(args, timings)
+        finally:
+            timings.report()
+        return
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.runcall(args.func, args, timings)
+    finally:
+        timings.report()
+        if args.profile_output is not None:
+            profiler.dump_stats(args.profile_output)
+            print(f"\n🔬 Perfil guardado en {args.profile_output}")
+        if args.profile:
+            print("\n🔬 Perfil (25 funciones con más tiempo acumulado):")
+            pstats.Stats(profiler).sort_stats("cumulative").print_stats(25)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,28 @@
+import hashlib
+import threading
+import warnings
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
+from functools import cached_property
+from typing import Any, Literal
 
 import pandas as pd
 import numpy as np
-from statsmodels.tsa.stattools import coint
+from scipy.special import ndtr
+from statsmodels.tsa import adfvalues
+from statsmodels.tsa.stattools import adfuller, coint
+
+from data.price_matrix import PriceMatrix
+from hedge import SpreadModel
+
+
+# Umbral de colinealidad usado por statsmodels.coint
+_SQRTEPS = np.sqrt(np.finfo(float).eps)
+
+# Valores del proceso del pool (se cargan una sola vez por worker)
+_worker_values: np.ndarray | None = None
 
 
 @dataclass
@@ -11,6 +31,19 @@ class CointegrationTestResult:
     score_matrix: np.ndarray
     pvalue_matrix: np.ndarray
     pairs: list[tuple[str, str]]
+    # Pares descartados por el filtro previo (S1, S2, reason, ...) y número de
+    # pares que pasan al test completo
+    screened: pd.DataFrame | None = None
+    n_tested: int | None = None
+
+    @cached_property
+    def fingerprint(self) -> str:
+        # Identifica los datos y el resultado del test para las claves de caché
+        digest = hashlib.sha1()
+        digest.update(pd.util.hash_pandas_object(self.df, index=True).to_numpy())
+        digest.update("\x1f".join(map(str, self.df.columns)).encode())
+        digest.update(np.ascontiguousarray(self.pvalue_matrix).tobytes())
+        return digest.hexdigest()
 
 
 @dataclass
@@ -21,45 +54,416 @@ class BestPair:
     series2: pd.Series
     spread: pd.Series
     zscore: pd.Series
+    # Beta de S2 vela a vela; None equivale al spread S1 - S2 (beta = 1)
+    hedge_ratio: pd.Series | None = None
+
+
+@dataclass
+class PairScreen:
+    # Filtro barato previo al test de Engle-Granger. Cada criterio a None se
+    # omite; se aplican en orden (volumen, correlación, half-life) y al final
+    # solo pasan los top_k mejores según rank_by.
+    min_correlation: float | None = 0.5
+    correlation_on: Literal["log_prices", "returns"] = "log_prices"
+    max_half_life: float | None = None
+    min_volume: float | None = None
+    top_k: int | None = None
+    rank_by: Literal["correlation", "half_life"] = "correlation"
+
+
+class PairStatsCache:
+    # LRU compartida entre los hilos de Optuna (n_jobs > 1). El lock protege
+    # el diccionario; el cálculo se hace fuera de él, con un lock por clave
+    # para que dos hilos no calculen la misma ventana a la vez.
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, Any] = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks: dict[Hashable, threading.Lock] = {}
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        with self._lock:
+            if key in self._entries:
+                return self._hit(key)
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                # Otro hilo puede haberlo calculado mientras se esperaba
+                if key in self._entries:
+                    return self._hit(key)
+                self.misses += 1
+
+            try:
+                value = compute()
+                with self._lock:
+                    self._entries[key] = value
+                    if len(self._entries) > self.maxsize:
+                        self._entries.popitem(last=False)
+            finally:
+                with self._lock:
+                    self._key_locks.pop(key, None)
+
+        return value
+
+    def _hit(self, key: Hashable) -> Any:
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return self._entries[key]
 
+    def __getstate__(self) -> dict[str, Any]:
+        # Los locks no se pueden serializar (procesos del pool de Optuna)
+        state = self.__dict__.copy()
+        del state["_lock"], state["_key_locks"]
+        return state
+
+    def __setstate__(self, state: dict[str, Any]):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+
+def cointegration_test(
+    df: pd.DataFrame | PriceMatrix,
+    engine: Literal["statsmodels", "vectorized"] = "statsmodels",
+    n_jobs: int = 1,
+    block_size: int = 64,
+    screen: PairScreen | None = None,
+    volumes: pd.Series | None = None,
+) -> CointegrationTestResult:
+    # Con una PriceMatrix el motor vectorizado trabaja sobre su matriz sin
+    # convertirla entera a float64 (cada bloque de pares se pasa a float64 por
+    # separado) y el resultado guarda una vista DataFrame de los mismos datos
+    if isinstance(df, PriceMatrix):
+        values = df.values
+        df = df.to_frame()
+    else:
+        values = df.to_numpy(dtype=np.float64)
 
-def cointegration_test(df: pd.DataFrame) -> CointegrationTestResult:
     tickers = df.columns
     n = len(tickers)
     score_matrix = np.zeros((n, n))
     pvalue_matrix = np.ones((n, n))
     pairs = []
 
-    for i in range(n):
-        for j in range(i + 1, n):
-            score, pvalue, _ = coint(df.iloc[:, i], df.iloc[:, j])
-            score_matrix[i, j] = score
-            pvalue_matrix[i, j] = pvalue
-            if pvalue < 0.05:
-                pairs.append((tickers[i], tickers[j]))
+    # Con screen, solo los candidatos del filtro previo pasan al test completo;
+    # los descartados quedan con p-valor 1 y su motivo en result.screened
+    screened = None
+    if screen is None:
+        pairs_idx = np.column_stack(np.triu_indices(n, k=1))
+    else:
+        pairs_idx, screened = screen_pairs(df, screen, volumes)
 
-    return CointegrationTestResult(df, score_matrix, pvalue_matrix, pairs)
+    if engine == "vectorized":
+        idx_i, idx_j = pairs_idx[:, 0], pairs_idx[:, 1]
+        scores, pvalues = _coint_vectorized(
+            values,
+            pairs_idx,
+            n_jobs=n_jobs,
+            block_size=block_size,
+        )
+        score_matrix[idx_i, idx_j] = scores
+        pvalue_matrix[idx_i, idx_j] = pvalues
+        pairs = [
+            (tickers[i], tickers[j])
+            for i, j, pvalue in zip(idx_i, idx_j, pvalues)
+            if pvalue < 0.05
+        ]
+        return CointegrationTestResult(
+            df, score_matrix, pvalue_matrix, pairs, screened, len(pairs_idx)
+        )
 
+    for i, j in pairs_idx:
+        score, pvalue, _ = coint(
+            values[:, i].astype(np.float64), values[:, j].astype(np.float64)
+        )
+        score_matrix[i, j] = score
+        pvalue_matrix[i, j] = pvalue
+        if pvalue < 0.05:
+            pairs.append((tickers[i], tickers[j]))
 
-def find_best_pair(
-    cointegration_test_result: CointegrationTestResult, window: int
-) -> BestPair:
+    return CointegrationTestResult(
+        df, score_matrix, pvalue_matrix, pairs, screened, len(pairs_idx)
+    )
+
+
+def screen_pairs(
+    df: pd.DataFrame, screen: PairScreen, volumes: pd.Series | None = None
+) -> tuple[np.ndarray, pd.DataFrame]:
+    # Devuelve los índices (i, j) de los pares candidatos y un DataFrame con
+    # los descartados y el motivo. volumes: volumen medio por símbolo
+    tickers = df.columns
+    n = len(tickers)
+    idx_i, idx_j = np.triu_indices(n, k=1)
+    reason = np.full(len(idx_i), "", dtype=object)
+
+    if screen.min_volume is not None:
+        if volumes is None:
+            raise ValueError("min_volume requiere los volúmenes por símbolo")
+        low = volumes.reindex(tickers).fillna(0).to_numpy() < screen.min_volume
+        reason[(reason == "") & (low[idx_i] | low[idx_j])] = "volumen"
+
+    log_prices = np.log(df.to_numpy(dtype=np.float64))
+    series = (
+        log_prices
+        if screen.correlation_on == "log_prices"
+        else np.diff(log_prices, axis=0)
+    )
+    correlation = np.corrcoef(series, rowvar=False)[idx_i, idx_j]
+    if screen.min_correlation is not None:
+        reason[(reason == "") & ~(correlation >= screen.min_correlation)] = (
+            "correlación"
+        )
+
+    # Half-life solo de los pares que siguen en juego
+    half_life = np.full(len(idx_i), np.nan)
+    alive = np.flatnonzero(reason == "")
+    half_life[alive] = _half_life(log_prices, idx_i[alive], idx_j[alive])
+    if screen.max_half_life is not None:
+        reason[(reason == "") & ~(half_life <= screen.max_half_life)] = "half-life"
+
+    if screen.top_k is not None:
+        alive = np.flatnonzero(reason == "")
+        if screen.rank_by == "correlation":
+            order = np.argsort(-correlation[alive], kind="stable")
+        else:
+            order = np.argsort(half_life[alive], kind="stable")
+        reason[alive[order[screen.top_k :]]] = "top-k"
+
+    keep = reason == ""
+    screened = pd.DataFrame(
+        {
+            "S1": tickers[idx_i[~keep]],
+            "S2": tickers[idx_j[~keep]],
+            "reason": reason[~keep],
+            "correlation": correlation[~keep],
+            "half_life": half_life[~keep],
+        }
+    )
+    return np.column_stack([idx_i[keep], idx_j[keep]]), screened
+
+
+def _half_life(
+    log_prices: np.ndarray, idx_i: np.ndarray, idx_j: np.ndarray, block_size: int = 512
+) -> np.ndarray:
+    # Half-life (en velas) de la reversión del spread y - beta x, con beta por
+    # MCO: Δs_t = c + λ s_t-1 -> half-life = -ln 2 / ln(1 + λ). Sin reversión
+    # (λ >= 0) es infinita
+    half_life = np.empty(len(idx_i))
+    for start in range(0, len(idx_i), block_size):
+        y = log_prices[:, idx_i[start : start + block_size]]
+        x = log_prices[:, idx_j[start : start + block_size]]
+        x_c = x - x.mean(axis=0)
+        y_c = y - y.mean(axis=0)
+        beta = (x_c * y_c).sum(axis=0) / (x_c * x_c).sum(axis=0)
+        spread = y_c - beta * x_c
+
+        lagged = spread[:-1] - spread[:-1].mean(axis=0)
+        delta = np.diff(spread, axis=0)
+        delta -= delta.mean(axis=0)
+        lam = (lagged * delta).sum(axis=0) / (lagged * lagged).sum(axis=0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            block = np.where(lam < 0, -np.log(2) / np.log1p(lam), np.inf)
+        half_life[start : start + len(lam)] = block
+
+    return half_life
+
+
+# Motor vectorizado de Engle-Granger: reproduce coint(y0, y1) con trend="c" y
+# autolag="aic" resolviendo por bloques de pares todas las regresiones con
+# álgebra matricial. Frente a statsmodels los estadísticos coinciden con un
+# error relativo < 1e-8 y los p-valores con un error absoluto < 1e-6, salvo
+# pares donde dos retardos empatan en AIC (diferencia < 1e-9) y la selección
+# del retardo puede diferir.
+def _coint_vectorized(
+    values: np.ndarray, pairs_idx: np.ndarray, n_jobs: int, block_size: int
+) -> tuple[np.ndarray, np.ndarray]:
+    blocks = [
+        pairs_idx[start : start + block_size]
+        for start in range(0, len(pairs_idx), block_size)
+    ]
+    if not blocks:
+        return np.empty(0), np.empty(0)
+
+    if n_jobs == 1:
+        results = [_coint_block(values, block) for block in blocks]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=n_jobs, initializer=_init_worker, initargs=(values,)
+        ) as executor:
+            results = list(executor.map(_coint_worker_block, blocks))
+
+    scores = np.concatenate([scores for scores, _ in results])
+    pvalues = np.concatenate([pvalues for _, pvalues in results])
+    return scores, pvalues
+
+
+def _init_worker(values: np.ndarray):
+    global _worker_values
+    _worker_values = values
+
+
+def _coint_worker_block(pairs_idx: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    assert _worker_values is not None
+    return _coint_block(_worker_values, pairs_idx)
+
+
+def _coint_block(
+    values: np.ndarray, pairs_idx: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    nobs = values.shape[0]
+    y = values[:, pairs_idx[:, 0]].astype(np.float64)
+    x = values[:, pairs_idx[:, 1]].astype(np.float64)
+
+    # Regresión de cointegración y ~ const + beta * x para todos los pares
+    x_c = x - x.mean(axis=0)
+    y_c = y - y.mean(axis=0)
+    x_var = (x_c * x_c).sum(axis=0)
+    y_var = (y_c * y_c).sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        beta = (x_c * y_c).sum(axis=0) / x_var
+        resid = y_c - beta * x_c
+        rsquared = 1 - (resid * resid).sum(axis=0) / y_var
+    # Con una pata constante (p.ej. una stablecoin) la regresión es degenerada:
+    # esos pares se evalúan con statsmodels para dar su mismo resultado
+    constant = (x_var == 0) | (y_var == 0)
+    collinear = ~constant & (rsquared >= 1 - 100 * _SQRTEPS)
+    regular = ~constant & ~collinear
+
+    # ADF sin constante sobre los residuos con selección de retardo por AIC
+    maxlag = int(np.ceil(12.0 * np.power(nobs / 100.0, 1 / 4.0)))
+    maxlag = min(nobs // 2 - 1, maxlag)
+
+    # Colineales: statsmodels avisa y devuelve -inf (p-valor 0)
+    scores = np.full(len(pairs_idx), -np.inf)
+    if regular.any():
+        scores[regular] = _adf_scores(resid[:, regular], maxlag)
+    for k in np.flatnonzero(constant):
+        scores[k] = _coint_score(y[:, k], x[:, k])
+
+    return scores, mackinnonp_vectorized(scores, regression="c", N=2)
+
+
+def _adf_scores(resid: np.ndarray, maxlag: int) -> np.ndarray:
+    resid_diff = np.diff(resid, axis=0)
+    try:
+        # Con la factorización de Cholesky de X'X se obtienen a la vez las SSR
+        # de todas las regresiones anidadas (1..maxlag+1 columnas)
+        X, target = _adf_design(resid, resid_diff, maxlag)
+        gram = X.transpose(0, 2, 1) @ X
+        xty = np.einsum("pta,pt->pa", X, target)
+        chol = np.linalg.cholesky(gram)
+        z = np.linalg.solve(chol, xty[..., None])[..., 0]
+        ssr = (target * target).sum(axis=1)[:, None] - np.cumsum(z * z, axis=1)
+        n_rows = target.shape[1]
+        n_cols = np.arange(1, maxlag + 2)
+        aic = n_rows * np.log(np.maximum(ssr, 0) / n_rows) + 2 * n_cols
+        usedlag = np.argmin(aic, axis=1)
+
+        scores = np.empty(resid.shape[1])
+        for lag in np.unique(usedlag):
+            sel = usedlag == lag
+            scores[sel] = _adf_tstat(
+                *_adf_design(resid[:, sel], resid_diff[:, sel], lag)
+            )
+        return scores
+    except np.linalg.LinAlgError:
+        # Algún par con regresores singulares (p.ej. residuos con diferencias
+        # constantes): se separa el bloque y ese par lo resuelve adfuller
+        if resid.shape[1] > 1:
+            return np.array(
+                [
+                    _adf_scores(resid[:, k : k + 1], maxlag)[0]
+                    for k in range(resid.shape[1])
+                ]
+            )
+        return np.array(
+            [adfuller(resid[:, 0], maxlag=maxlag, autolag="aic", regression="n")[0]]
+        )
+
+
+def _coint_score(y: np.ndarray, x: np.ndarray) -> float:
+    # Estadístico de statsmodels.coint para un par; NaN si no se puede
+    # calcular (ambas patas constantes)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        try:
+            return float(coint(y, x, trend="c", autolag="aic")[0])
+        except ValueError:
+            return np.nan
+
+
+def _adf_design(
+    resid: np.ndarray, resid_diff: np.ndarray, lag: int
+) -> tuple[np.ndarray, np.ndarray]:
+    # Misma disposición que adfuller: nivel retrasado y diferencias retrasadas
+    nobs = resid.shape[0]
+    columns = [resid[lag : nobs - 1]]
+    columns += [resid_diff[lag - k : nobs - 1 - k] for k in range(1, lag + 1)]
+    X = np.stack(columns, axis=-1).transpose(1, 0, 2)
+    target = resid_diff[lag:].T
+    return X, target
+
+
+def _adf_tstat(X: np.ndarray, target: np.ndarray) -> np.ndarray:
+    n_rows, n_cols = X.shape[1], X.shape[2]
+    gram_inv = np.linalg.inv(X.transpose(0, 2, 1) @ X)
+    params = np.einsum("pab,pb->pa", gram_inv, np.einsum("pta,pt->pa", X, target))
+    fitted = np.einsum("pta,pa->pt", X, params)
+    ssr = ((target - fitted) ** 2).sum(axis=1)
+    cov_00 = gram_inv[:, 0, 0] * ssr / (n_rows - n_cols)
+    return params[:, 0] / np.sqrt(cov_00)
+
+
+def best_pair_index(
+    cointegration_test_result: CointegrationTestResult,
+) -> tuple[int, int]:
     mask = np.triu(
         np.ones_like(cointegration_test_result.pvalue_matrix, dtype=bool), k=1
     )
     upper_vals = cointegration_test_result.pvalue_matrix[mask]
 
-    min_idx_flat = np.argmin(upper_vals)
+    # Los pares sin p-valor (NaN) no pueden ser el mejor par
+    min_idx_flat = np.nanargmin(upper_vals)
     idx_pairs = np.column_stack(np.where(mask))
     i, j = idx_pairs[min_idx_flat]
 
-    S1, S2 = (
-        cointegration_test_result.df.iloc[:, i],
-        cointegration_test_result.df.iloc[:, j],
-    )
-    spread: pd.Series = S1 - S2
-    zscore = (spread - spread.rolling(window).mean()) / spread.rolling(window).std()
-    zscore = zscore.dropna()
+    return int(i), int(j)
+
+
+def find_best_pair(
+    cointegration_test_result: CointegrationTestResult,
+    window: int,
+    cache: PairStatsCache | None = None,
+    spread_model: SpreadModel | None = None,
+) -> BestPair:
+    if cache is None:
+        i, j = best_pair_index(cointegration_test_result)
+        S1, S2 = _pair_series(cointegration_test_result, i, j)
+        spread, hedge_ratio = _pair_spread(S1, S2, spread_model)
+        zscore = _rolling_zscore(spread, window)
+    else:
+        # Con caché, el par, el spread y los momentos rodantes de cada ventana
+        # se calculan una sola vez para los mismos datos
+        fingerprint = cointegration_test_result.fingerprint
+        i, j = cache.get_or_compute(
+            (fingerprint, "best_pair"),
+            lambda: best_pair_index(cointegration_test_result),
+        )
+        S1, S2 = _pair_series(cointegration_test_result, i, j)
+        spread, hedge_ratio = cache.get_or_compute(
+            (fingerprint, (i, j), "spread", spread_model),
+            lambda: _pair_spread(S1, S2, spread_model),
+        )
+        zscore = cache.get_or_compute(
+            (fingerprint, (i, j), spread_model, window),
+            lambda: _rolling_zscore(spread, window),
+        )
 
     return BestPair(
         name1=str(S1.name),
@@ -68,4 +472,303 @@ def find_best_pair(
         series2=S2,
         spread=spread,
         zscore=zscore,
+        hedge_ratio=hedge_ratio,
+    )
+
+
+def _pair_series(
+    cointegration_test_result: CointegrationTestResult, i: int, j: int
+) -> tuple[pd.Series, pd.Series]:
+    # Aunque la matriz de precios sea float32, el par se calcula en float64
+    df = cointegration_test_result.df
+    return df.iloc[:, i].astype(np.float64), df.iloc[:, j].astype(np.float64)
+
+
+def _pair_spread(
+    S1: pd.Series, S2: pd.Series, spread_model: SpreadModel | None
+) -> tuple[pd.Series, pd.Series | None]:
+    if spread_model is None or spread_model.method == "diff":
+        return S1 - S2, None
+
+    spread, hedge_ratio = spread_model.fit(S1.to_numpy(), S2.to_numpy())
+    return pd.Series(spread, index=S1.index), pd.Series(hedge_ratio, index=S1.index)
+
+
+def _rolling_zscore(spread: pd.Series, window: int) -> pd.Series:
+    zscore = (spread - spread.rolling(window).mean()) / spread.rolling(window).std()
+    return zscore.dropna()
+
+
+def mackinnonp_vectorized(
+    teststats: np.ndarray, regression: str = "c", N: int = 2
+) -> np.ndarray:
+    # Igual que statsmodels.tsa.adfvalues.mackinnonp (mismas tablas de
+    # MacKinnon 1994) pero para un array de estadísticos de una vez
+    teststats = np.asarray(teststats, dtype=np.float64)
+    # Con ±inf el polinomio da nan, pero esos valores caen fuera de rango
+    with np.errstate(invalid="ignore"):
+        small = np.polynomial.polynomial.polyval(
+            teststats, adfvalues._tau_smallps[regression][N - 1]
+        )
+        large = np.polynomial.polynomial.polyval(
+            teststats, adfvalues._tau_largeps[regression][N - 1]
+        )
+    pvalues = ndtr(
+        np.where(teststats <= adfvalues._tau_stars[regression][N - 1], small, large)
     )
+    pvalues = np.where(teststats < adfvalues._tau_mins[regression][N - 1], 0.0, pvalues)
+    return np.where(teststats > adfvalues._tau_maxs[regression][N - 1], 1.0, pvalues)
+
+
+@dataclass
+class CointegrationCube:
+    # p-valores de cointegración por ventana: pvalues[t, k] es el del par
+    # pairs[k] en la ventana que termina en index[t]
+    index: pd.Index
+    pairs: list[tuple[str, str]]
+    scores: np.ndarray
+    pvalues: np.ndarray
+    window: int
+    lag: int
+
+    def to_frame(self) -> pd.DataFrame:
+        columns = pd.MultiIndex.from_tuples(self.pairs, names=["S1", "S2"])
+        return pd.DataFrame(self.pvalues, index=self.index, columns=columns)
+
+    def pair(self, s1: str, s2: str) -> pd.Series:
+        k = self.pairs.index((s1, s2))
+        return pd.Series(self.pvalues[:, k], index=self.index, name=(s1, s2))
+
+    def decoupled(
+        self, max_pvalue: float = 0.05, lookback: int = 1
+    ) -> list[tuple[str, str]]:
+        # Pares que llevan las últimas `lookback` ventanas sin cointegrar:
+        # candidatos a retirar del trading en vivo
+        if len(self.index) < lookback:
+            return []
+        recent = self.pvalues[-lookback:]
+        return [
+            pair
+            for pair, out in zip(self.pairs, (recent >= max_pvalue).all(axis=0))
+            if out
+        ]
+
+
+class WalkForwardCointegration:
+    # Test de Engle-Granger sobre una ventana deslizante de `window` velas, con
+    # un retardo fijo `lag` en el ADF (equivale a coint(y, x, maxlag=lag,
+    # autolag=None) sobre cada ventana).
+    #
+    # En lugar de reajustar cada par en cada ventana se mantienen, por símbolo
+    # y no por par, las matrices de Gram de dos vectores base:
+    #   - niveles: [1, P_t], para la regresión y ~ a + b x
+    #   - ADF: [1, P_t-1, ΔP_t, ΔP_t-1, ..., ΔP_t-lag]
+    # Cada columna del ADF de un par (Δu_t, u_t-1, Δu_t-k) es una combinación
+    # lineal del vector base de sus dos patas, así que su X'X sale de un
+    # bloque de la Gram global. Las Gram se actualizan sumando las filas que
+    # entran en la ventana y restando las que salen, y se recalculan desde
+    # cero en cada vuelta completa de la ventana para no acumular error.
+    def __init__(
+        self,
+        symbols: list[str],
+        window: int,
+        lag: int = 1,
+        step: int = 1,
+        pairs: list[tuple[str, str]] | None = None,
+    ):
+        if window <= 2 * lag + 4:
+            raise ValueError(f"window={window} es demasiado corta para lag={lag}")
+        if not 1 <= step <= window:
+            raise ValueError("step debe estar entre 1 y window")
+
+        self.symbols = list(symbols)
+        self.window = window
+        self.lag = lag
+        self.step = step
+        if pairs is None:
+            pairs = [
+                (self.symbols[i], self.symbols[j])
+                for i, j in zip(*np.triu_indices(len(self.symbols), k=1))
+            ]
+        self.pairs = list(pairs)
+
+        n = len(self.symbols)
+        column = {symbol: k for k, symbol in enumerate(self.symbols)}
+        self._pairs_idx = np.array(
+            [(column[s1], column[s2]) for s1, s2 in self.pairs], dtype=np.intp
+        ).reshape(-1, 2)
+
+        self.reference: np.ndarray | None = None
+        self.history = np.empty((0, n))
+        self.level_gram = np.zeros((n + 1, n + 1))
+        self.adf_gram = np.zeros((1 + n * (lag + 2),) * 2)
+        self._since_eval = 0
+        self._since_recompute = 0
+
+        self._index: list[Any] = []
+        self._scores: list[np.ndarray] = []
+        self._pvalues: list[np.ndarray] = []
+
+    @property
+    def ready(self) -> bool:
+        return len(self.history) >= self.window
+
+    @property
+    def cube(self) -> CointegrationCube:
+        n_pairs = len(self.pairs)
+        return CointegrationCube(
+            index=pd.Index(self._index),
+            pairs=self.pairs,
+            scores=np.array(self._scores).reshape(-1, n_pairs),
+            pvalues=np.array(self._pvalues).reshape(-1, n_pairs),
+            window=self.window,
+            lag=self.lag,
+        )
+
+    def update(self, prices: pd.DataFrame) -> CointegrationCube:
+        # prices: velas nuevas (columnas = símbolos) en orden temporal. Se
+        # evalúa cada `step` velas en cuanto la ventana está completa
+        values = prices[self.symbols].to_numpy(dtype=np.float64)
+        if len(values) == 0:
+            return self.cube
+
+        # Los tests son invariantes a escala y desplazamiento de cada serie:
+        # normalizando por el primer precio las sumas de la Gram quedan en
+        # O(1) y la resta de filas no pierde precisión
+        if self.reference is None:
+            self.reference = values[0].copy()
+        values = values / self.reference - 1.0
+
+        start = 0
+        while start < len(values):
+            stop = min(len(values), start + self.step - self._since_eval)
+            self._append(values[start:stop])
+            self._since_eval += stop - start
+            if self._since_eval == self.step:
+                self._since_eval = 0
+                if self.ready:
+                    scores, pvalues = self._evaluate()
+                    self._index.append(prices.index[stop - 1])
+                    self._scores.append(scores)
+                    self._pvalues.append(pvalues)
+            start = stop
+
+        return self.cube
+
+    def _append(self, rows: np.ndarray):
+        extended = np.vstack([self.history, rows])
+        n_new = len(rows)
+        n_old = max(0, len(extended) - self.window)
+
+        self._since_recompute += n_new
+        if self._since_recompute >= self.window:
+            self.history = extended[-self.window :]
+            self._recompute()
+            return
+
+        # Filas que entran: las nuevas (y, en el ADF, sus retardos)
+        self._add_rows(
+            extended[-n_new:], extended[max(0, len(extended) - n_new - self.lag - 1) :]
+        )
+        # Filas que salen por el principio de la ventana
+        if n_old:
+            self._add_rows(
+                extended[:n_old], extended[: n_old + self.lag + 1], sign=-1.0
+            )
+
+        self.history = extended[-self.window :]
+
+    def _recompute(self):
+        self._since_recompute = 0
+        self.level_gram[:] = 0.0
+        self.adf_gram[:] = 0.0
+        self._add_rows(self.history, self.history)
+
+    def _add_rows(self, levels: np.ndarray, block: np.ndarray, sign: float = 1.0):
+        base = _level_base(levels)
+        self.level_gram += sign * (base.T @ base)
+        base = _adf_base(block, self.lag)
+        if len(base):
+            self.adf_gram += sign * (base.T @ base)
+
+    def _evaluate(self, block_size: int = 4096) -> tuple[np.ndarray, np.ndarray]:
+        n = len(self.symbols)
+        n_rows = self.window - 1 - self.lag
+        n_cols = self.lag + 1
+        scores = np.empty(len(self.pairs))
+
+        for start in range(0, len(self.pairs), block_size):
+            pairs_idx = self._pairs_idx[start : start + block_size]
+            y, x = pairs_idx[:, 0], pairs_idx[:, 1]
+
+            # Regresión de cointegración desde las sumas de la ventana
+            g = self.level_gram
+            nobs = g[0, 0]
+            sxx = g[1 + x, 1 + x] - g[0, 1 + x] ** 2 / nobs
+            sxy = g[1 + x, 1 + y] - g[0, 1 + x] * g[0, 1 + y] / nobs
+            syy = g[1 + y, 1 + y] - g[0, 1 + y] ** 2 / nobs
+            beta = sxy / sxx
+            alpha = (g[0, 1 + y] - beta * g[0, 1 + x]) / nobs
+            rsquared = sxy * beta / syy
+            collinear = rsquared >= 1 - 100 * _SQRTEPS
+
+            # Bloque de la Gram del ADF con el vector base de las dos patas:
+            # [1, L_y, D0_y..Dlag_y, L_x, D0_x..Dlag_x]
+            components = np.arange(self.lag + 2) * n
+            idx = np.column_stack(
+                [
+                    np.zeros(len(pairs_idx), dtype=np.intp),
+                    1 + components + y[:, None],
+                    1 + components + x[:, None],
+                ]
+            )
+            gram = self.adf_gram[idx[:, :, None], idx[:, None, :]]
+
+            # Coeficientes de cada columna del ADF (Δu_t, u_t-1, Δu_t-k) sobre
+            # el vector base
+            k_x = self.lag + 3
+            A = np.zeros((len(pairs_idx), self.lag + 2, idx.shape[1]))
+            A[:, 0, 2] = 1.0
+            A[:, 0, k_x + 1] = -beta
+            A[:, 1, 0] = -alpha
+            A[:, 1, 1] = 1.0
+            A[:, 1, k_x] = -beta
+            for k in range(1, self.lag + 1):
+                A[:, 1 + k, 2 + k] = 1.0
+                A[:, 1 + k, k_x + 1 + k] = -beta
+
+            M = A @ gram @ A.transpose(0, 2, 1)
+            xtx, xty, yty = M[:, 1:, 1:], M[:, 1:, 0], M[:, 0, 0]
+            xtx_inv = np.linalg.inv(xtx)
+            params = np.einsum("pab,pb->pa", xtx_inv, xty)
+            ssr = yty - np.einsum("pa,pa->p", xty, params)
+            cov_00 = xtx_inv[:, 0, 0] * ssr / (n_rows - n_cols)
+            block_scores = params[:, 0] / np.sqrt(cov_00)
+            block_scores[collinear] = -np.inf
+            scores[start : start + len(pairs_idx)] = block_scores
+
+        return scores, mackinnonp_vectorized(scores, regression="c", N=2)
+
+
+def _level_base(levels: np.ndarray) -> np.ndarray:
+    return np.column_stack([np.ones(len(levels)), levels])
+
+
+def _adf_base(block: np.ndarray, lag: int) -> np.ndarray:
+    # Una fila por cada t con lag + 1 precios previos en el bloque:
+    # [1, P_t-1, ΔP_t, ΔP_t-1, ..., ΔP_t-lag]
+    diff = np.diff(block, axis=0)
+    n_rows = len(block) - lag - 1
+    if n_rows <= 0:
+        return np.empty((0, 1 + block.shape[1] * (lag + 2)))
+
+    columns = [np.ones((n_rows, 1)), block[lag : lag + n_rows]]
+    columns += [diff[lag - k : lag - k + n_rows] for k in range(lag + 1)]
+    return np.hstack(columns)
+
+
+def walk_forward_cointegration(
+    df: pd.DataFrame, window: int, lag: int = 1, step: int = 1
+) -> CointegrationCube:
+    scanner = WalkForwardCointegration(list(df.columns), window, lag=lag, step=step)
+    return scanner.update(df)
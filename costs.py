@@ -0,0 +1,127 @@
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from data.candle_store import CandleStore
+
+
+@dataclass(frozen=True)
+class PairCosts:
+    # Costes de un par ya resueltos para sus velas (se envían tal cual a los
+    # procesos del optimizador): coste por unidad de nocional operada en cada
+    # pata y funding de cada vela (None si no hay datos)
+    cost_s1: float
+    cost_s2: float
+    funding_s1: np.ndarray | None = None
+    funding_s2: np.ndarray | None = None
+
+
+@dataclass
+class CostModel:
+    # Comisiones (mezcla maker/taker), slippage en puntos básicos por símbolo y
+    # tipos de funding de los perpetuos. Por defecto, comisiones taker de
+    # Bitget en futuros: los bots de Gainium abren y cierran a mercado.
+    taker_fee_bps: float = 6.0
+    maker_fee_bps: float = 2.0
+    maker_ratio: float = 0.0
+    slippage_bps: float = 0.0
+    symbol_slippage_bps: dict[str, float] = field(default_factory=dict)
+    funding_rates: dict[str, pd.Series] = field(default_factory=dict)
+
+    @classmethod
+    def from_store(
+        cls,
+        store: CandleStore,
+        symbols: list[str],
+        start_ts_ms: int,
+        end_ts_ms: int,
+        **kwargs,
+    ) -> "CostModel":
+        # Funding de los símbolos leído del almacén local (`pairs download
+        # --funding` lo descarga)
+        funding_rates = {}
+        for symbol in symbols:
+            rates = store.read_funding(symbol, start_ts_ms, end_ts_ms)
+            if rates:
+                ts, values = zip(*rates)
+                funding_rates[symbol] = pd.Series(
+                    values, index=pd.to_datetime(ts, unit="ms"), name=symbol
+                )
+        return cls(funding_rates=funding_rates, **kwargs)
+
+    @property
+    def fee_bps(self) -> float:
+        return (
+            self.maker_ratio * self.maker_fee_bps
+            + (1 - self.maker_ratio) * self.taker_fee_bps
+        )
+
+    def leg_cost(self, symbol: str) -> float:
+        slippage = self.symbol_slippage_bps.get(symbol, self.slippage_bps)
+        return (self.fee_bps + slippage) / 10_000
+
+    def funding_per_bar(self, symbol: str, index: pd.Index) -> np.ndarray | None:
+        # Suma de los tipos de funding liquidados durante cada vela: el cobro
+        # de las hh:00 cae en la vela que abre a esa hora
+        rates = self.funding_rates.get(symbol)
+        if rates is None or not isinstance(index, pd.DatetimeIndex) or len(index) < 2:
+            return None
+
+        bars = index.as_unit("ms").asi8
+        events = pd.DatetimeIndex(rates.index).as_unit("ms").asi8
+        t = np.searchsorted(bars, events, side="right") - 1
+        bar_ms = np.median(np.diff(bars))
+        inside = (t >= 0) & (events < bars[-1] + bar_ms)
+        return np.bincount(
+            t[inside], weights=rates.to_numpy()[inside], minlength=len(bars)
+        )
+
+    def for_pair(self, s1: str, s2: str, index: pd.Index) -> PairCosts:
+        return PairCosts(
+            cost_s1=self.leg_cost(s1),
+            cost_s2=self.leg_cost(s2),
+            funding_s1=self.funding_per_bar(s1, index),
+            funding_s2=self.funding_per_bar(s2, index),
+        )
+
+
+def pair_costs(
+    costs: CostModel | PairCosts | None,
+    series1: pd.Series | np.ndarray,
+    series2: pd.Series | np.ndarray,
+) -> PairCosts | None:
+    if costs is None or isinstance(costs, PairCosts):
+        return costs
+    if not isinstance(series1, pd.Series) or not isinstance(series2, pd.Series):
+        raise ValueError("CostModel necesita series con nombre e índice de fechas")
+    return costs.for_pair(str(series1.name), str(series2.name), series1.index)
+
+
+def cost_returns(
+    pos_s1: np.ndarray, pos_s2: np.ndarray, costs: PairCosts
+) -> np.ndarray:
+    # Coste de cada vela como fracción del capital, sobre el último eje (admite
+    # lotes de ventanas x umbrales como position_kernel):
+    # - Comisión y slippage al cambiar de posición en la vela de la señal. La
+    #   pata de S2 solo se opera cuando cambia la de S1 (con hedge ratio su
+    #   peso varía vela a vela, pero el bot no rebalancea)
+    # - Funding de la posición mantenida durante la vela, con el mismo
+    #   desfase de una vela que strategy_returns
+    pos_s1 = np.asarray(pos_s1, dtype=np.float64)
+    pos_s2 = np.nan_to_num(np.asarray(pos_s2, dtype=np.float64))
+    shape = np.broadcast_shapes(pos_s1.shape, pos_s2.shape)
+
+    prev_s1 = np.zeros(shape)
+    prev_s1[..., 1:] = pos_s1[..., :-1]
+    prev_s2 = np.zeros(shape)
+    prev_s2[..., 1:] = pos_s2[..., :-1]
+
+    traded_s2 = np.where(pos_s1 != prev_s1, np.abs(pos_s2 - prev_s2), 0.0)
+    cost = np.abs(pos_s1 - prev_s1) * costs.cost_s1 + traded_s2 * costs.cost_s2
+
+    if costs.funding_s1 is not None:
+        cost += prev_s1 * costs.funding_s1
+    if costs.funding_s2 is not None:
+        cost += prev_s2 * costs.funding_s2
+    return cost
@@ -0,0 +1,142 @@
+import sqlite3
+import threading
+from pathlib import Path
+
+
+class CandleStore:
+    def __init__(self, path: str | Path = "candles.sqlite"):
+        self.path = Path(path)
+        # La conexión se comparte entre los hilos del descargador concurrente
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.lock = threading.RLock()
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS candles (
+                symbol TEXT NOT NULL,
+                timeframe TEXT NOT NULL,
+                ts INTEGER NOT NULL,
+                open REAL,
+                high REAL,
+                low REAL,
+                close REAL,
+                volume REAL,
+                PRIMARY KEY (symbol, timeframe, ts)
+            ) WITHOUT ROWID;
+
+            -- Tipos de funding de los perpetuos en cada liquidación
+            CREATE TABLE IF NOT EXISTS funding (
+                symbol TEXT NOT NULL,
+                ts INTEGER NOT NULL,
+                rate REAL,
+                PRIMARY KEY (symbol, ts)
+            ) WITHOUT ROWID;
+
+            -- Rangos [start, end) ya descargados y con velas cerradas (el
+            -- funding usa el timeframe "funding")
+            CREATE TABLE IF NOT EXISTS coverage (
+                symbol TEXT NOT NULL,
+                timeframe TEXT NOT NULL,
+                start_ts INTEGER NOT NULL,
+                end_ts INTEGER NOT NULL,
+                PRIMARY KEY (symbol, timeframe, start_ts)
+            );
+            """
+        )
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def write(self, symbol: str, timeframe: str, candles: list[list[float]]):
+        # La clave primaria deduplica; una vela repetida sustituye a la anterior
+        # (la última descarga de la vela en curso es la buena)
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO candles VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(symbol, timeframe, int(c[0]), *c[1:6]) for c in candles],
+            )
+
+    def read(
+        self, symbol: str, timeframe: str, start_ts_ms: int, end_ts_ms: int
+    ) -> list[list[float]]:
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT ts, open, high, low, close, volume FROM candles "
+                "WHERE symbol = ? AND timeframe = ? AND ts >= ? AND ts <= ? ORDER BY ts",
+                (symbol, timeframe, start_ts_ms, end_ts_ms),
+            )
+            return [list(row) for row in rows]
+
+    def write_funding(self, symbol: str, rates: list[tuple[int, float]]):
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO funding VALUES (?, ?, ?)",
+                [(symbol, int(ts), rate) for ts, rate in rates],
+            )
+
+    def read_funding(
+        self, symbol: str, start_ts_ms: int, end_ts_ms: int
+    ) -> list[tuple[int, float]]:
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT ts, rate FROM funding "
+                "WHERE symbol = ? AND ts >= ? AND ts <= ? ORDER BY ts",
+                (symbol, start_ts_ms, end_ts_ms),
+            )
+            return [(ts, rate) for ts, rate in rows]
+
+    def mark_covered(
+        self, symbol: str, timeframe: str, start_ts_ms: int, end_ts_ms: int
+    ):
+        if end_ts_ms <= start_ts_ms:
+            return
+
+        with self.lock, self.conn:
+            ranges = self._coverage(symbol, timeframe) + [(start_ts_ms, end_ts_ms)]
+            self.conn.execute(
+                "DELETE FROM coverage WHERE symbol = ? AND timeframe = ?",
+                (symbol, timeframe),
+            )
+            self.conn.executemany(
+                "INSERT INTO coverage VALUES (?, ?, ?, ?)",
+                [(symbol, timeframe, s, e) for s, e in _merge_ranges(ranges)],
+            )
+
+    def missing_ranges(
+        self, symbol: str, timeframe: str, start_ts_ms: int, end_ts_ms: int
+    ) -> list[tuple[int, int]]:
+        # Huecos del intervalo pedido que no están cubiertos por descargas previas
+        missing = []
+        cursor = start_ts_ms
+        for s, e in self._coverage(symbol, timeframe):
+            if e <= cursor:
+                continue
+            if s >= end_ts_ms:
+                break
+            if s > cursor:
+                missing.append((cursor, s))
+            cursor = max(cursor, e)
+        if cursor < end_ts_ms:
+            missing.append((cursor, end_ts_ms))
+
+        return missing
+
+    def _coverage(self, symbol: str, timeframe: str) -> list[tuple[int, int]]:
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT start_ts, end_ts FROM coverage "
+                "WHERE symbol = ? AND timeframe = ? ORDER BY start_ts",
+                (symbol, timeframe),
+            )
+            return [(s, e) for s, e in rows]
+
+
+def _merge_ranges(ranges: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    merged: list[tuple[int, int]] = []
+    for s, e in sorted(ranges):
+        if merged and s <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], e))
+        else:
+            merged.append((s, e))
+
+    return merged
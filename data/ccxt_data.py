@@ -1,12 +1,22 @@
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from functools import cache
 
 import ccxt
 import pandas as pd
 
+from data.candle_store import CandleStore
+from data.rate_limiter import TokenBucket
 
-exchange = ccxt.bitget()
-markets = exchange.load_markets()
+
+@cache
+def get_exchange() -> ccxt.Exchange:
+    # El cliente se crea (y carga los mercados) la primera vez que se usa, no
+    # al importar el módulo
+    exchange = ccxt.bitget()
+    exchange.load_markets()
+    return exchange
 
 
 def to_dataframe(candles: list[list[float]]) -> pd.DataFrame:
@@ -20,13 +30,70 @@ def to_dataframe(candles: list[list[float]]) -> pd.DataFrame:
 
 
 def fetch_ohlcv_range(
-    symbol: str, timeframe: str, start_ts_ms: int, end_ts_ms: int
+    symbol: str,
+    timeframe: str,
+    start_ts_ms: int,
+    end_ts_ms: int,
+    store: CandleStore | None = None,
+    exchange: ccxt.Exchange | None = None,
+    rate_limiter: TokenBucket | None = None,
 ) -> pd.DataFrame:
+    if exchange is None:
+        exchange = get_exchange()
+
+    if store is None:
+        return to_dataframe(
+            _fetch_pages(
+                exchange, symbol, timeframe, start_ts_ms, end_ts_ms, rate_limiter
+            )
+        )
+
+    # Solo se descargan los tramos que faltan en el almacén local. La vela en
+    # curso nunca se da por cubierta, así que se vuelve a pedir en la siguiente
+    # llamada hasta que cierre.
+    timeframe_ms = ccxt.Exchange.parse_timeframe(timeframe) * 1000
+    now_ms = int(time.time() * 1000)
+    last_closed_end = now_ms - now_ms % timeframe_ms
+
+    for gap_start, gap_end in store.missing_ranges(
+        symbol, timeframe, start_ts_ms, end_ts_ms
+    ):
+        candles = _fetch_pages(
+            exchange, symbol, timeframe, gap_start, gap_end, rate_limiter
+        )
+        store.write(symbol, timeframe, candles)
+        if not candles:
+            continue
+
+        # Solo se cubre hasta la última vela recibida: si la paginación se corta
+        # antes de tiempo, el resto del hueco se vuelve a pedir la próxima vez
+        received_end = max(c[0] for c in candles) + timeframe_ms
+        store.mark_covered(
+            symbol,
+            timeframe,
+            gap_start,
+            min(gap_end, last_closed_end, received_end),
+        )
+
+    return to_dataframe(store.read(symbol, timeframe, start_ts_ms, end_ts_ms - 1))
+
+
+def _fetch_pages(
+    exchange: ccxt.Exchange,
+    symbol: str,
+    timeframe: str,
+    start_ts_ms: int,
+    end_ts_ms: int,
+    rate_limiter: TokenBucket | None = None,
+) -> list[list[float]]:
     all_candles: list[list[float]] = []
     current_since = start_ts_ms
     limit = 100
 
     while current_since < end_ts_ms:
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+
         candles = exchange.fetch_ohlcv(
             symbol=symbol, timeframe=timeframe, since=current_since, limit=limit
         )
@@ -41,9 +108,135 @@ def fetch_ohlcv_range(
 
         current_since = last_ts + 1
 
-        time.sleep(1)
+        # Sin limitador compartido se mantiene la pausa fija entre páginas
+        if rate_limiter is None:
+            time.sleep(1)
+
+    return all_candles
+
+
+def fetch_close_prices(
+    symbols: list[str],
+    timeframe: str,
+    start_ts_ms: int,
+    end_ts_ms: int,
+    max_workers: int = 8,
+    store: CandleStore | None = None,
+    exchange: ccxt.Exchange | None = None,
+    rate_limiter: TokenBucket | None = None,
+) -> pd.DataFrame:
+    # Todas las descargas comparten un único token bucket, de modo que el
+    # tiempo total depende del rate limit del exchange y no del nº de símbolos
+    if exchange is None:
+        exchange = get_exchange()
+    if rate_limiter is None:
+        rate_limiter = TokenBucket.from_exchange(exchange)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            symbol: executor.submit(
+                fetch_ohlcv_range,
+                symbol=symbol,
+                timeframe=timeframe,
+                start_ts_ms=start_ts_ms,
+                end_ts_ms=end_ts_ms,
+                store=store,
+                exchange=exchange,
+                rate_limiter=rate_limiter,
+            )
+            for symbol in dict.fromkeys(symbols)
+        }
+        closes = {
+            symbol: future.result()["close"] for symbol, future in futures.items()
+        }
+
+    return pd.concat(closes, axis=1).sort_index()
+
+
+def fetch_funding_rates(
+    symbol: str,
+    start_ts_ms: int,
+    end_ts_ms: int,
+    store: CandleStore | None = None,
+    exchange: ccxt.Exchange | None = None,
+    rate_limiter: TokenBucket | None = None,
+) -> pd.Series:
+    # Histórico de tipos de funding del perpetuo; con store solo se piden los
+    # tramos que faltan, igual que las velas
+    if exchange is None:
+        exchange = get_exchange()
+
+    if store is None:
+        rates, _ = _fetch_funding_pages(
+            exchange, symbol, start_ts_ms, end_ts_ms, rate_limiter
+        )
+    else:
+        now_ms = int(time.time() * 1000)
+        for gap_start, gap_end in store.missing_ranges(
+            symbol, "funding", start_ts_ms, end_ts_ms
+        ):
+            rates, complete = _fetch_funding_pages(
+                exchange, symbol, gap_start, gap_end, rate_limiter
+            )
+            store.write_funding(symbol, rates)
+
+            # Como con las velas: si la paginación no llegó al final del hueco
+            # solo se cubre hasta el último cobro recibido
+            covered_end = min(gap_end, now_ms)
+            if not complete:
+                if not rates:
+                    continue
+                covered_end = min(covered_end, max(ts for ts, _ in rates) + 1)
+            store.mark_covered(symbol, "funding", gap_start, covered_end)
+        rates = store.read_funding(symbol, start_ts_ms, end_ts_ms - 1)
+
+    ts = [t for t, _ in rates]
+    return pd.Series(
+        [rate for _, rate in rates],
+        index=pd.to_datetime(ts, unit="ms"),
+        name=symbol,
+        dtype="float64",
+    )
+
+
+def _fetch_funding_pages(
+    exchange: ccxt.Exchange,
+    symbol: str,
+    start_ts_ms: int,
+    end_ts_ms: int,
+    rate_limiter: TokenBucket | None = None,
+) -> tuple[list[tuple[int, float]], bool]:
+    # Devuelve los cobros y si la paginación llegó hasta end_ts_ms
+    rates: list[tuple[int, float]] = []
+    current_since = start_ts_ms
+
+    while current_since < end_ts_ms:
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+
+        page = exchange.fetch_funding_rate_history(
+            symbol=symbol, since=current_since, limit=100
+        )
+        page = [item for item in page if item["timestamp"] >= current_since]
+        if not page:
+            return rates, False
+
+        rates.extend(
+            (item["timestamp"], item["fundingRate"])
+            for item in page
+            if item["timestamp"] < end_ts_ms
+        )
+
+        last_ts = page[-1]["timestamp"]
+        if last_ts >= end_ts_ms:
+            break
+
+        current_since = last_ts + 1
+
+        if rate_limiter is None:
+            time.sleep(1)
 
-    return to_dataframe(all_candles)
+    return rates, True
 
 
 def from_dt_to_ts_ms(dt: datetime) -> int:
@@ -91,18 +284,16 @@ def from_dt_to_ts_ms(dt: datetime) -> int:
 # ]
 
 
-# df_close = pd.DataFrame()
 # end_dt = datetime.now()
 # start_dt = end_dt - timedelta(days=30)
 
-# for pair in pairs:
-#     df = fetch_ohlcv_range(
-#         symbol=pair,
-#         timeframe="15m",
-#         start_ts_ms=from_dt_to_ts_ms(start_dt),
-#         end_ts_ms=from_dt_to_ts_ms(end_dt),
-#     )
-#     df_close[pair] = df["close"]
+# df_close = fetch_close_prices(
+#     symbols=pairs,
+#     timeframe="15m",
+#     start_ts_ms=from_dt_to_ts_ms(start_dt),
+#     end_ts_ms=from_dt_to_ts_ms(end_dt),
+#     store=CandleStore("candles.sqlite"),
+# )
 
 # print(df_close.head())
-# df_close.to_csv("ccxt_data_all_pairs_15m.csv", index=True)
+# write_frame(df_close, "ccxt_data_all_pairs_15m.parquet")
@@ -1,4 +1,5 @@
-import yfinance as yf
+from functools import cache
+
 import pandas as pd
 
 
@@ -6,4 +7,14 @@ tickers = ["NEE", "FSLR", "ENPH", "PLUG", "BEP", "AQN", "PBW", "FAN", "ICLN"]
 start_date = "2015-01-01"
 end_date = "2025-01-01"
 
-df: pd.DataFrame = yf.download(tickers, start=start_date, end=end_date).Close.dropna()
+
+@cache
+def load_prices(
+    tickers: tuple[str, ...] = tuple(tickers),
+    start_date: str = start_date,
+    end_date: str = end_date,
+) -> pd.DataFrame:
+    # La descarga se hace al pedir los datos y no al importar el módulo
+    import yfinance as yf
+
+    return yf.download(list(tickers), start=start_date, end=end_date).Close.dropna()
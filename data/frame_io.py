@@ -0,0 +1,98 @@
+from pathlib import Path
+
+import pandas as pd
+
+# Lectura/escritura de DataFrames (paneles de precios, backtests, métricas) en
+# Parquet, Feather o CSV según la extensión del fichero. Parquet y Feather
+# guardan los tipos (el índice de fechas no se vuelve a parsear en cada
+# lectura) y permiten leer solo algunas columnas. pyarrow se importa al usarse.
+
+FORMATS = {".parquet": "parquet", ".feather": "feather", ".csv": "csv"}
+
+
+def frame_format(path: str | Path) -> str:
+    suffix = Path(path).suffix.lower()
+    if suffix not in FORMATS:
+        raise ValueError(f"Formato desconocido para {path}: usa {', '.join(FORMATS)}")
+    return FORMATS[suffix]
+
+
+def _typed_index(df: pd.DataFrame) -> pd.DataFrame:
+    # Índices "datetime" leídos como texto (CSV antiguos) pasan a fechas
+    if df.index.name == "datetime" and not isinstance(df.index, pd.DatetimeIndex):
+        df = df.copy(deep=False)
+        df.index = pd.to_datetime(df.index, format="ISO8601")
+    return df
+
+
+def _check_columns(path: str | Path, available: list[str], columns: list[str]):
+    # Mejor un error claro que el de pandas/pyarrow a mitad de la lectura
+    available_set = set(available)
+    missing = [c for c in columns if c not in available_set]
+    if missing:
+        raise KeyError(f"Columnas que no están en {path}: {', '.join(missing)}")
+
+
+def write_frame(df: pd.DataFrame, path: str | Path, index: bool = True):
+    fmt = frame_format(path)
+    df = _typed_index(df)
+
+    if fmt == "csv":
+        df.to_csv(path, index=index)
+        return
+
+    import pyarrow as pa
+
+    # Feather no admite índices arbitrarios: se guarda como columna y los
+    # metadatos de pandas permiten restaurarlo al leer
+    table = pa.Table.from_pandas(df, preserve_index=True if index else False)
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        pq.write_table(table, path, compression="zstd")
+    else:
+        import pyarrow.feather as feather
+
+        feather.write_feather(table, path, compression="zstd")
+
+
+def read_frame(path: str | Path, columns: list[str] | None = None) -> pd.DataFrame:
+    # Con `columns` solo se leen esas columnas (y el índice) del fichero
+    fmt = frame_format(path)
+
+    if fmt == "csv":
+        usecols = None
+        if columns is not None:
+            header = pd.read_csv(path, nrows=0).columns
+            _check_columns(path, list(header[1:]), columns)
+            usecols = [header[0], *columns]
+        # En CSV la primera columna se toma siempre como índice
+        df = pd.read_csv(path, index_col=0, usecols=usecols)
+        if columns is not None:
+            df = df[columns]
+        return _typed_index(df)
+
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        schema = pq.read_schema(path, memory_map=True)
+        read_table = pq.read_table
+    else:
+        import pyarrow as pa
+        import pyarrow.feather as feather
+
+        with pa.memory_map(str(path)) as source:
+            schema = pa.ipc.open_file(source).schema
+        read_table = feather.read_table
+
+    if columns is not None:
+        _check_columns(path, schema.names, columns)
+        # Las columnas del índice (los RangeIndex solo están en los metadatos)
+        metadata = schema.pandas_metadata or {}
+        index_columns = [
+            name for name in metadata.get("index_columns", []) if isinstance(name, str)
+        ]
+        columns = [*index_columns, *columns]
+
+    table = read_table(path, columns=columns, memory_map=True)
+    return table.to_pandas()
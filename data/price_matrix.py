@@ -0,0 +1,117 @@
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass
+class PriceMatrix:
+    # Cierres de un universo como una sola matriz (velas x símbolos) en orden
+    # Fortran: cada símbolo es un bloque contiguo, así que extraer una columna
+    # o un par no copia. El índice son epoch en ms (int64) y la matriz puede
+    # ser float32 para reducir a la mitad la memoria de universos grandes; los
+    # cálculos por par se hacen en float64.
+    values: np.ndarray
+    index: np.ndarray
+    symbols: list[str]
+    columns: dict[str, int] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        if self.values.ndim != 2:
+            raise ValueError("values debe ser una matriz velas x símbolos")
+        if self.values.shape != (len(self.index), len(self.symbols)):
+            raise ValueError(
+                f"Forma {self.values.shape} incompatible con "
+                f"{len(self.index)} velas y {len(self.symbols)} símbolos"
+            )
+        if not self.values.flags.f_contiguous:
+            self.values = np.asfortranarray(self.values)
+        self.index = np.asarray(self.index, dtype=np.int64)
+        self.columns = {symbol: k for k, symbol in enumerate(self.symbols)}
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self.values.shape
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes + self.index.nbytes
+
+    @classmethod
+    def from_frame(
+        cls, df: pd.DataFrame, dtype: type[np.floating] = np.float64
+    ) -> "PriceMatrix":
+        index = pd.DatetimeIndex(df.index)
+        return cls(
+            values=np.asfortranarray(df.to_numpy(dtype=dtype)),
+            index=index.as_unit("ms").asi8,
+            symbols=[str(c) for c in df.columns],
+        )
+
+    def to_frame(self) -> pd.DataFrame:
+        # Vista sobre la misma memoria (la matriz Fortran es justo el bloque
+        # que pandas guarda por columnas), sin copiar los precios
+        index = pd.DatetimeIndex(self.index.astype("datetime64[ms]"), name="datetime")
+        return pd.DataFrame(self.values, index=index, columns=self.symbols, copy=False)
+
+    def column(self, symbol: str) -> np.ndarray:
+        return self.values[:, self.columns[symbol]]
+
+    def select(self, symbols: list[str]) -> "PriceMatrix":
+        idx = [self.columns[symbol] for symbol in symbols]
+        return PriceMatrix(self.values[:, idx], self.index, list(symbols))
+
+    def astype(self, dtype: type[np.floating]) -> "PriceMatrix":
+        return PriceMatrix(
+            np.asfortranarray(self.values, dtype=dtype), self.index, self.symbols
+        )
+
+    def save_npy(self, path: str | Path):
+        # Directorio con values.npy, index.npy y symbols.json; load_npy lo abre
+        # con memmap sin leerlo entero
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        np.save(path / "values.npy", self.values)
+        np.save(path / "index.npy", self.index)
+        (path / "symbols.json").write_text(json.dumps(self.symbols))
+
+    @classmethod
+    def load_npy(cls, path: str | Path, mmap: bool = True) -> "PriceMatrix":
+        path = Path(path)
+        mmap_mode = "r" if mmap else None
+        return cls(
+            values=np.load(path / "values.npy", mmap_mode=mmap_mode),
+            index=np.load(path / "index.npy", mmap_mode=mmap_mode),
+            symbols=json.loads((path / "symbols.json").read_text()),
+        )
+
+    @classmethod
+    def from_parquet(
+        cls,
+        path: str | Path,
+        symbols: list[str] | None = None,
+        dtype: type[np.floating] = np.float64,
+        index_column: str = "datetime",
+    ) -> "PriceMatrix":
+        # Solo se leen las columnas pedidas. Parquet está codificado por
+        # columnas, así que hay una copia al decodificar, pero cada columna se
+        # escribe directamente en su sitio de la matriz final
+        import pyarrow.parquet as pq
+
+        if symbols is None:
+            schema = pq.read_schema(path, memory_map=True)
+            symbols = [name for name in schema.names if name != index_column]
+        table = pq.read_table(path, columns=[index_column, *symbols], memory_map=True)
+
+        values = np.empty((table.num_rows, len(symbols)), dtype=dtype, order="F")
+        for k, symbol in enumerate(symbols):
+            values[:, k] = table.column(symbol).to_numpy()
+        index = (
+            table.column(index_column)
+            .to_numpy()
+            .astype("datetime64[ms]")
+            .astype(np.int64)
+        )
+        return cls(values, index, list(symbols))
@@ -0,0 +1,35 @@
+import threading
+import time
+
+import ccxt
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_exchange(
+        cls, exchange: ccxt.Exchange, capacity: float = 1.0
+    ) -> "TokenBucket":
+        # ccxt expresa rateLimit como milisegundos entre peticiones
+        return cls(rate=1000 / exchange.rateLimit, capacity=capacity)
+
+    def acquire(self, tokens: float = 1.0):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+
+            time.sleep(wait)
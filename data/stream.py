@@ -0,0 +1,93 @@
+import asyncio
+from collections.abc import AsyncIterator
+from typing import Protocol
+
+import ccxt
+
+
+class CandleFeed(Protocol):
+    # Subconjunto de la interfaz de ccxt.pro que usa el modo streaming
+    async def watch_ohlcv(
+        self, symbol: str, timeframe: str = "1m", since=None, limit=None
+    ) -> list[list[float]]: ...
+
+
+class FeedExhausted(Exception):
+    pass
+
+
+class FakeCandleFeed:
+    # Feed local que reproduce velas ya conocidas como si llegaran por
+    # WebSocket, con la semántica por defecto de ccxt.pro (newUpdates=True):
+    # la primera llamada a watch_ohlcv devuelve la instantánea (las últimas
+    # `snapshot` velas, la última aún en curso) y las siguientes solo la vela
+    # que ha cambiado desde la llamada anterior. Cada vela llega en `updates`
+    # actualizaciones; las intermedias son parciales (cierre = apertura).
+    def __init__(
+        self,
+        candles: dict[str, list[list[float]]],
+        delay: float = 0.0,
+        snapshot: int = 1,
+        updates: int = 1,
+    ):
+        self.candles = candles
+        self.delay = delay
+        self.updates = updates
+        self.start = (snapshot - 1) * updates
+        self.cursor = dict.fromkeys(candles, self.start)
+
+    async def watch_ohlcv(
+        self, symbol: str, timeframe: str = "1m", since=None, limit=None
+    ) -> list[list[float]]:
+        await asyncio.sleep(self.delay)
+
+        candles = self.candles[symbol]
+        k = self.cursor[symbol]
+        if k >= len(candles) * self.updates:
+            raise FeedExhausted(symbol)
+        self.cursor[symbol] = k + 1
+
+        i, update = divmod(k, self.updates)
+        current = list(candles[i])
+        if update < self.updates - 1:
+            ts, open_ = current[:2]
+            current = [ts, open_, open_, open_, open_, 0.0]
+        if k > self.start:
+            return [current]
+
+        history = [list(c) for c in candles[:i]]
+        return (history + [current])[-(limit or i + 1) :]
+
+    async def close(self):
+        pass
+
+
+async def watch_closed_candles(
+    feed: CandleFeed, symbol: str, timeframe: str, retry_delay: float = 1.0
+) -> AsyncIterator[list[float]]:
+    # Emite cada vela en cuanto cierra, es decir, en cuanto el stream entrega
+    # la primera actualización de la vela siguiente. Con newUpdates (por
+    # defecto en ccxt.pro) cada llamada solo trae las velas que han cambiado,
+    # así que se guarda la última versión de la vela en curso para emitirla
+    # cuando llegue una más reciente.
+    last_emitted: float | None = None
+    pending: list[float] | None = None
+
+    while True:
+        try:
+            candles = await feed.watch_ohlcv(symbol, timeframe)
+        except FeedExhausted:
+            return
+        except ccxt.NetworkError as e:
+            print(f"Error en el stream de {symbol}: {e}. Reintentando...")
+            await asyncio.sleep(retry_delay)
+            continue
+
+        for candle in sorted(candles, key=lambda c: c[0]):
+            if last_emitted is not None and candle[0] <= last_emitted:
+                continue
+            if pending is not None and candle[0] > pending[0]:
+                last_emitted = pending[0]
+                yield pending
+            if pending is None or candle[0] >= pending[0]:
+                pending = candle
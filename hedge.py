@@ -0,0 +1,204 @@
+import math
+from dataclasses import dataclass
+from typing import Literal
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class SpreadModel:
+    # Cómo se construye el spread S1 - beta * S2 de un par:
+    # - diff: beta = 1 (la resta de precios de siempre)
+    # - ols: beta y constante fijas por MCO sobre toda la muestra (como la
+    #   regresión de Engle-Granger; mira al futuro, solo para análisis)
+    # - rolling_ols: MCO sobre las últimas `window` velas
+    # - kalman: beta y constante como paseo aleatorio (filtro de Kalman), con
+    #   `window` velas de calentamiento
+    # En rolling_ols y kalman el spread de la vela t usa la estimación hecha
+    # con las velas anteriores, así que no hay sesgo de anticipación.
+    method: Literal["diff", "ols", "rolling_ols", "kalman"] = "diff"
+    window: int = 500
+    delta: float = 1e-4
+    obs_var: float = 1e-3
+
+    @property
+    def warmup_bars(self) -> int:
+        return self.window if self.method in ("rolling_ols", "kalman") else 0
+
+    def fit(self, s1: np.ndarray, s2: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        # Devuelve (spread, hedge_ratio) vela a vela; NaN durante el calentamiento
+        s1 = np.asarray(s1, dtype=np.float64)
+        s2 = np.asarray(s2, dtype=np.float64)
+
+        if self.method == "diff":
+            return s1 - s2, np.ones_like(s1)
+        if self.method == "ols":
+            alpha, beta = ols_hedge(s1, s2)
+            return s1 - alpha - beta * s2, np.full_like(s1, beta)
+        if self.method == "rolling_ols":
+            return rolling_ols_hedge(s1, s2, self.window)
+        if self.method == "kalman":
+            return kalman_hedge(s1, s2, self.delta, self.obs_var, self.window)
+        raise ValueError(f"Método de spread desconocido: {self.method}")
+
+    def online(self) -> "RollingOLSHedge | KalmanHedge | None":
+        # Estimador vela a vela para el trading en vivo
+        if self.method == "diff":
+            return None
+        if self.method == "rolling_ols":
+            return RollingOLSHedge(self.window)
+        if self.method == "kalman":
+            return KalmanHedge(self.delta, self.obs_var, self.window)
+        raise ValueError(f"El método {self.method} no tiene versión en vivo")
+
+
+def ols_hedge(y: np.ndarray, x: np.ndarray) -> tuple[float, float]:
+    x_mean, y_mean = x.mean(), y.mean()
+    x_c = x - x_mean
+    beta = float((x_c * (y - y_mean)).sum() / (x_c * x_c).sum())
+    return float(y_mean - beta * x_mean), beta
+
+
+def rolling_ols_hedge(
+    y: np.ndarray, x: np.ndarray, window: int
+) -> tuple[np.ndarray, np.ndarray]:
+    # MCO rodante de y ~ alpha + beta * x con sumas acumuladas: O(n) para
+    # cualquier ventana. Se resta el primer valor de cada serie para que las
+    # sumas de cuadrados no pierdan precisión (beta no cambia)
+    n = len(y)
+    spread = np.full(n, np.nan)
+    beta = np.full(n, np.nan)
+    if n < window:
+        return spread, beta
+
+    x_c = x - x[0]
+    y_c = y - y[0]
+
+    def window_sums(values: np.ndarray) -> np.ndarray:
+        csum = np.concatenate([[0.0], np.cumsum(values)])
+        return csum[window:] - csum[:-window]
+
+    sx, sy = window_sums(x_c), window_sums(y_c)
+    sxx, sxy = window_sums(x_c * x_c), window_sums(x_c * y_c)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        b = (window * sxy - sx * sy) / (window * sxx - sx * sx)
+    a = (sy - b * sx) / window
+
+    # Estimación con las velas [t - window + 1, t]; el spread de t usa la de t - 1
+    beta[window - 1 :] = b
+    spread[window:] = y_c[window:] - a[:-1] - b[:-1] * x_c[window:]
+    return spread, beta
+
+
+def kalman_hedge(
+    y: np.ndarray,
+    x: np.ndarray,
+    delta: float = 1e-4,
+    obs_var: float = 1e-3,
+    burn_in: int = 0,
+) -> tuple[np.ndarray, np.ndarray]:
+    # Misma recursión que KalmanHedge.update sobre floats de Python (evita el
+    # coste por elemento de los escalares de NumPy)
+    kalman = KalmanHedge(delta, obs_var, burn_in)
+    spread = np.empty(len(y))
+    beta = np.empty(len(y))
+    for t, (y_t, x_t) in enumerate(zip(y.tolist(), x.tolist())):
+        spread[t] = kalman.update(y_t, x_t)
+        beta[t] = kalman.hedge_ratio
+    return spread, beta
+
+
+class RollingOLSHedge:
+    # Versión incremental de rolling_ols_hedge: sumas de la ventana sobre un
+    # buffer circular, O(1) por vela, recalculadas en cada vuelta del buffer
+    def __init__(self, window: int):
+        self.window = window
+        self.buffer = np.zeros((window, 2))
+        self.count = 0
+        self.pos = 0
+        self.reference: tuple[float, float] | None = None
+        self.sums = np.zeros(4)  # x, y, x², x·y
+        self.alpha = math.nan
+        self.beta = math.nan
+
+    @property
+    def hedge_ratio(self) -> float:
+        return self.beta
+
+    def update(self, y: float, x: float) -> float:
+        if self.reference is None:
+            self.reference = (y, x)
+        y_c, x_c = y - self.reference[0], x - self.reference[1]
+
+        spread = y_c - self.alpha - self.beta * x_c
+
+        if self.count == self.window:
+            old_x, old_y = self.buffer[self.pos]
+            self.sums -= (old_x, old_y, old_x * old_x, old_x * old_y)
+        else:
+            self.count += 1
+        self.buffer[self.pos] = (x_c, y_c)
+        self.sums += (x_c, y_c, x_c * x_c, x_c * y_c)
+        self.pos = (self.pos + 1) % self.window
+
+        if self.count == self.window:
+            if self.pos == 0:
+                xs, ys = self.buffer[:, 0], self.buffer[:, 1]
+                self.sums[:] = (xs.sum(), ys.sum(), (xs * xs).sum(), (xs * ys).sum())
+            sx, sy, sxx, sxy = self.sums
+            n = self.window
+            self.beta = (n * sxy - sx * sy) / (n * sxx - sx * sx)
+            self.alpha = (sy - self.beta * sx) / n
+
+        return spread
+
+
+class KalmanHedge:
+    # Filtro de Kalman con estado [beta, alpha] como paseo aleatorio y
+    # observación S1 = beta * S2 + alpha + ruido. Internamente trabaja con los
+    # precios divididos por el primero de cada serie, así delta y obs_var no
+    # dependen de la escala de los precios (TAO vs SHIB).
+    def __init__(self, delta: float = 1e-4, obs_var: float = 1e-3, burn_in: int = 0):
+        self.state_var = delta / (1 - delta)
+        self.obs_var = obs_var
+        self.burn_in = burn_in
+        self.count = 0
+        self.scale: tuple[float, float] | None = None
+        self.beta = 1.0
+        self.alpha = 0.0
+        self.p00, self.p01, self.p11 = 1.0, 0.0, 1.0
+
+    @property
+    def hedge_ratio(self) -> float:
+        if self.scale is None:
+            return math.nan
+        return self.beta * self.scale[0] / self.scale[1]
+
+    def update(self, y: float, x: float) -> float:
+        # Devuelve el spread de la vela con la estimación previa (error de
+        # predicción, en unidades de S1) y actualiza beta y alpha
+        if self.scale is None:
+            self.scale = (y, x)
+        y0, x0 = self.scale
+        y_n, x_n = y / y0, x / x0
+
+        r00 = self.p00 + self.state_var
+        r01 = self.p01
+        r11 = self.p11 + self.state_var
+
+        error = y_n - self.beta * x_n - self.alpha
+        rh0 = r00 * x_n + r01
+        rh1 = r01 * x_n + r11
+        q = x_n * rh0 + rh1 + self.obs_var
+        k0, k1 = rh0 / q, rh1 / q
+
+        self.beta += k0 * error
+        self.alpha += k1 * error
+        self.p00 = r00 - k0 * rh0
+        self.p01 = r01 - k0 * rh1
+        self.p11 = r11 - k1 * rh1
+
+        self.count += 1
+        if self.count <= self.burn_in:
+            return math.nan
+        return error * y0
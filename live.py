@@ -0,0 +1,349 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+
+from data.candle_store import CandleStore
+from data.ccxt_data import fetch_close_prices, from_dt_to_ts_ms
+from data.stream import CandleFeed, watch_closed_candles
+from registry import LiveConfig, PairConfig, PairRegistry, PairState
+from signals import SpreadZScoreTracker, next_position
+from strategy_utils import (
+    WebhookDispatcher,
+    esperar_al_siguiente_cuarto,
+    get_dispatcher,
+)
+
+
+CONFIG_PATH = "pairs.toml"
+
+
+def apply_signals(
+    pair: PairConfig,
+    state: PairState,
+    zscore: float,
+    config: LiveConfig,
+    dispatcher: WebhookDispatcher | None = None,
+) -> list[tuple[str, str, str]]:
+    signals = decide_signals(pair, state, zscore, config)
+    if signals:
+        dispatch_signals(signals, dispatcher or get_dispatcher(config.url_bot))
+    return signals
+
+
+def decide_signals(
+    pair: PairConfig, state: PairState, zscore: float, config: LiveConfig
+) -> list[tuple[str, str, str]]:
+    # Actualiza las posiciones del par y devuelve los webhooks a enviar como
+    # tuplas (action, uuid, symbol)
+    print(f"   👉 Z-Score actual: {zscore:.3f} (Umbral: ±{pair.zscore})")
+    print(
+        f"   📊 Posiciones activas -> S1 Long: {state.s1_long} | S1 Short: {state.s1_short}"
+    )
+    print(
+        f"   📊 Posiciones activas -> S2 Long: {state.s2_long} | S2 Short: {state.s2_short}"
+    )
+
+    # La regla es la misma que la del backtest (signals.next_position); aquí
+    # solo se traduce el cambio de posición a webhooks. Las dos patas de cada
+    # cierre/entrada se envían en paralelo
+    previous = state.position
+    position = next_position(previous, zscore, pair.zscore)
+    signals: list[tuple[str, str, str]] = []
+
+    if previous == 1 and position != 1:
+        print(
+            "   🔴 Z-Score cruzó 0 hacia arriba. CERRANDO posiciones LONG de S1 y SHORT de S2."
+        )
+        signals.append(("closeDeal", config.uuid_long, pair.s1_gainium))
+        signals.append(("closeDeal", config.uuid_short, pair.s2_gainium))
+    elif previous == -1 and position != -1:
+        print(
+            "   🟢 Z-Score cruzó 0 hacia abajo. CERRANDO posiciones SHORT de S1 y LONG de S2."
+        )
+        signals.append(("closeDeal", config.uuid_short, pair.s1_gainium))
+        signals.append(("closeDeal", config.uuid_long, pair.s2_gainium))
+
+    if position == -1 and previous != -1:
+        print(
+            f"   🚀 SEÑAL ENTRADA: Sell {pair.s1} y Buy {pair.s2} (Z-Score > {pair.zscore})"
+        )
+        signals.append(("startDeal", config.uuid_short, pair.s1_gainium))
+        signals.append(("startDeal", config.uuid_long, pair.s2_gainium))
+    elif position == 1 and previous != 1:
+        print(
+            f"   🚀 SEÑAL ENTRADA: Buy {pair.s1} y Sell {pair.s2} (Z-Score < -{pair.zscore})"
+        )
+        signals.append(("startDeal", config.uuid_long, pair.s1_gainium))
+        signals.append(("startDeal", config.uuid_short, pair.s2_gainium))
+    state.position = position
+
+    if not signals:
+        print("   💤 Sin cambios en las posiciones operativas.")
+
+    return signals
+
+
+def dispatch_signals(
+    signals: list[tuple[str, str, str]], dispatcher: WebhookDispatcher
+):
+    # Todas las patas se envían en paralelo, pero los cierres se confirman
+    # antes de abrir operaciones nuevas
+    closes = [s for s in signals if s[0] == "closeDeal"]
+    starts = [s for s in signals if s[0] == "startDeal"]
+    for batch in (closes, starts):
+        if batch:
+            dispatcher.send_many(batch)
+
+
+def live_strategy(
+    config_path: str = CONFIG_PATH, store_path: str | Path = "candles.sqlite"
+):
+    # Pares, parámetros y posiciones abiertas salen del registro: las
+    # posiciones sobreviven a un reinicio y el fichero de configuración se
+    # puede editar sin parar el bucle
+    registry = PairRegistry(config_path)
+    print(
+        f"📋 {len(registry.pairs)} pares cargados de {config_path} "
+        f"(estado en {registry.state_path})"
+    )
+
+    # Las velas ya descargadas se guardan en disco: cada ronda solo pide la cola
+    store = CandleStore(store_path)
+    trackers: dict[tuple[str, str], SpreadZScoreTracker] = {}
+
+    while True:
+        esperar_al_siguiente_cuarto()
+
+        print("\n==================================================")
+        print(
+            f"⏰ Ronda de revisión iniciada a las: {datetime.now().strftime('%H:%M:%S')}"
+        )
+        print("==================================================")
+
+        if registry.reload_if_changed():
+            print(f"🔄 Configuración recargada: {len(registry.pairs)} pares")
+
+        timings = run_round(registry, trackers, store)
+        print(
+            "\n⏱️  Tiempos de la ronda: "
+            + " | ".join(f"{stage}: {ms:.0f} ms" for stage, ms in timings.items())
+        )
+
+        dispatcher = get_dispatcher(registry.config.url_bot)
+        if dispatcher.sent:
+            print(f"📨 Webhooks: {dispatcher.stats()}")
+
+
+def run_round(
+    registry: PairRegistry,
+    trackers: dict[tuple[str, str], SpreadZScoreTracker],
+    store: CandleStore,
+    dispatcher: WebhookDispatcher | None = None,
+) -> dict[str, float]:
+    # Ronda en tres etapas para que la latencia no crezca con el nº de pares:
+    # 1) descarga en paralelo de todos los símbolos (sin repetir los que
+    #    comparten varios pares), 2) evaluación de cada par y 3) envío
+    #    simultáneo de las señales de todos los pares
+    config = registry.config
+    start = time.perf_counter()
+    sync_trackers(config.pairs, trackers, store, config.timeframe)
+    fetched = time.perf_counter()
+
+    signals: list[tuple[str, str, str]] = []
+    for pair in config.pairs:
+        print(f"\n🔍 Analizando par: {pair.s1} vs {pair.s2}")
+        tracker = trackers[pair.key]
+        if not tracker.ready:
+            print("   ⏳ Historial insuficiente para la ventana, se omite el par.")
+            continue
+        if pair.spread.method != "diff":
+            print(
+                f"   ⚖️  Hedge ratio ({pair.spread.method}): {tracker.hedge_ratio:.6g}"
+            )
+        signals += decide_signals(pair, registry.state(pair), tracker.zscore, config)
+    evaluated = time.perf_counter()
+
+    if signals:
+        dispatch_signals(signals, dispatcher or get_dispatcher(config.url_bot))
+        registry.save_state()
+    dispatched = time.perf_counter()
+
+    return {
+        "descarga": (fetched - start) * 1000,
+        "evaluación": (evaluated - fetched) * 1000,
+        "envío": (dispatched - evaluated) * 1000,
+        "total": (dispatched - start) * 1000,
+    }
+
+
+def refresh_trackers(
+    pairs: list[PairConfig], trackers: dict[tuple[str, str], SpreadZScoreTracker]
+):
+    # Tras una recarga de la configuración: los pares nuevos o con otra ventana
+    # o construcción del spread empiezan de cero y los que ya no están se
+    # descartan
+    keys = {pair.key for pair in pairs}
+    for key in [key for key in trackers if key not in keys]:
+        del trackers[key]
+
+    for pair in pairs:
+        tracker = trackers.get(pair.key)
+        if (
+            tracker is None
+            or tracker.rolling.window != pair.window
+            or tracker.model != pair.spread
+        ):
+            trackers[pair.key] = SpreadZScoreTracker(pair.window, pair.spread)
+
+
+def sync_trackers(
+    pairs: list[PairConfig],
+    trackers: dict[tuple[str, str], SpreadZScoreTracker],
+    store: CandleStore,
+    timeframe: int,
+):
+    # Los z-scores se mantienen de forma incremental: un tracker nuevo se
+    # calienta con la ventana completa y los demás solo ingieren las velas
+    # cerradas desde la última procesada. Se descarga una sola vez cada
+    # símbolo desde la vela más antigua que necesite algún par.
+    refresh_trackers(pairs, trackers)
+
+    data_to = datetime.now()
+    data_from = data_to
+    for pair in pairs:
+        tracker = trackers[pair.key]
+        if tracker.last_ts is None:
+            warmup = pair.window + pair.spread.warmup_bars + 2
+            pair_from = data_to - timedelta(minutes=timeframe * warmup)
+        else:
+            next_bar = tracker.last_ts + pd.Timedelta(minutes=timeframe)
+            pair_from = next_bar.tz_localize("UTC").to_pydatetime()
+        data_from = min(data_from.astimezone(), pair_from.astimezone())
+
+    symbols = list(dict.fromkeys(s for pair in pairs for s in pair.key))
+    print(f"\n   Descargando datos OHLCV de {len(symbols)} símbolos...")
+    df_close = fetch_close_prices(
+        symbols=symbols,
+        timeframe=f"{timeframe}m",
+        start_ts_ms=from_dt_to_ts_ms(data_from),
+        end_ts_ms=from_dt_to_ts_ms(data_to),
+        store=store,
+    )
+
+    # Solo velas cerradas: la vela en curso aún puede cambiar
+    last_closed = pd.Timestamp(
+        from_dt_to_ts_ms(data_to) - timeframe * 60_000, unit="ms"
+    )
+    df_close = df_close[df_close.index <= last_closed]
+
+    for pair in pairs:
+        # Alineamos ambas patas por fecha; el dropna evita datos faltantes
+        df_pair = df_close[[pair.s1, pair.s2]].dropna()
+        df_pair.columns = ["S1", "S2"]
+        trackers[pair.key].ingest(df_pair)
+
+
+def _pairs_by_symbol(pairs: list[PairConfig]) -> dict[str, list[PairConfig]]:
+    pairs_by_symbol: dict[str, list[PairConfig]] = {}
+    for pair in pairs:
+        pairs_by_symbol.setdefault(pair.s1, []).append(pair)
+        pairs_by_symbol.setdefault(pair.s2, []).append(pair)
+    return pairs_by_symbol
+
+
+async def live_stream_strategy(
+    feed: CandleFeed | None = None,
+    registry: PairRegistry | None = None,
+    store: CandleStore | None = None,
+):
+    # Modo event-driven: en lugar de esperar al siguiente cuarto y sondear la
+    # API REST, se escuchan los streams de velas y cada par se evalúa en cuanto
+    # cierran las velas de sus dos patas
+    if registry is None:
+        registry = PairRegistry(CONFIG_PATH)
+    if feed is None:
+        import ccxt.pro
+
+        feed = ccxt.pro.bitget()
+
+    config = registry.config
+    trackers: dict[tuple[str, str], SpreadZScoreTracker] = {}
+    refresh_trackers(config.pairs, trackers)
+
+    # Calentamiento de las ventanas con el histórico REST (y el almacén local)
+    if store is not None:
+        await asyncio.to_thread(
+            sync_trackers, config.pairs, trackers, store, config.timeframe
+        )
+
+    pairs_by_symbol = _pairs_by_symbol(config.pairs)
+    queue: asyncio.Queue[tuple[str, list[float] | None]] = asyncio.Queue()
+
+    async def pump(symbol: str):
+        async for candle in watch_closed_candles(feed, symbol, f"{config.timeframe}m"):
+            await queue.put((symbol, candle))
+        await queue.put((symbol, None))
+
+    # Los streams abiertos son los de los símbolos iniciales: una recarga en
+    # caliente cambia ventanas y umbrales, pero los símbolos nuevos necesitan
+    # reiniciar el modo streaming
+    tasks = [asyncio.create_task(pump(symbol)) for symbol in pairs_by_symbol]
+    streamed = set(pairs_by_symbol)
+    closes: dict[int, dict[str, float]] = {}
+    active = len(tasks)
+
+    try:
+        while active:
+            symbol, candle = await queue.get()
+            if candle is None:
+                active -= 1
+                continue
+
+            if registry.reload_if_changed():
+                config = registry.config
+                refresh_trackers(config.pairs, trackers)
+                if store is not None:
+                    await asyncio.to_thread(
+                        sync_trackers, config.pairs, trackers, store, config.timeframe
+                    )
+                pairs_by_symbol = _pairs_by_symbol(config.pairs)
+                missing = set(pairs_by_symbol) - streamed
+                print(f"🔄 Configuración recargada: {len(config.pairs)} pares")
+                if missing:
+                    print(
+                        f"   ⚠️  Sin stream para {sorted(missing)}: reinicia el modo streaming"
+                    )
+
+            ts = int(candle[0])
+            closes.setdefault(ts, {})[symbol] = candle[4]
+            bar = closes[ts]
+
+            for pair in pairs_by_symbol.get(symbol, []):
+                if pair.s1 not in bar or pair.s2 not in bar:
+                    continue
+
+                tracker = trackers[pair.key]
+                bar_ts = pd.Timestamp(ts, unit="ms")
+                if not tracker.ingest_bar(bar_ts, bar[pair.s1], bar[pair.s2]):
+                    continue
+                if not tracker.ready:
+                    continue
+
+                print(f"\n⚡ Vela cerrada {bar_ts} | par: {pair.s1} vs {pair.s2}")
+                signals = await asyncio.to_thread(
+                    apply_signals, pair, registry.state(pair), tracker.zscore, config
+                )
+                if signals:
+                    await asyncio.to_thread(registry.save_state)
+
+            # Solo se guardan las últimas velas para alinear las patas
+            oldest = ts - 10 * config.timeframe * 60_000
+            for old_ts in [t for t in closes if t < oldest]:
+                del closes[old_ts]
+    finally:
+        for task in tasks:
+            task.cancel()
+        await feed.close()
@@ -0,0 +1,235 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+# Métricas de rendimiento anualizadas con la frecuencia real de las velas. Hay
+# una versión por lotes (último eje: una curva o una rejilla entera de curvas)
+# y otra incremental que se alimenta por trozos; ambas dan lo mismo.
+
+SECONDS_PER_YEAR = 365 * 24 * 3600
+# Si el índice no tiene fechas se asumen velas de 15m, las del bot
+DEFAULT_BARS_PER_YEAR = SECONDS_PER_YEAR / 900
+
+
+def infer_bars_per_year(index: pd.Index | None) -> float:
+    # Frecuencia inferida de la mediana entre velas consecutivas (robusta a
+    # huecos puntuales del histórico)
+    if not isinstance(index, pd.DatetimeIndex) or len(index) < 2:
+        return DEFAULT_BARS_PER_YEAR
+    step = np.median(np.diff(index.as_unit("ns").asi8)) / 1e9
+    if step <= 0:
+        return DEFAULT_BARS_PER_YEAR
+    return SECONDS_PER_YEAR / step
+
+
+def batch_metrics(
+    strategy_ret: np.ndarray,
+    bars_per_year: float,
+    positions: np.ndarray | None = None,
+    valid: np.ndarray | None = None,
+) -> dict[str, np.ndarray]:
+    # Métricas sobre el último eje: strategy_ret (..., n) con NaN como 0 y
+    # solo las velas `valid` en la muestra. Con `positions` (posición de S1
+    # decidida en cada vela) se añaden las estadísticas de operaciones
+    strategy_ret = np.nan_to_num(np.asarray(strategy_ret, dtype=np.float64))
+    if valid is None:
+        valid = np.ones(strategy_ret.shape[-1], dtype=bool)
+    valid = np.broadcast_to(valid, strategy_ret.shape)
+    strategy_ret = np.where(valid, strategy_ret, 0.0)
+
+    n = valid.sum(axis=-1)
+    equity = np.cumprod(1 + strategy_ret, axis=-1)
+    peak = np.maximum.accumulate(equity, axis=-1)
+    max_drawdown = ((equity - peak) / peak).min(axis=-1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = strategy_ret.sum(axis=-1) / n
+        sq_dev = np.where(valid, (strategy_ret - mean[..., None]) ** 2, 0.0)
+        std = np.sqrt(sq_dev.sum(axis=-1) / (n - 1))
+        downside = np.sqrt((np.minimum(strategy_ret, 0.0) ** 2).sum(axis=-1) / n)
+
+    metrics = _summary(equity[..., -1], n, std, downside, max_drawdown, bars_per_year)
+    if positions is None:
+        return metrics
+
+    positions = np.broadcast_to(np.asarray(positions, dtype=np.float64), valid.shape)
+    # La posición decidida en t se mantiene durante la vela t + 1
+    held = np.zeros(valid.shape)
+    held[..., 1:] = positions[..., :-1]
+    held = np.where(valid, held, 0.0)
+    prev = np.zeros(valid.shape)
+    prev[..., 1:] = held[..., :-1]
+    in_trade = held != 0
+    starts = in_trade & (held != prev)
+
+    turnover = np.abs(np.diff(held, axis=-1, prepend=0.0)).sum(axis=-1)
+    trades = starts.sum(axis=-1)
+    held_bars = in_trade.sum(axis=-1)
+
+    # Resultado de cada operación: suma de log-retornos de sus velas,
+    # numerando las operaciones de todas las curvas de forma consecutiva
+    trade_id = np.cumsum(starts.ravel()) - 1
+    log_ret = np.log1p(np.maximum(strategy_ret.ravel(), -1 + 1e-12))
+    mask = in_trade.ravel()
+    trade_ret = np.bincount(
+        trade_id[mask], weights=log_ret[mask], minlength=int(trades.sum())
+    )
+    owner = np.repeat(np.arange(trades.size), trades.ravel())
+    wins = np.bincount(owner, weights=trade_ret > 0, minlength=trades.size)
+
+    metrics.update(
+        _trade_summary(
+            trades, wins.reshape(trades.shape), held_bars, turnover, n, bars_per_year
+        )
+    )
+    return metrics
+
+
+class StreamingMetrics:
+    # Las mismas métricas que batch_metrics acumuladas por trozos (o vela a
+    # vela) en O(1) memoria: momentos con la fórmula de Chan, pico de equity,
+    # drawdown máximo y la operación abierta se arrastran entre trozos.
+    def __init__(self, bars_per_year: float = DEFAULT_BARS_PER_YEAR):
+        self.bars_per_year = bars_per_year
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.downside_sq = 0.0
+        self.equity = 1.0
+        self.peak = 1.0
+        self.max_drawdown = 0.0
+        self.position = 0.0
+        self.held = 0.0
+        self.trades = 0
+        self.wins = 0
+        self.open_trade = 0.0
+        self.held_bars = 0
+        self.turnover = 0.0
+        self.with_positions = False
+
+    def update(
+        self,
+        strategy_ret: np.ndarray | float,
+        positions: np.ndarray | float | None = None,
+    ):
+        strategy_ret = np.nan_to_num(np.atleast_1d(np.asarray(strategy_ret, float)))
+        k = len(strategy_ret)
+        if k == 0:
+            return
+
+        chunk_mean = strategy_ret.mean()
+        chunk_m2 = ((strategy_ret - chunk_mean) ** 2).sum()
+        total = self.n + k
+        delta = chunk_mean - self.mean
+        self.m2 += chunk_m2 + delta * delta * self.n * k / total
+        self.mean += delta * k / total
+        self.n = total
+        self.downside_sq += (np.minimum(strategy_ret, 0.0) ** 2).sum()
+
+        equity = self.equity * np.cumprod(1 + strategy_ret)
+        peak = np.maximum(self.peak, np.maximum.accumulate(equity))
+        self.max_drawdown = min(self.max_drawdown, ((equity - peak) / peak).min())
+        self.equity, self.peak = float(equity[-1]), float(peak[-1])
+
+        if positions is None:
+            return
+
+        self.with_positions = True
+        positions = np.broadcast_to(np.asarray(positions, dtype=np.float64), (k,))
+        held = np.concatenate([[self.position], positions[:-1]])
+        prev = np.concatenate([[self.held], held[:-1]])
+        in_trade = held != 0
+        starts = in_trade & (held != prev)
+
+        self.turnover += np.abs(np.diff(held, prepend=self.held)).sum()
+        self.held_bars += int(in_trade.sum())
+
+        # Segmento 0: continuación de la operación abierta del trozo anterior
+        trade_id = np.cumsum(starts)
+        log_ret = np.log1p(np.maximum(strategy_ret, -1 + 1e-12))
+        trade_ret = np.bincount(
+            trade_id[in_trade], weights=log_ret[in_trade], minlength=trade_id[-1] + 1
+        )
+        self.open_trade += trade_ret[0]
+        if len(trade_ret) > 1:
+            if self.trades > 0:
+                self.wins += self.open_trade > 0
+            self.wins += int((trade_ret[1:-1] > 0).sum())
+            self.open_trade = trade_ret[-1]
+            self.trades += len(trade_ret) - 1
+
+        self.position = float(positions[-1])
+        self.held = float(held[-1])
+
+    def result(self) -> dict[str, float]:
+        n = self.n
+        std = math.sqrt(self.m2 / (n - 1)) if n > 1 else math.nan
+        downside = math.sqrt(self.downside_sq / n) if n > 0 else math.nan
+        metrics = _summary(
+            self.equity,
+            n,
+            std,
+            downside,
+            self.max_drawdown,
+            self.bars_per_year,
+        )
+        if self.with_positions:
+            wins = self.wins + (self.trades > 0 and self.open_trade > 0)
+            metrics.update(
+                _trade_summary(
+                    self.trades,
+                    wins,
+                    self.held_bars,
+                    self.turnover,
+                    n,
+                    self.bars_per_year,
+                )
+            )
+        return {name: float(value) for name, value in metrics.items()}
+
+
+def _summary(final_equity, n, std, downside, max_drawdown, bars_per_year):
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        years = n / bars_per_year
+        # CAGR; una curva que llega a cero se queda en -100%
+        annualized_return = np.where(
+            final_equity > 0, np.maximum(final_equity, 0) ** (1 / years) - 1.0, -1.0
+        )
+        # Sharpe (tasa libre de riesgo = 0): rentabilidad anualizada (CAGR)
+        # entre volatilidad anualizada; el Sortino divide por la desviación a
+        # la baja anualizada
+        annualized_vol = std * np.sqrt(bars_per_year)
+        sharpe_ratio = np.where(
+            annualized_vol > 0, annualized_return / annualized_vol, 0.0
+        )
+        sortino_ratio = np.where(
+            downside > 0, annualized_return / (downside * np.sqrt(bars_per_year)), 0.0
+        )
+        calmar_ratio = np.where(
+            max_drawdown < 0, annualized_return / -max_drawdown, 0.0
+        )
+
+    return {
+        "Total Return (%)": (final_equity - 1.0) * 100,
+        "Annualized Return (%)": annualized_return * 100,
+        "Annualized Volatility (%)": annualized_vol * 100,
+        "Sharpe Ratio": sharpe_ratio,
+        "Sortino Ratio": sortino_ratio,
+        "Max Drawdown (%)": max_drawdown * 100,
+        "Calmar Ratio": calmar_ratio,
+    }
+
+
+def _trade_summary(trades, wins, held_bars, turnover, n, bars_per_year):
+    hours_per_bar = SECONDS_PER_YEAR / 3600 / bars_per_year
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {
+            "Trades": np.asarray(trades, dtype=np.float64),
+            "Win Rate (%)": np.where(trades > 0, wins / trades * 100, np.nan),
+            "Avg Holding (h)": np.where(
+                trades > 0, held_bars / trades * hours_per_bar, np.nan
+            ),
+            # Nocional de S1 operado por año, en veces el capital
+            "Annual Turnover": turnover / (n / bars_per_year),
+        }
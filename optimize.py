@@ -1,39 +1,539 @@
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, replace
+from multiprocessing.shared_memory import SharedMemory
 from typing import Any
 
+import numpy as np
 import optuna
 from optuna import Trial
+from optuna.storages import JournalStorage
+from optuna.storages.journal import JournalFileBackend
+from optuna.study import MaxTrialsCallback
+from optuna.trial import TrialState
 import pandas as pd
 
-from backtest import backtest, performance_metrics
-from cointegration import find_best_pair, CointegrationTestResult
+from backtest import (
+    GridBacktestResult,
+    backtest,
+    grid_backtest,
+    pct_change,
+    performance_metrics,
+    position_kernel,
+    strategy_returns,
+    zscore_grid,
+    zscore_grid_metrics,
+)
+from cointegration import (
+    best_pair_index,
+    find_best_pair,
+    CointegrationTestResult,
+    PairStatsCache,
+)
+from costs import CostModel, PairCosts, cost_returns, pair_costs
+from hedge import SpreadModel
+from metrics import StreamingMetrics, batch_metrics, infer_bars_per_year
 
 
-def run_optimization(cointegration_test_result: CointegrationTestResult):
-    def objective(trial: Trial):
+_FINISHED_STATES = (TrialState.COMPLETE, TrialState.PRUNED)
+
+_DEFAULT_WINDOWS = np.arange(10, 101)
+_DEFAULT_ZSCORE_MULTS = np.round(np.arange(1.0, 3.55, 0.05), 2)
+
+# Matriz compartida con los procesos del pool (precios en optimize_pairs,
+# z-scores y retornos en walk_forward_optimization)
+_shared_memory: SharedMemory | None = None
+_shared_values: np.ndarray | None = None
+
+
+class Objective:
+    def __init__(
+        self,
+        cointegration_test_result: CointegrationTestResult,
+        cache: PairStatsCache,
+        prune: bool = True,
+        costs: CostModel | None = None,
+    ):
+        self.cointegration_test_result = cointegration_test_result
+        self.cache = cache
+        self.prune = prune
+        # Con costes se optimiza el Sharpe neto: los umbrales bajos que giran
+        # la posición cada pocas velas dejan de salir ganadores
+        self.costs = costs
+
+    def __call__(self, trial: Trial) -> float:
         window = trial.suggest_int("window", 10, 100)
         zscore_mult = trial.suggest_float("zscore_mult", 1.0, 3.5)
 
-        best_pair = find_best_pair(cointegration_test_result, window=window)
+        best_pair = find_best_pair(
+            self.cointegration_test_result, window=window, cache=self.cache
+        )
 
-        df_backtest = backtest(best_pair, zscore_mult=zscore_mult)
+        # Si el umbral nunca se alcanza no habrá ninguna operación: se poda el
+        # trial sin ejecutar el backtest
+        if self.prune and not (best_pair.zscore.abs() > zscore_mult).any():
+            raise optuna.TrialPruned()
+
+        df_backtest = backtest(best_pair, zscore_mult=zscore_mult, costs=self.costs)
 
         metrics = performance_metrics(df_backtest)
         sharpe: Any = metrics.loc["Sharpe Ratio", "Strategy"]
 
         if pd.isna(sharpe) or sharpe == float("inf") or sharpe == 0.0:
+            if self.prune:
+                raise optuna.TrialPruned()
             return -999.0
 
         return float(sharpe)
 
+
+def run_optimization(
+    cointegration_test_result: CointegrationTestResult,
+    cache: PairStatsCache | None = None,
+    n_trials: int = 200,
+    n_jobs: int = 1,
+    n_workers: int = 1,
+    storage: str | None = None,
+    study_name: str | None = None,
+    prune: bool = True,
+    costs: CostModel | None = None,
+):
+    # Las ventanas se repiten entre trials: el par, el spread y el z-score de
+    # cada ventana se reutilizan en vez de recalcularse
+    if cache is None:
+        cache = PairStatsCache(maxsize=128)
+
+    if n_workers > 1 and storage is None:
+        raise ValueError("n_workers > 1 requiere un storage compartido")
+
+    objective = Objective(cointegration_test_result, cache, prune=prune, costs=costs)
+
     print("Iniciando optimización de hiperparámetros con Optuna...")
 
-    study = optuna.create_study(direction="maximize")
-    study.optimize(objective, n_trials=200)
+    # Con storage el estudio se guarda en disco y, si ya existe con el mismo
+    # nombre, se retoma hasta completar n_trials
+    study = optuna.create_study(
+        direction="maximize",
+        storage=_make_storage(storage),
+        study_name=study_name,
+        load_if_exists=True,
+    )
+    remaining = n_trials - _finished_trials(study)
+    if remaining < n_trials:
+        print(f"Retomando estudio '{study.study_name}': quedan {remaining} trials")
+
+    if remaining > 0:
+        if n_workers > 1:
+            with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                futures = [
+                    executor.submit(
+                        _optimize_worker,
+                        study.study_name,
+                        storage,
+                        objective,
+                        n_trials,
+                        n_jobs,
+                    )
+                    for _ in range(n_workers)
+                ]
+                for future in futures:
+                    future.result()
+        else:
+            study.optimize(
+                objective,
+                n_trials=remaining,
+                n_jobs=n_jobs,
+                callbacks=[_max_trials_callback(n_trials)],
+            )
 
     print("\n¡Optimización completada!")
+    if n_workers == 1:
+        print(f"Caché de estadísticas del par: {cache.stats()}")
     print(f"Mejor Sharpe Ratio: {study.best_value:.4f}")
     print(
         f"Mejores parámetros:\n - Window: {study.best_params['window']}\n - Z-Score Mult: {study.best_params['zscore_mult']}"
     )
 
     return study.best_params
+
+
+def _make_storage(storage: str | None) -> optuna.storages.BaseStorage | str | None:
+    # Una URL (sqlite:///optuna.db) se usa tal cual; cualquier otra ruta se
+    # trata como un journal file, más robusto con varios procesos escribiendo
+    if storage is None or "://" in storage:
+        return storage
+
+    return JournalStorage(JournalFileBackend(storage))
+
+
+def _finished_trials(study: optuna.Study) -> int:
+    return len(study.get_trials(deepcopy=False, states=_FINISHED_STATES))
+
+
+def _max_trials_callback(n_trials: int) -> MaxTrialsCallback:
+    return MaxTrialsCallback(n_trials, states=_FINISHED_STATES)
+
+
+def _optimize_worker(
+    study_name: str, storage: str, objective: Objective, n_trials: int, n_jobs: int
+):
+    # Cada proceso carga el estudio compartido y trabaja hasta que entre todos
+    # se alcanzan n_trials terminados
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    study = optuna.load_study(study_name=study_name, storage=_make_storage(storage))
+    remaining = n_trials - _finished_trials(study)
+    if remaining > 0:
+        study.optimize(
+            objective,
+            n_trials=remaining,
+            n_jobs=n_jobs,
+            callbacks=[_max_trials_callback(n_trials)],
+        )
+
+
+def run_grid_optimization(
+    cointegration_test_result: CointegrationTestResult,
+    windows: np.ndarray | list[int] = _DEFAULT_WINDOWS,
+    zscore_mults: np.ndarray | list[float] = _DEFAULT_ZSCORE_MULTS,
+    costs: CostModel | None = None,
+) -> tuple[dict[str, Any], GridBacktestResult]:
+    # Barrido exhaustivo del mismo espacio que run_optimization en una pasada
+    i, j = best_pair_index(cointegration_test_result)
+    df = cointegration_test_result.df
+
+    print(
+        f"Barriendo {len(windows)} ventanas x {len(zscore_mults)} umbrales "
+        f"para {df.columns[i]} - {df.columns[j]}..."
+    )
+    grid = grid_backtest(
+        df.iloc[:, i], df.iloc[:, j], windows, zscore_mults, costs=costs
+    )
+
+    best = grid.best("Sharpe Ratio")
+    print(f"Mejor Sharpe Ratio: {best['Sharpe Ratio']:.4f}")
+    print(
+        f"Mejores parámetros:\n - Window: {best['window']}\n - Z-Score Mult: {best['zscore_mult']}"
+    )
+
+    best_params = {"window": best["window"], "zscore_mult": best["zscore_mult"]}
+    return best_params, grid
+
+
+def optimize_pairs(
+    cointegration_test_result: CointegrationTestResult,
+    windows: np.ndarray | list[int] = _DEFAULT_WINDOWS,
+    zscore_mults: np.ndarray | list[float] = _DEFAULT_ZSCORE_MULTS,
+    max_workers: int | None = None,
+    metric: str = "Sharpe Ratio",
+    costs: CostModel | None = None,
+) -> pd.DataFrame:
+    # Barrido de parámetros independiente para cada par cointegrado. Los
+    # precios viajan a los workers en memoria compartida, no serializados
+    df = cointegration_test_result.df
+    tickers = list(df.columns)
+    pairs_idx = [
+        (tickers.index(s1), tickers.index(s2))
+        for s1, s2 in cointegration_test_result.pairs
+    ]
+    if not pairs_idx:
+        return pd.DataFrame()
+
+    print(f"Optimizando {len(pairs_idx)} pares cointegrados...")
+
+    # Una matriz float32 (PriceMatrix) se comparte tal cual: ocupa la mitad y
+    # grid_backtest pasa cada par a float64
+    values = df.to_numpy()
+    if values.dtype != np.float32:
+        values = values.astype(np.float64, copy=False)
+    # Los workers reciben arrays sin fechas: la frecuencia de las velas para
+    # anualizar se infiere aquí
+    bars_per_year = infer_bars_per_year(df.index)
+    # Los costes de cada par (funding alineado con las velas) se resuelven
+    # aquí, donde están los nombres y las fechas
+    tasks = [
+        (
+            i,
+            j,
+            windows,
+            zscore_mults,
+            metric,
+            None if costs is None else costs.for_pair(tickers[i], tickers[j], df.index),
+            bars_per_year,
+        )
+        for i, j in pairs_idx
+    ]
+
+    rows = _map_shared(values, _optimize_pair_worker, tasks, max_workers)
+
+    ranking = pd.DataFrame(rows)
+    ranking["pvalue"] = [
+        cointegration_test_result.pvalue_matrix[i, j] for i, j in pairs_idx
+    ]
+    ranking["S1"] = [tickers[i] for i, _ in pairs_idx]
+    ranking["S2"] = [tickers[j] for _, j in pairs_idx]
+    ranking = ranking.sort_values(metric, ascending=False, ignore_index=True)
+    columns = ["S1", "S2", "pvalue", "window", "zscore_mult"]
+    ranking = ranking[columns + [c for c in ranking.columns if c not in columns]]
+
+    print(f"Ranking de pares por {metric}:\n{ranking.head(10)}")
+
+    return ranking
+
+
+@dataclass
+class WalkForwardResult:
+    # Un fold por fila (parámetros elegidos en train y métricas fuera de
+    # muestra en test) y la curva fuera de muestra de todos los tests seguidos
+    folds: pd.DataFrame
+    returns: pd.Series
+    positions: pd.Series
+    metrics: dict[str, float]
+
+    @property
+    def equity(self) -> pd.Series:
+        return (1 + self.returns).cumprod().rename("equity")
+
+
+def walk_forward_optimization(
+    series1: pd.Series,
+    series2: pd.Series,
+    train_bars: int = 30 * 96,
+    test_bars: int = 7 * 96,
+    windows: np.ndarray | list[int] = _DEFAULT_WINDOWS,
+    zscore_mults: np.ndarray | list[float] = _DEFAULT_ZSCORE_MULTS,
+    metric: str = "Sharpe Ratio",
+    spread_model: SpreadModel | None = None,
+    costs: CostModel | PairCosts | None = None,
+    max_workers: int | None = None,
+) -> WalkForwardResult:
+    # Optimización walk-forward: en cada fold se elige (window, zscore_mult)
+    # con la rejilla sobre train_bars velas y se evalúa en las test_bars
+    # siguientes; después se avanza test_bars. Los z-scores de todas las
+    # ventanas son rodantes (solo usan velas pasadas), así que se calculan
+    # una vez para todo el histórico y cada fold trabaja sobre un trozo. Van
+    # a los procesos del pool en memoria compartida junto con los retornos.
+    # Con spread "ols" la beta se estima con todo el histórico; rolling_ols y
+    # kalman no miran al futuro. Cada test empieza sin posición y la que quede
+    # abierta se cierra en su última vela.
+    windows = np.asarray(windows, dtype=np.int64)
+    zscore_mults = np.asarray(zscore_mults, dtype=np.float64)
+    costs = pair_costs(costs, series1, series2)
+    bars_per_year = infer_bars_per_year(series1.index)
+
+    s1 = series1.to_numpy(dtype=np.float64)
+    s2 = series2.to_numpy(dtype=np.float64)
+    n_bars = len(s1)
+    if n_bars <= train_bars:
+        raise ValueError(f"Hacen falta más de {train_bars} velas ({n_bars})")
+
+    zscores, notional, warmup = zscore_grid(s1, s2, windows, spread_model)
+    # Filas: z-score de cada ventana, retornos de S1 y S2 y nocional de S2
+    stats = np.empty((len(windows) + 3, n_bars))
+    stats[: len(windows)] = zscores
+    stats[-3] = pct_change(s1)
+    stats[-2] = pct_change(s2)
+    stats[-1] = 1.0 if notional is None else notional
+    del zscores
+
+    tasks = []
+    for train_start in range(0, n_bars - train_bars, test_bars):
+        test_start = train_start + train_bars
+        test_end = min(test_start + test_bars, n_bars)
+        tasks.append(
+            (
+                train_start,
+                test_start,
+                test_end,
+                windows,
+                zscore_mults,
+                warmup,
+                notional is not None,
+                metric,
+                _slice_costs(costs, train_start, test_end),
+                bars_per_year,
+            )
+        )
+    print(
+        f"Walk-forward: {len(tasks)} folds (train {train_bars} velas, "
+        f"test {test_bars} velas), {len(windows)} ventanas x "
+        f"{len(zscore_mults)} umbrales"
+    )
+
+    folds = _map_shared(stats, _walk_forward_fold_worker, tasks, max_workers)
+
+    # Curva fuera de muestra: los tests seguidos, con las métricas
+    # acumuladas fold a fold
+    streaming = StreamingMetrics(bars_per_year)
+    for fold in folds:
+        streaming.update(fold["returns"], fold["positions"])
+    index = series1.index[train_bars:]
+    returns = pd.Series(
+        np.concatenate([fold.pop("returns") for fold in folds]),
+        index=index,
+        name="strategy_ret",
+    )
+    positions = pd.Series(
+        np.concatenate([fold.pop("positions") for fold in folds]),
+        index=index,
+        name="position_s1",
+    )
+
+    table = pd.DataFrame(folds)
+    for column in ("train_start", "test_start", "test_end"):
+        table[column] = series1.index[table[column]]
+    metrics = streaming.result()
+    print(
+        f"Folds:\n{table[['test_start', 'window', 'zscore_mult', f'IS {metric}', metric]]}"
+    )
+    print(f"Fuera de muestra: {metric} {metrics[metric]:.4f}")
+
+    return WalkForwardResult(table, returns, positions, metrics)
+
+
+def _slice_costs(costs: PairCosts | None, start: int, end: int) -> PairCosts | None:
+    if costs is None:
+        return None
+    return replace(
+        costs,
+        funding_s1=None if costs.funding_s1 is None else costs.funding_s1[start:end],
+        funding_s2=None if costs.funding_s2 is None else costs.funding_s2[start:end],
+    )
+
+
+def _map_shared(
+    values: np.ndarray,
+    func: Callable,
+    tasks: list[tuple],
+    max_workers: int | None,
+) -> list:
+    # Ejecuta func(*task) para cada tarea con `values` en memoria compartida
+    # (sin serializarla en cada tarea); con max_workers=1, en este proceso
+    global _shared_values
+    if max_workers == 1:
+        _init_shared_worker(None, values.shape, values.dtype, values)
+        try:
+            return [func(*task) for task in tasks]
+        finally:
+            # No se retiene la matriz después de la llamada
+            _shared_values = None
+
+    shm = SharedMemory(create=True, size=values.nbytes)
+    try:
+        np.ndarray(values.shape, dtype=values.dtype, buffer=shm.buf)[:] = values
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_init_shared_worker,
+            initargs=(shm.name, values.shape, values.dtype),
+        ) as executor:
+            return list(executor.map(func, *zip(*tasks)))
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def _init_shared_worker(
+    name: str | None,
+    shape: tuple[int, ...],
+    dtype: np.dtype,
+    values: np.ndarray | None = None,
+):
+    global _shared_memory, _shared_values
+    if name is None:
+        _shared_values = values
+        return
+
+    _shared_memory = SharedMemory(name=name, track=False)
+    _shared_values = np.ndarray(shape, dtype=dtype, buffer=_shared_memory.buf)
+
+
+def _optimize_pair_worker(
+    i: int,
+    j: int,
+    windows: np.ndarray | list[int],
+    zscore_mults: np.ndarray | list[float],
+    metric: str,
+    costs: PairCosts | None = None,
+    bars_per_year: float | None = None,
+) -> dict[str, float]:
+    assert _shared_values is not None
+    grid = grid_backtest(
+        _shared_values[:, i],
+        _shared_values[:, j],
+        windows,
+        zscore_mults,
+        costs=costs,
+        bars_per_year=bars_per_year,
+    )
+    best = grid.best(metric)
+    a = int(np.flatnonzero(grid.windows == best["window"])[0])
+    b = int(np.flatnonzero(grid.zscore_mults == best["zscore_mult"])[0])
+    row: dict[str, float] = {
+        "window": best["window"],
+        "zscore_mult": best["zscore_mult"],
+    }
+    row.update({name: float(values[a, b]) for name, values in grid.metrics.items()})
+    return row
+
+
+def _walk_forward_fold_worker(
+    train_start: int,
+    test_start: int,
+    test_end: int,
+    windows: np.ndarray,
+    zscore_mults: np.ndarray,
+    warmup: int,
+    hedged: bool,
+    metric: str,
+    costs: PairCosts | None,
+    bars_per_year: float,
+) -> dict:
+    assert _shared_values is not None
+    n_windows = len(windows)
+    zscores = _shared_values[:n_windows]
+    ret_s1, ret_s2, notional = _shared_values[n_windows:]
+    # costs viene recortado a [train_start, test_end)
+    offset = test_start - train_start
+
+    train = slice(train_start, test_start)
+    grid = GridBacktestResult(
+        windows,
+        zscore_mults,
+        zscore_grid_metrics(
+            # Copia contigua del trozo: el kernel recorre el último eje
+            np.ascontiguousarray(zscores[:, train]),
+            zscore_mults,
+            ret_s1[train],
+            ret_s2[train],
+            notional[train] if hedged else None,
+            warmup + windows - 1 - train_start,
+            _slice_costs(costs, 0, offset),
+            bars_per_year,
+        ),
+    )
+    best = grid.best(metric)
+
+    test = slice(test_start, test_end)
+    a = int(np.flatnonzero(windows == best["window"])[0])
+    pos_s1 = position_kernel(zscores[a, test], best["zscore_mult"])
+    pos_s1[-1] = 0.0
+    pos_s2 = 0.0 - pos_s1 * notional[test]
+    strategy_ret = strategy_returns(pos_s1, pos_s2, ret_s1[test], ret_s2[test])
+    if costs is not None:
+        strategy_ret -= cost_returns(
+            pos_s1, pos_s2, _slice_costs(costs, offset, offset + len(pos_s1))
+        )
+    strategy_ret = np.nan_to_num(strategy_ret)
+
+    row = {
+        "train_start": train_start,
+        "test_start": test_start,
+        "test_end": test_end - 1,
+        "window": best["window"],
+        "zscore_mult": best["zscore_mult"],
+        f"IS {metric}": best[metric],
+    }
+    oos = batch_metrics(strategy_ret, bars_per_year, pos_s1)
+    row.update({name: float(value) for name, value in oos.items()})
+    row["returns"] = strategy_ret
+    row["positions"] = pos_s1
+    return row
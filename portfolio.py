@@ -0,0 +1,349 @@
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Literal
+
+import numpy as np
+import pandas as pd
+
+from backtest import pct_change
+from costs import CostModel, PairCosts, cost_returns
+from data.price_matrix import PriceMatrix
+from hedge import SpreadModel
+from metrics import batch_metrics, infer_bars_per_year
+from registry import PairConfig, load_config
+from signals import position_kernel
+
+
+@dataclass(frozen=True)
+class PortfolioPair:
+    s1: str
+    s2: str
+    window: int
+    zscore_mult: float
+    spread: SpreadModel = field(default_factory=SpreadModel)
+
+    @classmethod
+    def from_config(cls, pair: PairConfig) -> "PortfolioPair":
+        return cls(pair.s1, pair.s2, pair.window, pair.zscore, pair.spread)
+
+    @property
+    def label(self) -> str:
+        return f"{self.s1} - {self.s2}"
+
+
+def load_portfolio_pairs(config_path: str | Path) -> list[PortfolioPair]:
+    # Los pares del bot en vivo (pairs.toml) con sus ventanas y umbrales
+    return [PortfolioPair.from_config(pair) for pair in load_config(config_path).pairs]
+
+
+@dataclass
+class PortfolioResult:
+    index: pd.Index
+    pairs: list[PortfolioPair]
+    positions: np.ndarray  # (pares, velas) int8, tras la asignación
+    pair_returns: np.ndarray  # (pares, velas) retorno neto por unidad de nocional
+    returns: np.ndarray  # (velas,) retorno de la cartera
+    exposure: np.ndarray  # (velas,) nocional de S1 abierto / capital
+    bars_per_year: float
+
+    @property
+    def labels(self) -> list[str]:
+        return [pair.label for pair in self.pairs]
+
+    @property
+    def equity(self) -> pd.Series:
+        return pd.Series(np.cumprod(1 + self.returns), index=self.index, name="equity")
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(
+            {
+                "strategy_ret": self.returns,
+                "equity": np.cumprod(1 + self.returns),
+                "open_deals": (self.positions != 0).sum(axis=0),
+                "exposure": self.exposure,
+            },
+            index=self.index,
+        )
+
+    def metrics(self) -> pd.DataFrame:
+        metrics = batch_metrics(self.returns, self.bars_per_year)
+        metrics["Max Open Deals"] = (self.positions != 0).sum(axis=0).max()
+        metrics["Avg Exposure"] = self.exposure.mean()
+        return pd.DataFrame(
+            {"Portfolio": {name: float(value) for name, value in metrics.items()}}
+        )
+
+    def pair_metrics(self) -> pd.DataFrame:
+        # Todas las curvas de los pares en una sola llamada por lotes
+        metrics = batch_metrics(
+            self.pair_returns, self.bars_per_year, positions=self.positions
+        )
+        return pd.DataFrame(metrics, index=self.labels)
+
+    def correlation(self) -> pd.DataFrame:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            corr = np.corrcoef(self.pair_returns)
+        return pd.DataFrame(corr, index=self.labels, columns=self.labels)
+
+
+def portfolio_backtest(
+    prices: pd.DataFrame | PriceMatrix,
+    pairs: list[PortfolioPair],
+    allocation: Literal["equal", "vol_target", "max_deals"] = "equal",
+    max_deals: int | None = None,
+    target_vol: float = 0.2,
+    vol_window: int = 96 * 7,
+    max_leverage: float = 1.0,
+    costs: CostModel | None = None,
+    bars_per_year: float | None = None,
+    max_cells: int = 1_000_000,
+) -> PortfolioResult:
+    # Backtest conjunto de N pares sobre una única matriz de precios
+    # alineada. Las máquinas de estados de los pares se resuelven por lotes
+    # de pares (max_cells velas x pares por lote), así que la memoria
+    # temporal no depende del nº de pares: solo se guardan la posición (int8)
+    # y el retorno (float64) de cada par y vela. Asignación del capital:
+    # - equal: 1/N del capital por par
+    # - vol_target: cada par apunta a target_vol / N de volatilidad anual,
+    #   según la volatilidad de su spread en las últimas vol_window velas,
+    #   con el apalancamiento total limitado a max_leverage
+    # - max_deals: como mucho max_deals pares abiertos, 1/max_deals del
+    #   capital cada uno; con todos los huecos ocupados la entrada se descarta
+    #   (como hace el bot con su límite de deals) y, si varias entran en la
+    #   misma vela, tienen prioridad los primeros pares de la lista
+    if isinstance(prices, pd.DataFrame):
+        prices = PriceMatrix.from_frame(prices)
+    if allocation == "max_deals" and not max_deals:
+        raise ValueError("allocation='max_deals' necesita max_deals")
+    if allocation not in ("equal", "vol_target", "max_deals"):
+        raise ValueError(f"Asignación desconocida: {allocation}")
+
+    index = pd.DatetimeIndex(prices.index.astype("datetime64[ms]"), name="datetime")
+    if bars_per_year is None:
+        bars_per_year = infer_bars_per_year(index)
+    n_pairs, n_bars = len(pairs), prices.shape[0]
+    chunk = max(1, max_cells // max(1, n_bars))
+
+    # 1) Posiciones deseadas y retorno del spread "siempre invertido" de cada
+    #    par: u[t] = ret_s1[t] - nocional[t-1] * ret_s2[t], de modo que el
+    #    retorno bruto del par es posición[t-1] * u[t], como en backtest()
+    desired = np.zeros((n_pairs, n_bars), dtype=np.int8)
+    spread_ret = np.zeros((n_pairs, n_bars))
+    notional: dict[int, np.ndarray] = {}
+    for start in range(0, n_pairs, chunk):
+        rows = range(start, min(start + chunk, n_pairs))
+        s1, s2 = _leg_prices(prices, [pairs[k] for k in rows])
+        spreads = s1 - s2
+        for r, k in enumerate(rows):
+            if pairs[k].spread.method != "diff":
+                spreads[r], hedge_ratio = pairs[k].spread.fit(s1[r], s2[r])
+                notional[k] = hedge_ratio * s2[r] / s1[r]
+
+        windows = np.array([pairs[k].window for k in rows])
+        mults = np.array([pairs[k].zscore_mult for k in rows], dtype=np.float64)
+        zscores = _rolling_zscore_rows(spreads, windows)
+        desired[start : rows.stop] = position_kernel(zscores, mults)
+        del spreads, zscores
+
+        ret_s1, ret_s2 = pct_change(s1), pct_change(s2)
+        for r, k in enumerate(rows):
+            if k in notional:
+                ret_s2[r, 1:] *= notional[k][:-1]
+        spread_ret[start : rows.stop] = np.nan_to_num(ret_s1 - ret_s2)
+
+    # 2) Asignación de huecos (solo max_deals cambia qué posiciones se abren)
+    if allocation == "max_deals":
+        positions = _limit_deals(desired, max_deals)
+    else:
+        positions = desired
+    del desired
+
+    # 3) Retornos netos de cada par con las posiciones asignadas y pesos
+    weights = np.full(n_bars, 1 / n_pairs)
+    if allocation == "max_deals":
+        weights = np.full(n_bars, 1 / max_deals)
+    elif allocation == "vol_target":
+        total = np.zeros(n_bars)
+        for start in range(0, n_pairs, chunk):
+            total += _vol_weights(
+                spread_ret[start : start + chunk],
+                target_vol,
+                vol_window,
+                n_pairs,
+                bars_per_year,
+            ).sum(axis=0)
+        # Con más pares que riesgo disponible se reduce el peso de todos
+        scale = np.minimum(1.0, max_leverage / np.maximum(total, 1e-12))
+
+    returns = np.zeros(n_bars)
+    exposure = np.zeros(n_bars)
+    pair_returns = spread_ret  # se sobrescribe por lotes
+    for start in range(0, n_pairs, chunk):
+        rows = range(start, min(start + chunk, n_pairs))
+        pos = positions[start : rows.stop].astype(np.float64)
+        if allocation == "vol_target":
+            w = (
+                _vol_weights(
+                    spread_ret[start : rows.stop],
+                    target_vol,
+                    vol_window,
+                    n_pairs,
+                    bars_per_year,
+                )
+                * scale
+            )
+        else:
+            w = np.broadcast_to(weights, pos.shape)
+
+        held = np.zeros_like(pos)
+        held[:, 1:] = pos[:, :-1]
+        net = held * spread_ret[start : rows.stop]
+        if costs is not None:
+            pos_s2 = np.stack(
+                [-pos[r] * notional.get(k, 1.0) for r, k in enumerate(rows)]
+            )
+            net -= cost_returns(
+                pos, pos_s2, _stacked_costs(costs, [pairs[k] for k in rows], index)
+            )
+        pair_returns[start : rows.stop] = net
+
+        # El peso decidido en t - 1 se aplica al retorno de t
+        w_held = np.concatenate([w[:, :1], w[:, :-1]], axis=1)
+        returns += (w_held * net).sum(axis=0)
+        exposure += (w * np.abs(pos)).sum(axis=0)
+
+    return PortfolioResult(
+        index=index,
+        pairs=list(pairs),
+        positions=positions,
+        pair_returns=pair_returns,
+        returns=returns,
+        exposure=exposure,
+        bars_per_year=bars_per_year,
+    )
+
+
+def _leg_prices(
+    prices: PriceMatrix, pairs: list[PortfolioPair]
+) -> tuple[np.ndarray, np.ndarray]:
+    # Precios de las patas del lote como filas (pares, velas) en float64
+    idx1 = [prices.columns[pair.s1] for pair in pairs]
+    idx2 = [prices.columns[pair.s2] for pair in pairs]
+    s1 = np.ascontiguousarray(prices.values[:, idx1].T, dtype=np.float64)
+    s2 = np.ascontiguousarray(prices.values[:, idx2].T, dtype=np.float64)
+    return s1, s2
+
+
+def _rolling_zscore_rows(spreads: np.ndarray, windows: np.ndarray) -> np.ndarray:
+    # rolling_zscores con una ventana distinta por fila. Las velas de
+    # calentamiento del hedge (spread NaN) quedan fuera de la ventana, y el
+    # centrado y las sumas acumuladas son los de rolling_zscores, así que cada
+    # fila da lo mismo que el backtest de un solo par
+    n_bars = spreads.shape[1]
+    bars = np.arange(n_bars)
+    valid = ~np.isnan(spreads)
+    warmup = np.where(valid.any(axis=1), np.argmax(valid, axis=1), n_bars)
+
+    with np.errstate(invalid="ignore"):
+        center = np.nanmean(np.where(valid, spreads, np.nan), axis=1)
+    centered = np.where(valid, spreads - center[:, None], 0.0)
+    csum = np.zeros((len(spreads), n_bars + 1))
+    csum_sq = np.zeros((len(spreads), n_bars + 1))
+    np.cumsum(centered, axis=1, out=csum[:, 1:])
+    np.cumsum(centered * centered, axis=1, out=csum_sq[:, 1:])
+
+    lower = np.maximum(bars[None, :] + 1 - windows[:, None], 0)
+    total = csum[:, 1:] - np.take_along_axis(csum, lower, axis=1)
+    total_sq = csum_sq[:, 1:] - np.take_along_axis(csum_sq, lower, axis=1)
+    mean = total / windows[:, None]
+    var = np.maximum(total_sq - total * mean, 0.0) / (windows[:, None] - 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        zscores = (centered - mean) / np.sqrt(var)
+
+    ready = bars[None, :] >= (warmup + windows - 1)[:, None]
+    return np.where(ready & np.isfinite(zscores), zscores, np.nan)
+
+
+def _vol_weights(
+    spread_ret: np.ndarray,
+    target_vol: float,
+    vol_window: int,
+    n_pairs: int,
+    bars_per_year: float,
+) -> np.ndarray:
+    # Peso de cada par para que su volatilidad anual sea target_vol / N, con
+    # la desviación de las últimas vol_window velas (hasta t incluida). Sin
+    # histórico suficiente se usa el reparto equitativo
+    n_bars = spread_ret.shape[1]
+    csum = np.zeros((len(spread_ret), n_bars + 1))
+    csum_sq = np.zeros((len(spread_ret), n_bars + 1))
+    np.cumsum(spread_ret, axis=1, out=csum[:, 1:])
+    np.cumsum(spread_ret * spread_ret, axis=1, out=csum_sq[:, 1:])
+
+    weights = np.full(spread_ret.shape, 1 / n_pairs)
+    if n_bars < vol_window:
+        return weights
+    total = csum[:, vol_window:] - csum[:, :-vol_window]
+    total_sq = csum_sq[:, vol_window:] - csum_sq[:, :-vol_window]
+    var = np.maximum(total_sq - total * total / vol_window, 0.0) / (vol_window - 1)
+    vol = np.sqrt(var * bars_per_year)
+    with np.errstate(divide="ignore"):
+        weights[:, vol_window - 1 :] = np.where(
+            vol > 0, target_vol / n_pairs / vol, 1 / n_pairs
+        )
+    return weights
+
+
+def _limit_deals(desired: np.ndarray, max_deals: int) -> np.ndarray:
+    # Solo se recorren las velas en las que algún par quiere cambiar de
+    # posición; entre medias las posiciones asignadas se mantienen
+    n_pairs = len(desired)
+    accepted = np.zeros_like(desired)
+    previous = np.zeros(n_pairs, dtype=desired.dtype)
+    current = np.zeros(n_pairs, dtype=desired.dtype)
+    open_deals = 0
+
+    changed_bars = np.flatnonzero(
+        np.concatenate(
+            [desired[:, :1] != 0, desired[:, 1:] != desired[:, :-1]], axis=1
+        ).any(axis=0)
+    )
+    last = 0
+    for t in changed_bars.tolist():
+        accepted[:, last:t] = current[:, None]
+        target = desired[:, t]
+        changed = np.flatnonzero(target != previous)
+        for k in changed.tolist():
+            if current[k] != 0:
+                current[k] = 0
+                open_deals -= 1
+        for k in changed.tolist():
+            if target[k] != 0 and open_deals < max_deals:
+                current[k] = target[k]
+                open_deals += 1
+        previous = target
+        last = t
+    accepted[:, last:] = current[:, None]
+    return accepted
+
+
+def _stacked_costs(
+    costs: CostModel, pairs: list[PortfolioPair], index: pd.DatetimeIndex
+) -> PairCosts:
+    # Costes de un lote de pares como columnas (pares, 1) y funding (pares,
+    # velas), para aplicar cost_returns a todas las filas a la vez
+    per_pair = [costs.for_pair(pair.s1, pair.s2, index) for pair in pairs]
+    n_bars = len(index)
+
+    def funding(attr: str) -> np.ndarray | None:
+        rows = [getattr(c, attr) for c in per_pair]
+        if all(r is None for r in rows):
+            return None
+        return np.stack([np.zeros(n_bars) if r is None else r for r in rows])
+
+    return PairCosts(
+        cost_s1=np.array([c.cost_s1 for c in per_pair])[:, None],
+        cost_s2=np.array([c.cost_s2 for c in per_pair])[:, None],
+        funding_s1=funding("funding_s1"),
+        funding_s2=funding("funding_s2"),
+    )
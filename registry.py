@@ -0,0 +1,147 @@
+import json
+import os
+import tempfile
+import tomllib
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+from hedge import SpreadModel
+
+
+@dataclass(slots=True)
+class PairConfig:
+    s1: str
+    s2: str
+    s1_gainium: str
+    s2_gainium: str
+    window: int
+    zscore: float
+    # Construcción del spread, p.ej. spread = { method = "kalman", window = 200 }
+    spread: SpreadModel = field(default_factory=SpreadModel)
+
+    @property
+    def key(self) -> tuple[str, str]:
+        return (self.s1, self.s2)
+
+
+@dataclass(slots=True)
+class PairState:
+    s1_long: bool = False
+    s1_short: bool = False
+    s2_long: bool = False
+    s2_short: bool = False
+
+    @property
+    def position(self) -> int:
+        # Posición de S1 como en signals.next_position; S2 va siempre al revés
+        if self.s1_long:
+            return 1
+        if self.s1_short:
+            return -1
+        return 0
+
+    @position.setter
+    def position(self, position: int):
+        self.s1_long = self.s2_short = position == 1
+        self.s1_short = self.s2_long = position == -1
+
+
+@dataclass(slots=True)
+class LiveConfig:
+    timeframe: int
+    url_bot: str
+    uuid_long: str
+    uuid_short: str
+    state_path: str = "live_state.json"
+    pairs: list[PairConfig] = field(default_factory=list)
+
+
+def load_config(path: str | Path) -> LiveConfig:
+    with open(path, "rb") as f:
+        raw = tomllib.load(f)
+
+    pairs = []
+    for pair in raw.pop("pairs", []):
+        if "spread" in pair:
+            pair["spread"] = SpreadModel(**pair["spread"])
+            # Valida que el método tenga versión vela a vela (ols mira al futuro)
+            pair["spread"].online()
+        pairs.append(PairConfig(**pair))
+    return LiveConfig(**raw, pairs=pairs)
+
+
+class PairRegistry:
+    # Pares y parámetros del bot en vivo cargados desde un fichero TOML, junto
+    # con el estado de las posiciones de cada par persistido en JSON. El
+    # fichero de configuración se puede editar en caliente: reload_if_changed
+    # lo vuelve a leer si ha cambiado, sin perder el estado de los pares.
+    __slots__ = ("config_path", "config", "mtime_ns", "state_path", "states")
+
+    def __init__(self, config_path: str | Path):
+        self.config_path = Path(config_path)
+        self.config = load_config(self.config_path)
+        self.mtime_ns = self.config_path.stat().st_mtime_ns
+        self.state_path = self.config_path.parent / self.config.state_path
+        self.states: dict[tuple[str, str], PairState] = self._load_states()
+
+    @property
+    def pairs(self) -> list[PairConfig]:
+        return self.config.pairs
+
+    def pair(self, key: tuple[str, str]) -> PairConfig | None:
+        for pair in self.config.pairs:
+            if pair.key == key:
+                return pair
+        return None
+
+    def state(self, pair: PairConfig) -> PairState:
+        return self.states.setdefault(pair.key, PairState())
+
+    def reload_if_changed(self) -> bool:
+        mtime_ns = self.config_path.stat().st_mtime_ns
+        if mtime_ns == self.mtime_ns:
+            return False
+
+        try:
+            config = load_config(self.config_path)
+        except (tomllib.TOMLDecodeError, TypeError, ValueError) as e:
+            # Un fichero a medio editar no debe tumbar el bucle. Se anota su
+            # mtime para no volver a leerlo (ni avisar) hasta que cambie
+            self.mtime_ns = mtime_ns
+            print(f"Configuración inválida, se mantiene la anterior: {e}")
+            return False
+
+        self.config = config
+        self.mtime_ns = mtime_ns
+        return True
+
+    def save_state(self):
+        # Escritura atómica: se escribe un temporal en el mismo directorio y se
+        # sustituye el fichero con os.replace, así un corte nunca deja el
+        # estado a medias
+        data = {f"{s1}|{s2}": asdict(state) for (s1, s2), state in self.states.items()}
+        fd, tmp_path = tempfile.mkstemp(
+            dir=self.state_path.parent, prefix=self.state_path.name, suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.state_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def _load_states(self) -> dict[tuple[str, str], PairState]:
+        if not self.state_path.exists():
+            return {}
+
+        with open(self.state_path) as f:
+            data = json.load(f)
+
+        states = {}
+        for key, flags in data.items():
+            s1, s2 = key.split("|")
+            states[(s1, s2)] = PairState(**flags)
+        return states
@@ -0,0 +1,271 @@
+import math
+from typing import Literal
+
+import numpy as np
+import pandas as pd
+
+from hedge import SpreadModel
+
+
+class RollingZScore:
+    # Media y varianza (ddof=1) de las últimas `window` observaciones mantenidas
+    # con actualizaciones tipo Welford sobre un buffer circular: cada nueva
+    # observación cuesta O(1). En cada vuelta completa del buffer se recalculan
+    # los momentos desde cero para que no se acumule error de redondeo.
+    def __init__(self, window: int):
+        self.window = window
+        self.buffer = np.zeros(window)
+        self.count = 0
+        self.pos = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.last = math.nan
+
+    @property
+    def ready(self) -> bool:
+        return self.count >= self.window
+
+    @property
+    def std(self) -> float:
+        if self.count < 2:
+            return math.nan
+        return math.sqrt(max(self.m2, 0.0) / (self.count - 1))
+
+    @property
+    def zscore(self) -> float:
+        if not self.ready:
+            return math.nan
+        std = self.std
+        if std == 0:
+            return math.nan
+        return (self.last - self.mean) / std
+
+    def update(self, value: float) -> float:
+        if self.count < self.window:
+            self.count += 1
+            delta = value - self.mean
+            self.mean += delta / self.count
+            self.m2 += delta * (value - self.mean)
+        else:
+            old = self.buffer[self.pos]
+            new_mean = self.mean + (value - old) / self.window
+            self.m2 += (value - old) * (value - new_mean + old - self.mean)
+            self.mean = new_mean
+
+        self.buffer[self.pos] = value
+        self.pos = (self.pos + 1) % self.window
+        self.last = value
+
+        if self.pos == 0 and self.ready:
+            self.mean = float(self.buffer.mean())
+            self.m2 = float(((self.buffer - self.mean) ** 2).sum())
+
+        return self.zscore
+
+    def extend(self, values: np.ndarray | list[float]) -> float:
+        for value in values:
+            self.update(float(value))
+        return self.zscore
+
+
+class SpreadZScoreTracker:
+    # Z-score del spread de un par, alimentado vela a vela con barras
+    # alineadas y cerradas. Recuerda la última vela ingerida para que cada
+    # ronda solo procese las nuevas. Sin modelo el spread es S1 - S2; con
+    # rolling_ols o kalman la beta se estima en línea y las velas de
+    # calentamiento del hedge no entran en la ventana del z-score.
+    def __init__(self, window: int, model: SpreadModel | None = None):
+        self.rolling = RollingZScore(window)
+        self.model = model
+        self.hedge = model.online() if model is not None else None
+        self.last_ts: pd.Timestamp | None = None
+        self.spread = math.nan
+
+    @property
+    def ready(self) -> bool:
+        return self.rolling.ready
+
+    @property
+    def zscore(self) -> float:
+        return self.rolling.zscore
+
+    @property
+    def hedge_ratio(self) -> float:
+        return 1.0 if self.hedge is None else self.hedge.hedge_ratio
+
+    def ingest_bar(self, ts: pd.Timestamp, s1: float, s2: float) -> bool:
+        # Devuelve True si la vela era nueva y se ha incorporado
+        if self.last_ts is not None and ts <= self.last_ts:
+            return False
+
+        spread = s1 - s2 if self.hedge is None else self.hedge.update(s1, s2)
+        self.spread = spread
+        if not math.isnan(spread):
+            self.rolling.update(spread)
+        self.last_ts = ts
+        return True
+
+    def ingest(self, bars: pd.DataFrame) -> float:
+        # bars: columnas S1 y S2 indexadas por la apertura de la vela
+        if self.last_ts is not None:
+            bars = bars[bars.index > self.last_ts]
+        if bars.empty:
+            return self.zscore
+
+        if self.hedge is not None:
+            for ts, s1, s2 in zip(bars.index, bars["S1"].tolist(), bars["S2"].tolist()):
+                self.ingest_bar(ts, s1, s2)
+            return self.zscore
+
+        spread = bars["S1"].to_numpy() - bars["S2"].to_numpy()
+        self.rolling.extend(spread)
+        self.spread = float(spread[-1])
+        self.last_ts = bars.index[-1]
+
+        return self.zscore
+
+
+def next_position(position: int, zscore: float, zscore_mult: float) -> int:
+    # Regla de entrada/salida de la estrategia para una vela, la misma en vivo
+    # (decide_signals) y en el backtest (position_kernel es su versión
+    # vectorizada). Posición de S1: 1 largo, -1 corto, 0 fuera; S2 va al
+    # revés. Con z-score NaN no cambia nada.
+    if position == 1 and zscore >= 0 or position == -1 and zscore <= 0:
+        position = 0
+    if zscore > zscore_mult:
+        return -1
+    if zscore < -zscore_mult:
+        return 1
+    return position
+
+
+class PairSignalEngine:
+    # Estado incremental de un par: el z-score del spread y la posición. Es lo
+    # que hace el bot en vivo con cada vela cerrada, así que pasar el
+    # histórico por aquí reproduce exactamente sus decisiones.
+    def __init__(
+        self,
+        window: int,
+        zscore_mult: float,
+        model: SpreadModel | None = None,
+        position: int = 0,
+    ):
+        self.tracker = SpreadZScoreTracker(window, model)
+        self.zscore_mult = zscore_mult
+        self.position = position
+
+    def on_bar(self, ts, s1: float, s2: float) -> int:
+        if self.tracker.ingest_bar(ts, s1, s2) and self.tracker.ready:
+            self.position = next_position(
+                self.position, self.tracker.zscore, self.zscore_mult
+            )
+        return self.position
+
+
+def replay(
+    series1: pd.Series | np.ndarray,
+    series2: pd.Series | np.ndarray,
+    window: int,
+    zscore_mult: float,
+    model: SpreadModel | None = None,
+    mode: Literal["fast", "exact"] = "fast",
+) -> pd.DataFrame:
+    # Señales de un par sobre un histórico: spread, hedge ratio, z-score y
+    # posición de S1 en cada vela (antes de operar en la siguiente).
+    # - exact: vela a vela por PairSignalEngine, el mismo estado que en vivo
+    # - fast: el mismo cálculo con kernels vectorizados (millones de velas
+    #   por segundo); coincide con exact salvo redondeo (~1e-12) en el z-score
+    index = series1.index if isinstance(series1, pd.Series) else None
+    s1 = np.asarray(series1, dtype=np.float64)
+    s2 = np.asarray(series2, dtype=np.float64)
+    n_bars = len(s1)
+
+    if mode == "exact":
+        engine = PairSignalEngine(window, zscore_mult, model)
+        tracker = engine.tracker
+        out = np.full((n_bars, 4), np.nan)
+        for t, (x, y) in enumerate(zip(s1.tolist(), s2.tolist())):
+            position = engine.on_bar(t, x, y)
+            out[t] = (tracker.spread, tracker.hedge_ratio, tracker.zscore, position)
+        spread, hedge_ratio, zscores, positions = out.T
+    elif mode == "fast":
+        if model is None or model.method == "diff":
+            spread, hedge_ratio = s1 - s2, np.ones(n_bars)
+        else:
+            spread, hedge_ratio = model.fit(s1, s2)
+        # El z-score empieza tras el calentamiento del hedge, como en vivo
+        warmup = int(np.argmax(~np.isnan(spread))) if n_bars else 0
+        zscores = np.full(n_bars, np.nan)
+        zscores[warmup:] = rolling_zscores(spread[warmup:], np.array([window]))[0]
+        zscores[~np.isfinite(zscores)] = np.nan
+        positions = position_kernel(zscores, zscore_mult)
+    else:
+        raise ValueError(f"Modo de replay desconocido: {mode}")
+
+    return pd.DataFrame(
+        {
+            "spread": spread,
+            "hedge_ratio": hedge_ratio,
+            "zscore": zscores,
+            "position": positions,
+        },
+        index=index,
+    )
+
+
+def rolling_zscores(spread: np.ndarray, windows: np.ndarray) -> np.ndarray:
+    # Media y desviación rodantes (ddof=1) para todas las ventanas a partir de
+    # sumas acumuladas; centrar el spread reduce la cancelación numérica
+    spread = np.asarray(spread, dtype=np.float64)
+    centered = spread - spread.mean()
+    csum = np.concatenate([[0.0], np.cumsum(centered)])
+    csum_sq = np.concatenate([[0.0], np.cumsum(centered * centered)])
+
+    n_bars = len(spread)
+    zscores = np.full((len(windows), n_bars), np.nan)
+    for k, window in enumerate(windows):
+        if window > n_bars:
+            continue
+        total = csum[window:] - csum[:-window]
+        total_sq = csum_sq[window:] - csum_sq[:-window]
+        mean = total / window
+        var = np.maximum(total_sq - total * mean, 0.0) / (window - 1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            zscores[k, window - 1 :] = (centered[window - 1 :] - mean) / np.sqrt(var)
+
+    return zscores
+
+
+def position_kernel(zscores: np.ndarray, zscore_mult: float | np.ndarray) -> np.ndarray:
+    # next_position aplicada vela a vela, resuelta sin bucle (sobre el último
+    # eje, así que admite lotes de series y de umbrales):
+    # - Entradas: z > mult -> S1 en corto (-1); z < -mult -> S1 en largo (1)
+    # - Salidas: un corto se cierra al cruzar la media (z <= 0) y un largo
+    #   cuando z >= 0, siempre que ocurra después de la última entrada
+    # Devuelve la posición de S1 partiendo de cero; la de S2 es la contraria.
+    zscores = np.asarray(zscores, dtype=np.float64)
+    zscore_mult = np.asarray(zscore_mult, dtype=np.float64)
+    if zscore_mult.ndim > 0:
+        zscore_mult = zscore_mult[..., None]
+
+    bars = np.arange(zscores.shape[-1])
+
+    short_entry = zscores > zscore_mult
+    long_entry = ~short_entry & (zscores < -zscore_mult)
+    entry_side = long_entry.astype(np.float64) - short_entry
+
+    last_entry = np.maximum.accumulate(
+        np.where(short_entry | long_entry, bars, -1), axis=-1
+    )
+    side = np.take_along_axis(
+        np.broadcast_to(entry_side, last_entry.shape),
+        np.maximum(last_entry, 0),
+        axis=-1,
+    )
+    side[last_entry < 0] = 0.0
+
+    last_below = np.maximum.accumulate(np.where(zscores <= 0, bars, -1), axis=-1)
+    last_above = np.maximum.accumulate(np.where(zscores >= 0, bars, -1), axis=-1)
+    exited = np.where(side < 0, last_below, last_above) > last_entry
+
+    return np.where(exited, 0.0, side)
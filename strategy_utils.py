@@ -1,8 +1,17 @@
 import time
 import datetime
 import json
+import math
+import statistics
+import uuid as uuid_lib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import cache
 
 import requests
+import urllib3
+from requests.adapters import HTTPAdapter
 
 
 def esperar_al_siguiente_cuarto():
@@ -20,19 +29,145 @@ def esperar_al_siguiente_cuarto():
     time.sleep(segundos_a_esperar)
 
 
-def send_webhook(url: str, action: str, uuid: str, symbol: str):
-    payload = {"action": action, "uuid": uuid, "symbol": symbol}
-    headers = {"Content-Type": "application/json"}
+@dataclass
+class WebhookResult:
+    action: str
+    symbol: str
+    ok: bool
+    status_code: int | None
+    attempts: int
+    latency_ms: float
+    idempotency_key: str
+
+
+def _not_delivered(error: requests.exceptions.RequestException) -> bool:
+    # True si la petición no llegó a salir (fallo al conectar); tras un
+    # timeout de lectura o una conexión cortada el bot puede haberla recibido
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    if isinstance(error, requests.exceptions.ConnectionError) and error.args:
+        reason = getattr(error.args[0], "reason", None)
+        return isinstance(reason, urllib3.exceptions.NewConnectionError)
+    return False
+
+
+class WebhookDispatcher:
+    # Envío de webhooks con una sesión HTTP persistente (pool de conexiones),
+    # reintentos acotados con backoff exponencial y una clave de idempotencia
+    # por señal que se mantiene entre reintentos. Las patas de una operación se
+    # envían en paralelo con send_many.
+    #
+    # Las aperturas solo se reintentan si el bot no pudo recibir la petición
+    # (error de conexión, 5xx o 429): tras un timeout de lectura reintentar
+    # podría abrir un deal duplicado si el bot no deduplica por la clave.
+    OPENING_ACTIONS = frozenset({"startDeal", "openDeal"})
+
+    def __init__(
+        self,
+        url: str,
+        timeout: float = 5.0,
+        max_retries: int = 2,
+        backoff: float = 0.25,
+        max_workers: int = 8,
+    ):
+        self.url = url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+        self.latencies_ms: deque[float] = deque(maxlen=1000)
+        self.sent = 0
+        self.failed = 0
+
+    def send(
+        self, action: str, uuid: str, symbol: str, idempotency_key: str | None = None
+    ) -> WebhookResult:
+        payload = {"action": action, "uuid": uuid, "symbol": symbol}
+        key = idempotency_key or str(uuid_lib.uuid4())
+        headers = {"Content-Type": "application/json", "Idempotency-Key": key}
+
+        start = time.perf_counter()
+        status_code = None
+        ok = False
+        attempt = 0
+        while attempt <= self.max_retries:
+            attempt += 1
+            try:
+                response = self.session.post(
+                    url=self.url,
+                    data=json.dumps(payload),
+                    headers=headers,
+                    timeout=self.timeout,
+                )
+                status_code = response.status_code
+                if status_code == 200:
+                    ok = True
+                    break
+                print(f"Error al enviar webhook: {status_code} - {response.text}")
+                # Los errores del cliente (salvo 429) no se arreglan reintentando
+                if 400 <= status_code < 500 and status_code != 429:
+                    break
+            except requests.exceptions.RequestException as e:
+                print(f"Error al enviar webhook: {e}")
+                if action in self.OPENING_ACTIONS and not _not_delivered(e):
+                    print(f"No se reintenta {action} {symbol}: pudo llegar al bot")
+                    break
 
-    try:
-        response = requests.post(
-            url=url, data=json.dumps(payload), headers=headers, timeout=5
-        )
+            if attempt <= self.max_retries:
+                time.sleep(self.backoff * 2 ** (attempt - 1))
 
-        if response.status_code == 200:
-            print(f"Webhook enviado correctamente: {action} {symbol}")
+        latency_ms = (time.perf_counter() - start) * 1000
+        self.latencies_ms.append(latency_ms)
+        self.sent += 1
+        if ok:
+            print(
+                f"Webhook enviado correctamente: {action} {symbol} ({latency_ms:.0f} ms)"
+            )
         else:
-            print(f"Error al enviar webhook: {response.status_code} - {response.text}")
+            self.failed += 1
 
-    except requests.exceptions.RequestException as e:
-        print(f"Error al enviar webhook: {e}")
+        return WebhookResult(action, symbol, ok, status_code, attempt, latency_ms, key)
+
+    def submit(
+        self, action: str, uuid: str, symbol: str, idempotency_key: str | None = None
+    ) -> Future[WebhookResult]:
+        return self.executor.submit(self.send, action, uuid, symbol, idempotency_key)
+
+    def send_many(self, signals: list[tuple[str, str, str]]) -> list[WebhookResult]:
+        # signals: (action, uuid, symbol); se envían todos a la vez
+        futures = [
+            self.submit(action, uuid, symbol) for action, uuid, symbol in signals
+        ]
+        return [future.result() for future in futures]
+
+    def stats(self) -> dict[str, float]:
+        latencies = sorted(self.latencies_ms)
+        if not latencies:
+            return {"sent": self.sent, "failed": self.failed}
+
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "p50_ms": statistics.median(latencies),
+            "p95_ms": latencies[math.ceil(0.95 * len(latencies)) - 1],
+            "max_ms": latencies[-1],
+        }
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.session.close()
+
+
+@cache
+def get_dispatcher(url: str) -> WebhookDispatcher:
+    return WebhookDispatcher(url)
+
+
+def send_webhook(url: str, action: str, uuid: str, symbol: str):
+    get_dispatcher(url).send(action, uuid, symbol)
@@ -0,0 +1,10 @@
+import pandas as pd
+import pytest
+
+from tests.helpers import synthetic_prices
+
+
+@pytest.fixture
+def prices() -> pd.DataFrame:
+    # Universo sintético pequeño (con pares cointegrados) de los benchmarks
+    return synthetic_prices(5, 600)
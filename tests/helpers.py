@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+
+# Datos sintéticos y referencias compartidos por los tests y los benchmarks
+
+
+def synthetic_prices(n_symbols: int, n_bars: int, seed: int = 0) -> pd.DataFrame:
+    # Universo sintético con factores comunes para que existan pares cointegrados
+    rng = np.random.default_rng(seed)
+    n_factors = max(1, n_symbols // 5)
+    factors = np.cumsum(rng.normal(size=(n_bars, n_factors)), axis=0)
+    loadings = rng.normal(size=(n_factors, n_symbols))
+    idiosyncratic = np.cumsum(rng.normal(scale=0.3, size=(n_bars, n_symbols)), axis=0)
+    idiosyncratic[:, ::3] = 0.0
+    prices = (
+        1000 + factors @ loadings + idiosyncratic + rng.normal(size=(n_bars, n_symbols))
+    )
+
+    index = pd.date_range("2025-01-01", periods=n_bars, freq="15min", name="datetime")
+    columns = [f"SYM{k}/USDT:USDT" for k in range(n_symbols)]
+    return pd.DataFrame(prices, index=index, columns=columns)
+
+
+def loop_positions(zscores: np.ndarray, zscore_mult: float) -> np.ndarray:
+    # Implementación original por barras, usada como referencia
+    pos_s1 = np.zeros(len(zscores))
+    current_pos_s1 = 0
+    for i, z in enumerate(zscores):
+        if current_pos_s1 == -1 and z <= 0:
+            current_pos_s1 = 0
+        elif current_pos_s1 == 1 and z >= 0:
+            current_pos_s1 = 0
+
+        if z > zscore_mult:
+            current_pos_s1 = -1
+        elif z < -zscore_mult:
+            current_pos_s1 = 1
+
+        pos_s1[i] = current_pos_s1
+
+    return pos_s1
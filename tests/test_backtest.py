@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest import backtest, grid_backtest, performance_metrics
+from cointegration import cointegration_test, find_best_pair
+from costs import CostModel
+from hedge import SpreadModel
+from tests.helpers import synthetic_prices
+
+WINDOWS = [20, 45, 80]
+MULTS = [0.8, 1.5, 2.2]
+
+
+@pytest.fixture(scope="module")
+def coint_result():
+    return cointegration_test(synthetic_prices(2, 1_500), engine="vectorized")
+
+
+def _costs(coint_result) -> CostModel:
+    index = coint_result.df.index
+    rng = np.random.default_rng(5)
+    funding_index = pd.date_range(index[0], index[-1], freq="8h")
+    return CostModel(
+        slippage_bps=3,
+        funding_rates={
+            name: pd.Series(rng.normal(1e-4, 2e-4, len(funding_index)), funding_index)
+            for name in coint_result.df.columns
+        },
+    )
+
+
+@pytest.mark.parametrize("with_costs", [False, True], ids=["gross", "costs"])
+@pytest.mark.parametrize(
+    "model", [None, SpreadModel("rolling_ols", window=150)], ids=["diff", "ols"]
+)
+def test_grid_matches_backtest_per_cell(coint_result, model, with_costs):
+    costs = _costs(coint_result) if with_costs else None
+    pair = find_best_pair(coint_result, WINDOWS[0], spread_model=model)
+
+    grid = grid_backtest(
+        pair.series1, pair.series2, WINDOWS, MULTS, spread_model=model, costs=costs
+    )
+
+    traded = 0
+    for a, window in enumerate(WINDOWS):
+        pair = find_best_pair(coint_result, window, spread_model=model)
+        for b, mult in enumerate(MULTS):
+            df = backtest(pair, mult, costs=costs)
+            expected = performance_metrics(df)["Strategy"]
+            traded += int((df["position_s1"] != 0).any())
+            for name, values in grid.metrics.items():
+                np.testing.assert_allclose(
+                    values[a, b],
+                    expected[name],
+                    rtol=1e-9,
+                    atol=1e-12,
+                    equal_nan=True,
+                    err_msg=f"{name} (window={window}, zscore_mult={mult})",
+                )
+    assert traded == len(WINDOWS) * len(MULTS)
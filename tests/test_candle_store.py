@@ -0,0 +1,222 @@
+from types import SimpleNamespace
+
+import pytest
+
+from data import ccxt_data
+from data.candle_store import CandleStore
+from data.ccxt_data import fetch_funding_rates, fetch_ohlcv_range
+from data.rate_limiter import TokenBucket
+
+MINUTE = 60_000
+TIMEFRAME = "15m"
+STEP = 15 * MINUTE
+
+
+class FakeExchange:
+    # Sustituye a ccxt.bitget: velas de 15m desde t=0 hasta el reloj simulado,
+    # con la vela en curso incluida y un cierre que cambia en cada petición
+    rateLimit = 1
+
+    def __init__(self, now_ms: int):
+        self.now_ms = now_ms
+        self.calls: list[int] = []
+
+    def fetch_ohlcv(self, symbol, timeframe, since, limit):
+        self.calls.append(since)
+        first = -(-since // STEP) * STEP
+        candles = []
+        for ts in range(first, self.now_ms, STEP)[:limit]:
+            close = 100.0 + ts // STEP
+            if ts + STEP > self.now_ms:
+                close += len(self.calls) / 10
+            candles.append([ts, close, close, close, close, 1.0])
+        return candles
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now_ms=0)
+    monkeypatch.setattr(
+        ccxt_data, "time", SimpleNamespace(time=lambda: clock.now_ms / 1000)
+    )
+    return clock
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = CandleStore(tmp_path / "candles.sqlite")
+    yield store
+    store.close()
+
+
+def _fetch(store, exchange, start, end):
+    return fetch_ohlcv_range(
+        "BTC/USDT:USDT",
+        TIMEFRAME,
+        start,
+        end,
+        store=store,
+        exchange=exchange,
+        rate_limiter=TokenBucket(rate=1e9, capacity=1e9),
+    )
+
+
+def test_second_call_reads_from_store(clock, store):
+    clock.now_ms = 500 * STEP
+    exchange = FakeExchange(clock.now_ms)
+
+    first = _fetch(store, exchange, 0, 300 * STEP)
+    calls = len(exchange.calls)
+    second = _fetch(store, exchange, 0, 300 * STEP)
+
+    assert len(first) == 300
+    assert len(exchange.calls) == calls
+    assert second.equals(first)
+
+
+def test_only_missing_tail_is_fetched(clock, store):
+    clock.now_ms = 500 * STEP
+    exchange = FakeExchange(clock.now_ms)
+    _fetch(store, exchange, 0, 200 * STEP)
+    exchange.calls.clear()
+
+    df = _fetch(store, exchange, 0, 300 * STEP)
+
+    assert exchange.calls[0] == 200 * STEP
+    assert len(df) == 300
+    assert df.index.is_unique and df.index.is_monotonic_increasing
+
+
+def test_gap_between_covered_ranges_is_filled(clock, store):
+    clock.now_ms = 500 * STEP
+    exchange = FakeExchange(clock.now_ms)
+    _fetch(store, exchange, 0, 100 * STEP)
+    _fetch(store, exchange, 200 * STEP, 300 * STEP)
+    exchange.calls.clear()
+
+    df = _fetch(store, exchange, 0, 300 * STEP)
+
+    assert exchange.calls[0] == 100 * STEP
+    assert max(exchange.calls) < 200 * STEP
+    assert len(df) == 300
+    assert df.index.is_unique
+    assert store.missing_ranges("BTC/USDT:USDT", TIMEFRAME, 0, 300 * STEP) == []
+
+
+def test_overlapping_pages_are_deduplicated(clock, store):
+    clock.now_ms = 500 * STEP
+    exchange = FakeExchange(clock.now_ms)
+    # La última página se pasa del final del hueco y repite velas ya guardadas
+    _fetch(store, exchange, 150 * STEP, 250 * STEP)
+
+    df = _fetch(store, exchange, 0, 250 * STEP)
+
+    assert len(df) == 250
+    assert df.index.is_unique
+
+
+def test_in_progress_candle_is_never_covered(clock, store):
+    clock.now_ms = 100 * STEP + 5 * MINUTE
+    exchange = FakeExchange(clock.now_ms)
+    end = 200 * STEP
+
+    first = _fetch(store, exchange, 0, end)
+    assert store.missing_ranges("BTC/USDT:USDT", TIMEFRAME, 0, end) == [
+        (100 * STEP, end)
+    ]
+
+    # La vela en curso se vuelve a pedir y sustituye a la guardada
+    exchange.calls.clear()
+    second = _fetch(store, exchange, 0, end)
+
+    assert exchange.calls[0] == 100 * STEP
+    assert len(second) == len(first) == 101
+    assert second["close"].iloc[-1] != first["close"].iloc[-1]
+    assert second["close"].iloc[:-1].equals(first["close"].iloc[:-1])
+
+
+def test_truncated_fetch_only_covers_received_candles(clock, store):
+    clock.now_ms = 500 * STEP
+    # El exchange corta la paginación: solo devuelve la primera página
+    exchange = FakeExchange(clock.now_ms)
+    exchange.fetch_ohlcv = lambda symbol, timeframe, since, limit: (
+        FakeExchange.fetch_ohlcv(exchange, symbol, timeframe, since, limit)
+        if since == 0
+        else []
+    )
+
+    _fetch(store, exchange, 0, 300 * STEP)
+
+    assert store.missing_ranges("BTC/USDT:USDT", TIMEFRAME, 0, 300 * STEP) == [
+        (100 * STEP, 300 * STEP)
+    ]
+
+
+def test_empty_response_covers_nothing(clock, store):
+    clock.now_ms = 500 * STEP
+    exchange = FakeExchange(0)
+
+    df = _fetch(store, exchange, 0, 100 * STEP)
+
+    assert df.empty
+    assert store.missing_ranges("BTC/USDT:USDT", TIMEFRAME, 0, 100 * STEP) == [
+        (0, 100 * STEP)
+    ]
+
+
+class FakeFundingExchange:
+    # Cobros de funding cada 8 velas desde t=0; `until` simula un exchange que
+    # deja de devolver datos a partir de ese momento
+    rateLimit = 1
+
+    def __init__(self, until: int):
+        self.until = until
+
+    def fetch_funding_rate_history(self, symbol, since, limit):
+        first = -(-since // (8 * STEP)) * 8 * STEP
+        return [
+            {"timestamp": ts, "fundingRate": 1e-4}
+            for ts in range(first, self.until, 8 * STEP)[:limit]
+        ]
+
+
+def _fetch_funding(store, exchange, start, end):
+    return fetch_funding_rates(
+        "BTC/USDT:USDT",
+        start,
+        end,
+        store=store,
+        exchange=exchange,
+        rate_limiter=TokenBucket(rate=1e9, capacity=1e9),
+    )
+
+
+def test_truncated_funding_only_covers_received_rates(clock, store):
+    clock.now_ms = 5_000 * STEP
+    exchange = FakeFundingExchange(until=1_000 * STEP)
+
+    rates = _fetch_funding(store, exchange, 0, 2_000 * STEP)
+
+    assert len(rates) == 125
+    assert store.missing_ranges("BTC/USDT:USDT", "funding", 0, 2_000 * STEP) == [
+        (992 * STEP + 1, 2_000 * STEP)
+    ]
+
+
+def test_empty_funding_response_covers_nothing(clock, store):
+    clock.now_ms = 5_000 * STEP
+    exchange = FakeFundingExchange(until=0)
+
+    assert _fetch_funding(store, exchange, 0, 100 * STEP).empty
+    assert store.missing_ranges("BTC/USDT:USDT", "funding", 0, 100 * STEP) == [
+        (0, 100 * STEP)
+    ]
+
+
+def test_complete_funding_covers_whole_gap(clock, store):
+    clock.now_ms = 5_000 * STEP
+    exchange = FakeFundingExchange(until=5_000 * STEP)
+
+    _fetch_funding(store, exchange, 0, 2_000 * STEP + 3 * STEP)
+
+    assert store.missing_ranges("BTC/USDT:USDT", "funding", 0, 2_003 * STEP) == []
@@ -0,0 +1,48 @@
+import pytest
+
+from cli import main
+from data.frame_io import write_frame
+
+
+def test_portfolio_with_symbol_missing_from_prices(tmp_path, prices):
+    path = tmp_path / "prices.parquet"
+    write_frame(prices, path)
+    s1 = prices.columns[0]
+    config = tmp_path / "pairs.toml"
+    config.write_text(
+        'timeframe = 15\nurl_bot = "http://127.0.0.1:9"\n'
+        'uuid_long = "long"\nuuid_short = "short"\n\n'
+        f'[[pairs]]\ns1 = "{s1}"\ns2 = "NOPE/USDT:USDT"\ns1_gainium = "A"\n'
+        's2_gainium = "B"\nwindow = 20\nzscore = 1.5\n'
+    )
+
+    with pytest.raises(SystemExit, match="NOPE/USDT:USDT"):
+        main(["portfolio", "--prices", str(path), "--config", str(config)])
+
+
+def test_convert_with_missing_columns(tmp_path, prices):
+    source = tmp_path / "prices.feather"
+    write_frame(prices, source)
+
+    with pytest.raises(SystemExit, match="NOPE/USDT:USDT"):
+        main(
+            [
+                "convert",
+                str(source),
+                str(tmp_path / "out.parquet"),
+                "--columns",
+                prices.columns[0],
+                "NOPE/USDT:USDT",
+            ]
+        )
+
+
+def test_backtest_with_pair_without_full_history(tmp_path, prices):
+    # dropna descarta la columna con huecos: no queda par que probar
+    s1, s2 = prices.columns[:2]
+    prices.iloc[10, 1] = float("nan")
+    path = tmp_path / "prices.parquet"
+    write_frame(prices, path)
+
+    with pytest.raises(SystemExit, match=f"Sin histórico completo para: {s2}"):
+        main(["backtest", "--prices", str(path), "--pair", s1, s2])
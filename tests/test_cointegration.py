@@ -0,0 +1,96 @@
+import warnings
+
+import numpy as np
+import pytest
+from statsmodels.tsa.stattools import coint
+
+from cointegration import (
+    CointegrationTestResult,
+    PairScreen,
+    WalkForwardCointegration,
+    best_pair_index,
+    cointegration_test,
+)
+
+
+@pytest.fixture(autouse=True)
+def _silence_collinearity_warning():
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        yield
+
+
+def test_vectorized_matches_statsmodels(prices):
+    vectorized = cointegration_test(prices, engine="vectorized", block_size=3)
+    reference = cointegration_test(prices, engine="statsmodels")
+
+    np.testing.assert_allclose(
+        vectorized.pvalue_matrix, reference.pvalue_matrix, atol=1e-6
+    )
+    np.testing.assert_allclose(
+        vectorized.score_matrix, reference.score_matrix, rtol=1e-8
+    )
+    assert vectorized.pairs == reference.pairs
+
+
+def test_collinear_and_constant_columns(prices):
+    # Regresión: un par colineal hacía fallar la factorización de Cholesky de
+    # todo el bloque y una columna constante daba NaN
+    first = prices.columns[0]
+    prices["COLLINEAR"] = 2 * prices[first] + 1
+    prices["USDC"] = 1.0
+    prices["TREND"] = np.arange(len(prices), dtype=float)
+
+    vectorized = cointegration_test(prices, engine="vectorized", block_size=4)
+    reference = cointegration_test(prices, engine="statsmodels")
+
+    i, j = prices.columns.get_loc(first), prices.columns.get_loc("COLLINEAR")
+    assert vectorized.score_matrix[i, j] == -np.inf
+    assert vectorized.pvalue_matrix[i, j] == 0.0
+
+    usdc = prices.columns.get_loc("USDC")
+    _, pvalue, _ = coint(prices[first], prices["USDC"])
+    assert vectorized.pvalue_matrix[0, usdc] == pytest.approx(pvalue, abs=1e-6)
+
+    assert not np.isnan(vectorized.pvalue_matrix).any()
+    np.testing.assert_allclose(
+        vectorized.pvalue_matrix, reference.pvalue_matrix, atol=1e-6
+    )
+
+
+def test_best_pair_skips_nan_pvalues(prices):
+    n = prices.shape[1]
+    pvalues = np.ones((n, n))
+    pvalues[0, 1] = np.nan
+    pvalues[2, 3] = 0.01
+    result = CointegrationTestResult(prices, np.zeros((n, n)), pvalues, [])
+
+    assert best_pair_index(result) == (2, 3)
+
+
+def test_walk_forward_matches_statsmodels(prices):
+    window, lag, step = 200, 2, 25
+    scanner = WalkForwardCointegration(list(prices.columns), window, lag, step)
+    # Velas en trozos irregulares, como llegan en vivo
+    for start, stop in zip([0, 1, 90, 333, 334], [1, 90, 333, 334, len(prices)]):
+        cube = scanner.update(prices.iloc[start:stop])
+
+    assert len(cube.index) == (len(prices) - window) // step + 1
+    for t, end in enumerate(cube.index):
+        stop = prices.index.get_loc(end) + 1
+        frame = prices.iloc[stop - window : stop]
+        for k, (s1, s2) in enumerate(cube.pairs):
+            score, pvalue, _ = coint(frame[s1], frame[s2], maxlag=lag, autolag=None)
+            assert cube.scores[t, k] == pytest.approx(score, rel=1e-6)
+            assert cube.pvalues[t, k] == pytest.approx(pvalue, abs=1e-6)
+
+
+def test_screen_reports_tested_pairs_without_printing(prices, capsys):
+    n = prices.shape[1]
+    screen = PairScreen(min_correlation=0.5, top_k=4)
+
+    result = cointegration_test(prices, engine="vectorized", screen=screen)
+
+    assert capsys.readouterr().out == ""
+    assert result.n_tested == n * (n - 1) // 2 - len(result.screened) <= 4
+    assert cointegration_test(prices, engine="vectorized").n_tested == n * (n - 1) // 2
@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest import replay_backtest
+from costs import CostModel, PairCosts, cost_returns
+from hedge import SpreadModel
+
+HOUR = pd.Timedelta(hours=1)
+
+
+def test_fees_only_on_position_changes():
+    pos_s1 = np.array([0.0, 1.0, 1.0, 1.0, -1.0, -1.0, 0.0])
+    # Con hedge ratio el peso de S2 varía aunque S1 no cambie
+    pos_s2 = np.array([0.0, -0.8, -0.9, -1.1, 1.2, 1.3, 0.0])
+    costs = PairCosts(cost_s1=0.001, cost_s2=0.002)
+
+    cost = cost_returns(pos_s1, pos_s2, costs)
+
+    # Entrada, giro (dos unidades en S1) y salida; sin rebalanceo de S2
+    expected = [
+        0.0,
+        0.001 + 0.8 * 0.002,
+        0.0,
+        0.0,
+        2 * 0.001 + 2.3 * 0.002,
+        0.0,
+        0.001 + 1.3 * 0.002,
+    ]
+    np.testing.assert_allclose(cost, expected, rtol=1e-12)
+
+
+def test_leg_cost_uses_symbol_slippage():
+    model = CostModel(
+        taker_fee_bps=6,
+        maker_fee_bps=2,
+        maker_ratio=0.25,
+        slippage_bps=1,
+        symbol_slippage_bps={"PEPE": 10},
+    )
+    index = pd.date_range("2024-01-01", periods=4, freq="h")
+
+    costs = model.for_pair("BTC", "PEPE", index)
+
+    assert costs.cost_s1 == pytest.approx((5 + 1) / 10_000)
+    assert costs.cost_s2 == pytest.approx((5 + 10) / 10_000)
+    assert costs.funding_s1 is None and costs.funding_s2 is None
+
+
+def test_funding_sign_and_alignment():
+    index = pd.date_range("2024-01-01", periods=6, freq="h")
+    funding = pd.Series(
+        [0.01, 0.02, 0.03, 0.05],
+        # En la apertura de la vela 2, dentro de la 3, antes y después de la
+        # muestra
+        index=[index[2], index[3] + HOUR / 2, index[0] - HOUR, index[-1] + HOUR],
+    )
+    model = CostModel(funding_rates={"BTC": funding, "ETH": -funding})
+
+    costs = model.for_pair("BTC", "ETH", index)
+
+    np.testing.assert_allclose(costs.funding_s1, [0, 0, 0.01, 0.02, 0, 0])
+    np.testing.assert_allclose(costs.funding_s2, [0, 0, -0.01, -0.02, 0, 0])
+
+    # Largo en S1 y corto en S2 desde la vela 1: el largo paga el funding
+    # positivo y el corto paga el negativo
+    pos_s1 = np.array([0.0, 1.0, 1.0, 1.0, 1.0, 1.0])
+    zero_fees = PairCosts(0.0, 0.0, costs.funding_s1, costs.funding_s2)
+    cost = cost_returns(pos_s1, -pos_s1, zero_fees)
+    np.testing.assert_allclose(cost, [0, 0, 0.02, 0.04, 0, 0])
+
+    # El corto en S1 cobra el funding positivo; en la vela de la entrada
+    # todavía no hay posición
+    late = np.array([0.0, 0.0, -1.0, -1.0, -1.0, -1.0])
+    only_s1 = PairCosts(0.0, 0.0, costs.funding_s1)
+    np.testing.assert_allclose(
+        cost_returns(late, np.zeros(6), only_s1), [0, 0, 0, -0.02, 0, 0]
+    )
+
+
+@pytest.mark.parametrize(
+    "model", [None, SpreadModel("rolling_ols", window=150)], ids=["diff", "ols"]
+)
+def test_net_is_gross_minus_costs(prices, model):
+    index = pd.date_range("2024-01-01", periods=len(prices), freq="15min")
+    s1 = prices.iloc[:, 0].set_axis(index)
+    s2 = prices.iloc[:, 1].set_axis(index)
+    rng = np.random.default_rng(3)
+    funding_index = pd.date_range(index[0], index[-1], freq="8h")
+    costs = CostModel(
+        slippage_bps=2,
+        funding_rates={
+            s1.name: pd.Series(
+                rng.normal(1e-4, 1e-4, len(funding_index)), funding_index
+            )
+        },
+    )
+
+    gross = replay_backtest(s1, s2, 20, 1.0, model)
+    net = replay_backtest(s1, s2, 20, 1.0, model, costs=costs)
+
+    pd.testing.assert_series_equal(
+        net["gross_ret"], gross["strategy_ret"], check_names=False
+    )
+    assert (net["costs"] != 0).any()
+    np.testing.assert_allclose(
+        net["strategy_ret"], np.nan_to_num(net["gross_ret"]) - net["costs"]
+    )
+    np.testing.assert_allclose(
+        net["equity"], np.cumprod(1 + net["strategy_ret"]), rtol=1e-12
+    )
+    assert net["equity"].iloc[-1] < net["gross_equity"].iloc[-1]
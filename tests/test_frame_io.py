@@ -0,0 +1,25 @@
+import pandas as pd
+import pytest
+
+from data.frame_io import read_frame, write_frame
+
+
+@pytest.mark.parametrize("suffix", [".parquet", ".feather", ".csv"])
+def test_round_trip_with_columns(tmp_path, prices, suffix):
+    path = tmp_path / f"prices{suffix}"
+    write_frame(prices, path)
+    columns = list(prices.columns[[3, 1]])
+
+    df = read_frame(path, columns=columns)
+
+    pd.testing.assert_frame_equal(df, prices[columns], check_freq=False)
+
+
+@pytest.mark.parametrize("suffix", [".parquet", ".feather", ".csv"])
+def test_missing_columns_are_reported(tmp_path, prices, suffix):
+    path = tmp_path / f"prices{suffix}"
+    write_frame(prices, path)
+    columns = [prices.columns[0], "NOPE/USDT:USDT", "OTHER/USDT:USDT"]
+
+    with pytest.raises(KeyError, match="NOPE/USDT:USDT, OTHER/USDT:USDT"):
+        read_frame(path, columns=columns)
@@ -0,0 +1,174 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import live
+from data import ccxt_data
+from data.candle_store import CandleStore
+from registry import PairRegistry
+from signals import replay
+
+MINUTE = 60_000
+STEP = 15 * MINUTE
+T0 = 1_700_000_000_000 // STEP * STEP
+WINDOW = 20
+
+
+def _closes() -> dict[str, np.ndarray]:
+    rng = np.random.default_rng(7)
+    base = 100 + np.cumsum(rng.normal(size=80))
+    closes = {
+        "AAA": base,
+        "BBB": base + rng.normal(scale=0.3, size=80),
+        "CCC": base + rng.normal(scale=0.3, size=80),
+    }
+    # Salto del spread AAA - BBB en la última vela cerrada de la primera ronda
+    closes["BBB"][59] -= 5
+    return closes
+
+
+class FakeExchange:
+    # Velas de 15m hasta el reloj simulado con la vela en curso incluida: su
+    # cierre es disparatado y cambia en cada petición
+    rateLimit = 1
+
+    def __init__(self, clock, closes: dict[str, np.ndarray]):
+        self.clock = clock
+        self.closes = closes
+        self.calls = 0
+
+    def fetch_ohlcv(self, symbol, timeframe, since, limit):
+        self.calls += 1
+        first = -(-(since - T0) // STEP)
+        candles = []
+        for k in range(first, (self.clock.now_ms - T0) // STEP + 1)[:limit]:
+            close = float(self.closes[symbol][k])
+            if T0 + (k + 1) * STEP > self.clock.now_ms:
+                close *= 1.5 + self.calls / 100
+            candles.append([T0 + k * STEP, close, close, close, close, 1.0])
+        return candles
+
+
+class StubDispatcher:
+    def __init__(self):
+        self.batches: list[list[tuple[str, str, str]]] = []
+
+    def send_many(self, signals):
+        self.batches.append(list(signals))
+        return []
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now_ms=T0)
+
+    class FrozenDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime.fromtimestamp(clock.now_ms / 1000, tz)
+
+    monkeypatch.setattr(live, "datetime", FrozenDatetime)
+    monkeypatch.setattr(
+        ccxt_data, "time", SimpleNamespace(time=lambda: clock.now_ms / 1000)
+    )
+    return clock
+
+
+@pytest.fixture
+def round_env(tmp_path, monkeypatch, clock):
+    closes = _closes()
+    exchange = FakeExchange(clock, closes)
+    monkeypatch.setattr(ccxt_data, "get_exchange", lambda: exchange)
+
+    # Descargas por símbolo en cada ronda
+    fetched: list[str] = []
+    fetch_range = ccxt_data.fetch_ohlcv_range
+
+    def counting_fetch(symbol, **kwargs):
+        fetched.append(symbol)
+        return fetch_range(symbol, **kwargs)
+
+    monkeypatch.setattr(ccxt_data, "fetch_ohlcv_range", counting_fetch)
+
+    config = tmp_path / "pairs.toml"
+    config.write_text(
+        'timeframe = 15\nurl_bot = "http://127.0.0.1:9"\n'
+        'uuid_long = "long"\nuuid_short = "short"\n'
+        + "".join(
+            f'\n[[pairs]]\ns1 = "{s1}"\ns2 = "{s2}"\ns1_gainium = "{s1}_G"\n'
+            f's2_gainium = "{s2}_G"\nwindow = {WINDOW}\nzscore = 1.5\n'
+            for s1, s2 in [("AAA", "BBB"), ("AAA", "CCC")]
+        )
+    )
+    pairs_registry = PairRegistry(config)
+    # El primer par llega con un largo abierto
+    pairs_registry.state(pairs_registry.pairs[0]).position = 1
+
+    store = CandleStore(tmp_path / "candles.sqlite")
+    yield SimpleNamespace(
+        clock=clock,
+        closes=closes,
+        fetched=fetched,
+        registry=pairs_registry,
+        store=store,
+        trackers={},
+        dispatcher=StubDispatcher(),
+    )
+    store.close()
+
+
+def _run(env, now_ms: int):
+    env.clock.now_ms = now_ms
+    env.fetched.clear()
+    env.dispatcher.batches.clear()
+    live.run_round(env.registry, env.trackers, env.store, env.dispatcher)
+
+
+def _expected_zscore(env, s1: str, s2: str, last_bar: int) -> float:
+    closes = env.closes
+    return replay(closes[s1][: last_bar + 1], closes[s2][: last_bar + 1], WINDOW, 1.5)[
+        "zscore"
+    ].iloc[-1]
+
+
+def test_live_round(round_env):
+    env = round_env
+    key = ("AAA", "BBB")
+
+    # Ronda 1: 5 minutos dentro de la vela 60, aún abierta
+    _run(env, T0 + 60 * STEP + 5 * MINUTE)
+
+    # AAA lo comparten los dos pares y se descarga una sola vez
+    assert sorted(env.fetched) == ["AAA", "BBB", "CCC"]
+    tracker = env.trackers[key]
+    assert tracker.last_ts.value // 10**6 == T0 + 59 * STEP
+    assert tracker.zscore == pytest.approx(_expected_zscore(env, *key, 59), rel=1e-9)
+    assert tracker.zscore > 1.5
+
+    # El largo se cierra antes de abrir el corto, en lotes separados
+    closes, starts = env.dispatcher.batches
+    assert closes == [("closeDeal", "long", "AAA_G"), ("closeDeal", "short", "BBB_G")]
+    assert starts[:2] == [
+        ("startDeal", "short", "AAA_G"),
+        ("startDeal", "long", "BBB_G"),
+    ]
+    assert {action for action, _, _ in starts} == {"startDeal"}
+    assert env.registry.state(env.registry.pairs[0]).position == -1
+
+    # Ronda 2 en la misma vela: el cierre en curso cambia, pero no entra
+    zscore = tracker.zscore
+    _run(env, T0 + 60 * STEP + 10 * MINUTE)
+
+    assert sorted(env.fetched) == ["AAA", "BBB", "CCC"]
+    assert env.trackers[key] is tracker
+    assert tracker.last_ts.value // 10**6 == T0 + 59 * STEP
+    assert tracker.zscore == zscore
+    assert env.dispatcher.batches == []
+
+    # Ronda 3: cierra la vela 60 y el tracker avanza exactamente una vela
+    _run(env, T0 + 61 * STEP + 1 * MINUTE)
+
+    assert tracker.last_ts.value // 10**6 == T0 + 60 * STEP
+    assert tracker.zscore == pytest.approx(_expected_zscore(env, *key, 60), rel=1e-9)
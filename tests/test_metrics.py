@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from metrics import StreamingMetrics, batch_metrics
+from signals import position_kernel
+
+BARS_PER_YEAR = 365 * 96
+
+
+@pytest.fixture
+def curve():
+    rng = np.random.default_rng(3)
+    # Z-score oscilante con ruido: decenas de operaciones de varias velas
+    bars = np.arange(1_500)
+    zscores = 2 * np.sin(bars / 15) + rng.normal(scale=0.3, size=len(bars))
+    positions = position_kernel(zscores, 1.0)
+    strategy_ret = rng.normal(scale=2e-3, size=len(zscores)) * (positions != 0)
+    strategy_ret[::50] = np.nan
+    return strategy_ret, positions
+
+
+@pytest.mark.parametrize("chunks", [[1_500], [1, 7, 300, 2, 900, 290], [1] * 1_500])
+def test_streaming_matches_batch(curve, chunks):
+    strategy_ret, positions = curve
+    expected = batch_metrics(strategy_ret, BARS_PER_YEAR, positions)
+
+    streaming = StreamingMetrics(BARS_PER_YEAR)
+    for stop, size in zip(np.cumsum(chunks), chunks):
+        streaming.update(
+            strategy_ret[stop - size : stop], positions[stop - size : stop]
+        )
+    result = streaming.result()
+
+    assert result.keys() == expected.keys()
+    assert expected["Trades"] > 10
+    for name, value in expected.items():
+        assert result[name] == pytest.approx(float(value), rel=1e-9), name
+
+
+def test_batch_metrics_over_a_grid(curve):
+    # Cada fila de una rejilla da lo mismo que su curva por separado
+    strategy_ret, positions = curve
+    grid_ret = np.stack([strategy_ret, -strategy_ret, np.zeros_like(strategy_ret)])
+    grid_pos = np.stack([positions, -positions, positions])
+
+    grid = batch_metrics(grid_ret, BARS_PER_YEAR, grid_pos)
+    for k in range(len(grid_ret)):
+        single = batch_metrics(grid_ret[k], BARS_PER_YEAR, grid_pos[k])
+        for name, value in single.items():
+            np.testing.assert_allclose(grid[name][k], value, rtol=1e-12, err_msg=name)
+
+
+def test_sharpe_is_cagr_over_volatility(curve):
+    strategy_ret, positions = curve
+    metrics = batch_metrics(strategy_ret, BARS_PER_YEAR, positions)
+
+    assert metrics["Sharpe Ratio"] == pytest.approx(
+        metrics["Annualized Return (%)"] / metrics["Annualized Volatility (%)"]
+    )
@@ -0,0 +1,188 @@
+import threading
+import time
+
+import numpy as np
+import optuna
+import pandas as pd
+import pytest
+
+import optimize
+from backtest import grid_backtest
+from cointegration import PairStatsCache, best_pair_index, cointegration_test
+from costs import CostModel
+from optimize import (
+    Objective,
+    _make_storage,
+    optimize_pairs,
+    run_grid_optimization,
+    run_optimization,
+    walk_forward_optimization,
+)
+from signals import replay
+from tests.helpers import loop_positions, synthetic_prices
+
+TRAIN, TEST = 600, 250
+WINDOWS, MULTS = [20, 35, 60], [1.0, 1.5, 2.0]
+
+
+@pytest.fixture(scope="module")
+def coint_result():
+    return cointegration_test(synthetic_prices(5, 1_500), engine="vectorized")
+
+
+@pytest.fixture(scope="module")
+def walk_forward():
+    prices = synthetic_prices(2, 2_000)
+    s1, s2 = prices.iloc[:, 0], prices.iloc[:, 1]
+    result = walk_forward_optimization(
+        s1, s2, TRAIN, TEST, WINDOWS, MULTS, max_workers=1
+    )
+    return s1, s2, result
+
+
+def test_threaded_optuna_matches_serial_objective(coint_result, tmp_path):
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    storage = str(tmp_path / "optuna.journal")
+    cache = PairStatsCache(maxsize=512)
+
+    run_optimization(
+        coint_result, cache, n_trials=40, n_jobs=4, storage=storage, study_name="t"
+    )
+
+    # Cada trial, evaluado en serie con una caché nueva, da el mismo valor
+    serial = Objective(coint_result, PairStatsCache())
+    study = optuna.load_study(study_name="t", storage=_make_storage(storage))
+    trials = study.get_trials()
+    assert len(trials) >= 40
+    for trial in trials:
+        fixed = optuna.trial.FixedTrial(trial.params)
+        if trial.state == optuna.trial.TrialState.PRUNED:
+            with pytest.raises(optuna.TrialPruned):
+                serial(fixed)
+        else:
+            assert serial(fixed) == trial.value
+
+    # El par y el spread se calculan una vez y cada ventana también
+    windows = {trial.params["window"] for trial in trials}
+    assert cache.stats()["misses"] == 2 + len(windows)
+    assert cache.stats()["hits"] == 3 * len(trials) - cache.stats()["misses"]
+
+
+def test_cache_computes_each_key_once_across_threads():
+    cache = PairStatsCache(maxsize=4)
+    calls = []
+    barrier = threading.Barrier(8)
+
+    def compute(key):
+        calls.append(key)
+        time.sleep(0.01)
+        return key * 10
+
+    def worker(n):
+        barrier.wait()
+        for k in range(n, n + 30):
+            key = k % 3
+            assert cache.get_or_compute(key, lambda key=key: compute(key)) == key * 10
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(calls) == [0, 1, 2]
+    assert cache.stats() == {"hits": 8 * 30 - 3, "misses": 3, "size": 3}
+
+
+def test_walk_forward_folds_are_contiguous(walk_forward):
+    s1, _, result = walk_forward
+    index = s1.index
+    starts = index.get_indexer(result.folds["test_start"])
+    ends = index.get_indexer(result.folds["test_end"])
+    train_starts = index.get_indexer(result.folds["train_start"])
+
+    # Cada train acaba justo antes de su test y los tests se suceden sin
+    # huecos ni solapes hasta la última vela
+    np.testing.assert_array_equal(starts - train_starts, TRAIN)
+    assert starts[0] == TRAIN
+    np.testing.assert_array_equal(starts[1:], ends[:-1] + 1)
+    assert (ends - starts + 1 <= TEST).all()
+    assert ends[-1] == len(index) - 1
+    assert len(result.returns) == len(index) - TRAIN
+    assert result.returns.index.equals(index[TRAIN:])
+
+
+def test_walk_forward_returns_are_stitched_folds(walk_forward):
+    s1, s2, result = walk_forward
+    ret_s1 = s1.pct_change().to_numpy()
+    ret_s2 = s2.pct_change().to_numpy()
+
+    # Referencia por fold con los parámetros elegidos: z-score rodante sobre
+    # todo el histórico, test que empieza sin posición y cierra en su última
+    # vela, y retorno con la posición de la vela anterior
+    expected = []
+    for fold in result.folds.itertuples():
+        start = s1.index.get_loc(fold.test_start)
+        end = s1.index.get_loc(fold.test_end) + 1
+        zscores = replay(s1, s2, int(fold.window), 1.0)["zscore"].to_numpy()
+        pos = loop_positions(zscores[start:end], fold.zscore_mult)
+        pos[-1] = 0.0
+        fold_ret = np.zeros(end - start)
+        fold_ret[1:] = pos[:-1] * (ret_s1[start + 1 : end] - ret_s2[start + 1 : end])
+        expected.append(fold_ret)
+
+        np.testing.assert_array_equal(
+            result.positions.iloc[start - TRAIN : end - TRAIN], pos
+        )
+
+    np.testing.assert_allclose(
+        result.returns.to_numpy(), np.concatenate(expected), rtol=1e-12, atol=1e-15
+    )
+    assert (result.positions != 0).any()
+
+
+def test_walk_forward_is_the_same_with_workers(walk_forward):
+    s1, s2, serial = walk_forward
+    assert optimize._shared_values is None
+
+    parallel = walk_forward_optimization(
+        s1, s2, TRAIN, TEST, WINDOWS, MULTS, max_workers=2
+    )
+
+    pd.testing.assert_frame_equal(parallel.folds, serial.folds)
+    pd.testing.assert_series_equal(parallel.returns, serial.returns)
+    pd.testing.assert_series_equal(parallel.positions, serial.positions)
+    assert parallel.metrics == serial.metrics
+
+
+@pytest.mark.parametrize("with_costs", [False, True], ids=["gross", "costs"])
+def test_optimize_pairs_is_the_same_with_workers(coint_result, with_costs):
+    costs = CostModel(slippage_bps=2) if with_costs else None
+
+    serial = optimize_pairs(coint_result, WINDOWS, MULTS, max_workers=1, costs=costs)
+    parallel = optimize_pairs(coint_result, WINDOWS, MULTS, max_workers=3, costs=costs)
+
+    assert len(serial) == len(coint_result.pairs) > 1
+    pd.testing.assert_frame_equal(parallel, serial)
+    assert optimize._shared_values is None
+
+    # Cada fila es la mejor celda de la rejilla de su par
+    df = coint_result.df
+    for row in serial.itertuples():
+        grid = grid_backtest(df[row.S1], df[row.S2], WINDOWS, MULTS, costs=costs)
+        best = grid.best()
+        assert (row.window, row.zscore_mult) == (best["window"], best["zscore_mult"])
+        assert serial.loc[row.Index, "Sharpe Ratio"] == best["Sharpe Ratio"]
+
+
+def test_grid_optimization_picks_the_best_cell(coint_result):
+    best_params, grid = run_grid_optimization(coint_result, WINDOWS, MULTS)
+
+    i, j = best_pair_index(coint_result)
+    df = coint_result.df
+    expected = grid_backtest(df.iloc[:, i], df.iloc[:, j], WINDOWS, MULTS)
+    sharpe = expected.metrics["Sharpe Ratio"]
+    a, b = np.unravel_index(np.nanargmax(sharpe), sharpe.shape)
+
+    assert best_params == {"window": WINDOWS[a], "zscore_mult": MULTS[b]}
+    pd.testing.assert_frame_equal(grid.to_frame(), expected.to_frame())
@@ -0,0 +1,135 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest import replay_backtest
+from costs import CostModel
+from hedge import SpreadModel
+from portfolio import PortfolioPair, _limit_deals, portfolio_backtest
+from tests.helpers import synthetic_prices
+
+
+@pytest.fixture(scope="module")
+def universe() -> pd.DataFrame:
+    return synthetic_prices(6, 3_000)
+
+
+def _pairs(columns: list[str]) -> list[PortfolioPair]:
+    return [
+        PortfolioPair(columns[0], columns[1], 30, 1.5),
+        PortfolioPair(columns[2], columns[3], 50, 1.0),
+        PortfolioPair(
+            columns[1], columns[4], 20, 2.0, SpreadModel("rolling_ols", window=300)
+        ),
+        PortfolioPair(columns[3], columns[5], 40, 1.2),
+    ]
+
+
+@pytest.mark.parametrize("with_costs", [False, True], ids=["gross", "costs"])
+@pytest.mark.parametrize("k", range(4))
+def test_single_pair_matches_replay_backtest(universe, k, with_costs):
+    pair = _pairs(list(universe.columns))[k]
+    costs = None
+    if with_costs:
+        funding = pd.Series(
+            1e-4, index=pd.date_range(universe.index[0], periods=40, freq="8h")
+        )
+        costs = CostModel(slippage_bps=2, funding_rates={pair.s1: funding})
+
+    result = portfolio_backtest(universe, [pair], costs=costs)
+    expected = replay_backtest(
+        universe[pair.s1],
+        universe[pair.s2],
+        pair.window,
+        pair.zscore_mult,
+        pair.spread,
+        costs=costs,
+    )
+
+    # El backtest del par empieza en el primer z-score; antes no hay posición
+    first = len(universe) - len(expected)
+    assert (result.positions[0, :first] == 0).all()
+    np.testing.assert_array_equal(
+        result.positions[0, first:], expected["position_s1"].to_numpy()
+    )
+    assert (result.positions[0] != 0).any()
+    np.testing.assert_allclose(
+        result.returns[first + 1 :],
+        expected["strategy_ret"].to_numpy()[1:],
+        rtol=1e-9,
+        atol=1e-12,
+    )
+    np.testing.assert_allclose(
+        result.equity.iloc[-1], expected["equity"].iloc[-1], rtol=1e-9
+    )
+
+
+def test_equal_allocation_averages_pairs(universe):
+    result = portfolio_backtest(
+        universe, _pairs(list(universe.columns)), max_cells=7_000
+    )
+
+    np.testing.assert_allclose(result.returns, result.pair_returns.mean(axis=0))
+
+
+def _reference_limit(desired: np.ndarray, max_deals: int) -> np.ndarray:
+    # Bucle vela a vela: primero se cierran los pares que cambian y luego se
+    # abren las entradas por orden mientras queden huecos
+    current = np.zeros(len(desired), dtype=desired.dtype)
+    previous = np.zeros_like(current)
+    accepted = np.zeros_like(desired)
+    for t in range(desired.shape[1]):
+        changed = desired[:, t] != previous
+        current[changed] = 0
+        for k in np.flatnonzero(changed & (desired[:, t] != 0)):
+            if np.count_nonzero(current) < max_deals:
+                current[k] = desired[k, t]
+        previous = desired[:, t]
+        accepted[:, t] = current
+    return accepted
+
+
+@pytest.mark.parametrize("max_deals", [1, 2, 3])
+def test_limit_deals_never_exceeds_slots(max_deals):
+    rng = np.random.default_rng(0)
+    desired = rng.choice([-1, 0, 0, 0, 1], size=(7, 400)).astype(np.int8)
+    desired = np.repeat(desired, 3, axis=1)
+
+    accepted = _limit_deals(desired, max_deals)
+
+    assert (np.count_nonzero(accepted, axis=0) <= max_deals).all()
+    assert (np.count_nonzero(accepted, axis=0) == max_deals).any()
+    # Solo se aceptan posiciones deseadas
+    assert ((accepted == 0) | (accepted == desired)).all()
+    np.testing.assert_array_equal(accepted, _reference_limit(desired, max_deals))
+
+
+def test_max_deals_allocation(universe):
+    pairs = _pairs(list(universe.columns))
+
+    result = portfolio_backtest(universe, pairs, allocation="max_deals", max_deals=2)
+    free = portfolio_backtest(universe, pairs)
+
+    open_deals = result.to_frame()["open_deals"]
+    assert open_deals.max() == 2
+    assert (np.count_nonzero(free.positions, axis=0) > 2).any()
+    # Cada deal abierto usa 1/max_deals del capital
+    np.testing.assert_allclose(result.exposure, open_deals / 2)
+
+
+@pytest.mark.parametrize("max_leverage", [0.5, 1.0])
+def test_vol_target_respects_leverage_cap(universe, max_leverage):
+    pairs = _pairs(list(universe.columns))
+
+    # Un objetivo de volatilidad alto pide más apalancamiento del disponible
+    result = portfolio_backtest(
+        universe,
+        pairs,
+        allocation="vol_target",
+        target_vol=50.0,
+        vol_window=200,
+        max_leverage=max_leverage,
+    )
+
+    assert result.exposure.max() <= max_leverage + 1e-12
+    assert result.exposure.max() > 0.9 * max_leverage
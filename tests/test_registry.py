@@ -0,0 +1,137 @@
+import json
+import os
+
+import pytest
+
+import registry
+from hedge import SpreadModel
+from live import refresh_trackers
+from registry import PairRegistry
+
+HEADER = (
+    'timeframe = 15\nurl_bot = "http://127.0.0.1:9"\n'
+    'uuid_long = "long"\nuuid_short = "short"\n'
+)
+
+
+def _pair(s1: str, s2: str, window: int = 20, extra: str = "") -> str:
+    return (
+        f'\n[[pairs]]\ns1 = "{s1}"\ns2 = "{s2}"\ns1_gainium = "{s1}_G"\n'
+        f's2_gainium = "{s2}_G"\nwindow = {window}\nzscore = 1.5\n{extra}'
+    )
+
+
+def _write(path, text: str, mtime_ns: int):
+    # mtime explícito: dos escrituras seguidas pueden compartir mtime
+    path.write_text(text)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+@pytest.fixture
+def config(tmp_path):
+    path = tmp_path / "pairs.toml"
+    _write(path, HEADER + _pair("A", "B") + _pair("C", "D"), 1_000_000_000)
+    return path
+
+
+def test_positions_survive_a_restart(config):
+    first = PairRegistry(config)
+    first.state(first.pairs[0]).position = 1
+    first.state(first.pairs[1]).position = -1
+    first.save_state()
+
+    second = PairRegistry(config)
+
+    assert second.state(second.pairs[0]).position == 1
+    assert second.state(second.pairs[1]).position == -1
+    assert second.states == first.states
+
+
+def test_failed_save_keeps_previous_state(config, monkeypatch):
+    pairs_registry = PairRegistry(config)
+    pairs_registry.state(pairs_registry.pairs[0]).position = 1
+    pairs_registry.save_state()
+    saved = pairs_registry.state_path.read_text()
+
+    def broken_dump(data, f, **kwargs):
+        f.write('{"A|B": ')
+        raise OSError("disco lleno")
+
+    pairs_registry.state(pairs_registry.pairs[0]).position = -1
+    monkeypatch.setattr(registry.json, "dump", broken_dump)
+    with pytest.raises(OSError):
+        pairs_registry.save_state()
+
+    # El fichero anterior sigue entero y no queda ningún temporal
+    assert pairs_registry.state_path.read_text() == saved
+    assert json.loads(saved) == {
+        "A|B": {"s1_long": True, "s1_short": False, "s2_long": False, "s2_short": True}
+    }
+    assert [p.name for p in config.parent.iterdir() if p.suffix == ".tmp"] == []
+
+
+def test_save_replaces_the_file_atomically(config, monkeypatch):
+    pairs_registry = PairRegistry(config)
+    replaced = []
+    real_replace = os.replace
+    monkeypatch.setattr(
+        registry.os,
+        "replace",
+        lambda src, dst: replaced.append((src, dst)) or real_replace(src, dst),
+    )
+
+    pairs_registry.save_state()
+
+    ((src, dst),) = replaced
+    assert os.path.dirname(src) == str(config.parent)
+    assert dst == pairs_registry.state_path
+    assert not os.path.exists(src)
+
+
+def test_invalid_config_keeps_previous_and_is_read_once(config, capsys):
+    pairs_registry = PairRegistry(config)
+    previous = pairs_registry.config
+
+    _write(config, HEADER + "[[pairs]\n", 2_000_000_000)
+    assert not pairs_registry.reload_if_changed()
+    assert pairs_registry.config is previous
+    assert "Configuración inválida" in capsys.readouterr().out
+
+    # El mismo fichero roto no se vuelve a leer en las rondas siguientes
+    assert not pairs_registry.reload_if_changed()
+    assert capsys.readouterr().out == ""
+
+    _write(config, HEADER + _pair("A", "B", window=30), 3_000_000_000)
+    assert pairs_registry.reload_if_changed()
+    assert [pair.window for pair in pairs_registry.pairs] == [30]
+
+
+def test_reload_rebuilds_only_changed_trackers(config):
+    pairs_registry = PairRegistry(config)
+    trackers = {}
+    refresh_trackers(pairs_registry.pairs, trackers)
+    ab, cd = trackers[("A", "B")], trackers[("C", "D")]
+
+    _write(
+        config,
+        HEADER
+        + _pair("A", "B")
+        + _pair("C", "D", extra='spread = { method = "kalman", window = 50 }\n')
+        + _pair("E", "F"),
+        2_000_000_000,
+    )
+    assert pairs_registry.reload_if_changed()
+    refresh_trackers(pairs_registry.pairs, trackers)
+
+    assert trackers[("A", "B")] is ab
+    assert trackers[("C", "D")] is not cd
+    assert trackers[("C", "D")].model == SpreadModel("kalman", window=50)
+    assert set(trackers) == {("A", "B"), ("C", "D"), ("E", "F")}
+
+    _write(config, HEADER + _pair("A", "B", window=40), 3_000_000_000)
+    assert pairs_registry.reload_if_changed()
+    refresh_trackers(pairs_registry.pairs, trackers)
+
+    assert set(trackers) == {("A", "B")}
+    assert trackers[("A", "B")] is not ab
+    assert trackers[("A", "B")].rolling.window == 40
@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from hedge import SpreadModel
+from signals import RollingZScore, position_kernel, replay, rolling_zscores
+from tests.helpers import loop_positions
+
+WINDOW = 20
+
+
+def _track(values: np.ndarray, window: int) -> pd.DataFrame:
+    rolling = RollingZScore(window)
+    rows = []
+    for value in values:
+        zscore = rolling.update(float(value))
+        rows.append((rolling.mean, rolling.std, zscore))
+    return pd.DataFrame(rows, columns=["mean", "std", "zscore"])
+
+
+def test_rolling_zscore_matches_pandas():
+    rng = np.random.default_rng(0)
+    # Varias vueltas del buffer sobre un nivel alto y con saltos
+    values = 1_000 + np.cumsum(rng.normal(size=7 * WINDOW + 3))
+    values[3 * WINDOW :] += 500
+    series = pd.Series(values)
+
+    tracked = _track(values, WINDOW)
+    mean = series.rolling(WINDOW).mean()
+    std = series.rolling(WINDOW).std()
+
+    full = slice(WINDOW - 1, None)
+    np.testing.assert_allclose(tracked["mean"][full], mean[full], rtol=1e-12)
+    np.testing.assert_allclose(tracked["std"][full], std[full], rtol=1e-9)
+    np.testing.assert_allclose(
+        tracked["zscore"], (series - mean) / std, rtol=1e-8, atol=1e-10
+    )
+
+
+def test_rolling_zscore_warmup():
+    values = np.random.default_rng(1).normal(size=WINDOW)
+    series = pd.Series(values)
+
+    tracked = _track(values, WINDOW)
+
+    # Hasta llenar la ventana no hay z-score, como rolling(window) en pandas;
+    # la media y la desviación son las de las velas vistas hasta entonces
+    assert tracked["zscore"][: WINDOW - 1].isna().all()
+    assert np.isfinite(tracked["zscore"].iloc[-1])
+    np.testing.assert_allclose(tracked["mean"], series.expanding().mean(), rtol=1e-12)
+    np.testing.assert_allclose(
+        tracked["std"][1:], series.expanding().std()[1:], rtol=1e-12
+    )
+
+
+def test_rolling_zscore_recomputes_on_wrap():
+    # Un tramo de gran magnitud deja error de redondeo en las actualizaciones
+    # O(1); al cerrar cada vuelta los momentos salen exactos del buffer
+    values = np.concatenate([np.full(WINDOW, 1e9), np.arange(3 * WINDOW) % 7])
+    rolling = RollingZScore(WINDOW)
+    for t, value in enumerate(values, start=1):
+        rolling.update(float(value))
+        if t % WINDOW == 0:
+            last = values[t - WINDOW : t]
+            np.testing.assert_allclose(rolling.mean, last.mean(), rtol=1e-14)
+            np.testing.assert_allclose(rolling.std, last.std(ddof=1), rtol=1e-14)
+
+
+def test_position_kernel_matches_loop(prices):
+    spread = prices.iloc[:, 0].to_numpy() - prices.iloc[:, 1].to_numpy()
+    zscores = np.concatenate(
+        [
+            rolling_zscores(spread, np.array([WINDOW]))[0],
+            np.random.default_rng(2).normal(scale=1.5, size=2_000),
+        ]
+    )
+    # Z-scores nulos exactos y NaN sueltos (no cambian la posición)
+    zscores[::97] = 0.0
+    zscores[::131] = np.nan
+    mults = np.array([0.5, 1.0, 1.6, 2.5])
+
+    batched = position_kernel(zscores, mults)
+    for k, mult in enumerate(mults):
+        expected = loop_positions(zscores, mult)
+        np.testing.assert_array_equal(position_kernel(zscores, mult), expected)
+        np.testing.assert_array_equal(batched[k], expected)
+
+
+@pytest.mark.parametrize(
+    "model",
+    [
+        None,
+        SpreadModel("rolling_ols", window=150),
+        SpreadModel("kalman", window=100),
+    ],
+    ids=["diff", "rolling_ols", "kalman"],
+)
+def test_fast_replay_matches_exact(prices, model):
+    s1, s2 = prices.iloc[:, 0], prices.iloc[:, 1]
+
+    fast = replay(s1, s2, WINDOW, 1.0, model, mode="fast")
+    exact = replay(s1, s2, WINDOW, 1.0, model, mode="exact")
+
+    pd.testing.assert_index_equal(fast.index, exact.index)
+    # Solo difieren por redondeo; las posiciones son idénticas
+    for column in ["spread", "hedge_ratio", "zscore"]:
+        np.testing.assert_allclose(fast[column], exact[column], atol=1e-9)
+    np.testing.assert_array_equal(fast["position"], exact["position"])
+    assert (fast["position"] != 0).any()
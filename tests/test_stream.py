@@ -0,0 +1,119 @@
+import asyncio
+
+import ccxt
+import numpy as np
+import pytest
+
+import live
+from data.stream import FakeCandleFeed, FeedExhausted, watch_closed_candles
+from registry import PairRegistry
+from signals import replay
+
+STEP = 15 * 60_000
+
+
+def _candles(closes: np.ndarray) -> list[list[float]]:
+    return [
+        [k * STEP, close - 0.5, close + 1.0, close - 1.0, close, 10.0 + k]
+        for k, close in enumerate(closes.tolist())
+    ]
+
+
+def _collect(feed, symbol: str) -> list[list[float]]:
+    async def run():
+        return [candle async for candle in watch_closed_candles(feed, symbol, "15m")]
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("snapshot", [1, 5])
+@pytest.mark.parametrize("updates", [1, 3])
+def test_closed_candles_with_new_updates(snapshot, updates):
+    candles = _candles(100 + np.arange(12.0))
+    feed = FakeCandleFeed({"BTC": candles}, snapshot=snapshot, updates=updates)
+
+    # Cada vela sale una vez, completa, cuando llega la siguiente; la última
+    # sigue en curso al agotarse el feed
+    assert _collect(feed, "BTC") == candles[:-1]
+
+
+def test_fake_feed_only_returns_updated_candles():
+    candles = _candles(100 + np.arange(6.0))
+    feed = FakeCandleFeed({"BTC": candles}, snapshot=3, updates=2)
+
+    async def run():
+        return [await feed.watch_ohlcv("BTC", "15m") for _ in range(3)]
+
+    first, second, third = asyncio.run(run())
+    assert [c[0] for c in first] == [0, STEP, 2 * STEP]
+    assert first[-1][4] == first[-1][1]
+    assert second == [candles[2]]
+    assert third[0][0] == 3 * STEP and third[0][5] == 0.0
+
+
+def test_full_history_feed_still_works():
+    # Un feed que devuelve todo el histórico en cada llamada (newUpdates=False)
+    candles = _candles(100 + np.arange(8.0))
+
+    class HistoryFeed:
+        def __init__(self):
+            self.calls = 0
+
+        async def watch_ohlcv(self, symbol, timeframe="1m", since=None, limit=None):
+            self.calls += 1
+            if self.calls > len(candles):
+                raise FeedExhausted(symbol)
+            return candles[: self.calls]
+
+    assert _collect(HistoryFeed(), "BTC") == candles[:-1]
+
+
+def test_network_errors_are_retried():
+    candles = _candles(100 + np.arange(5.0))
+    fake = FakeCandleFeed({"BTC": candles})
+
+    class FlakyFeed:
+        calls = 0
+
+        async def watch_ohlcv(self, symbol, timeframe="1m", since=None, limit=None):
+            self.calls += 1
+            if self.calls % 2:
+                raise ccxt.NetworkError("conexión perdida")
+            return await fake.watch_ohlcv(symbol, timeframe, since, limit)
+
+    async def run():
+        stream = watch_closed_candles(FlakyFeed(), "BTC", "15m", retry_delay=0)
+        return [candle async for candle in stream]
+
+    assert asyncio.run(run()) == candles[:-1]
+
+
+def test_live_stream_evaluates_every_closed_bar(tmp_path, monkeypatch):
+    window, n_bars = 10, 60
+    rng = np.random.default_rng(4)
+    s1 = 100 + np.cumsum(rng.normal(size=n_bars))
+    s2 = s1 + rng.normal(scale=0.5, size=n_bars)
+    feed = FakeCandleFeed(
+        {"AAA": _candles(s1), "BBB": _candles(s2)}, snapshot=4, updates=2
+    )
+
+    config = tmp_path / "pairs.toml"
+    config.write_text(
+        'timeframe = 15\nurl_bot = "http://127.0.0.1:9"\n'
+        'uuid_long = "long"\nuuid_short = "short"\n\n'
+        '[[pairs]]\ns1 = "AAA"\ns2 = "BBB"\ns1_gainium = "AAA_USDT"\n'
+        f's2_gainium = "BBB_USDT"\nwindow = {window}\nzscore = 1.0\n'
+    )
+    zscores = []
+    monkeypatch.setattr(
+        live,
+        "apply_signals",
+        lambda pair, state, zscore, config: zscores.append(zscore) or [],
+    )
+
+    asyncio.run(live.live_stream_strategy(feed, PairRegistry(config)))
+
+    # Todas las velas cerradas (menos la última, aún abierta) llegan al par
+    expected = replay(s1[:-1], s2[:-1], window, 1.0, mode="exact")["zscore"]
+    np.testing.assert_allclose(zscores, expected.dropna(), rtol=1e-12)
+    assert len(zscores) == n_bars - window
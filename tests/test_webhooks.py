@@ -0,0 +1,189 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from strategy_utils import WebhookDispatcher
+
+
+class StubBot:
+    # Bot local: responde a cada símbolo con los códigos de `responses` en
+    # orden (200 cuando se agotan) y guarda las peticiones recibidas
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.responses: dict[str, list[int]] = {}
+        self.requests: list[dict] = []
+        self.lock = threading.Lock()
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                arrived = time.perf_counter()
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with stub.lock:
+                    codes = stub.responses.get(body["symbol"], [])
+                    status = codes.pop(0) if codes else 200
+                    stub.requests.append(
+                        {
+                            "body": body,
+                            "key": self.headers["Idempotency-Key"],
+                            "arrived": arrived,
+                        }
+                    )
+                time.sleep(stub.delay)
+                try:
+                    self.send_response(status)
+                    self.end_headers()
+                    self.wfile.write(b"stub")
+                except ConnectionError:
+                    # El cliente ya se ha ido por timeout
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/trade_signal"
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, args=(0.01,), daemon=True
+        )
+        self.thread.start()
+
+    def arrivals(self, symbol: str) -> list[float]:
+        return [r["arrived"] for r in self.requests if r["body"]["symbol"] == symbol]
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def bot():
+    bot = StubBot()
+    yield bot
+    bot.close()
+
+
+@pytest.fixture
+def dispatcher(bot):
+    dispatcher = WebhookDispatcher(bot.url, max_retries=3, backoff=0.05)
+    yield dispatcher
+    dispatcher.close()
+
+
+@pytest.mark.parametrize("status", [500, 503, 429])
+def test_retries_with_backoff(bot, dispatcher, status):
+    bot.responses["BTC_USDT"] = [status, status]
+
+    result = dispatcher.send("openDeal", "uuid", "BTC_USDT")
+
+    assert result.ok and result.status_code == 200
+    assert result.attempts == 3
+    first, second, third = bot.arrivals("BTC_USDT")
+    # Backoff exponencial: 0.05 s y luego 0.1 s
+    assert second - first >= 0.05
+    assert third - second >= 0.1
+
+
+def test_gives_up_after_max_retries(bot, dispatcher):
+    bot.responses["BTC_USDT"] = [502] * 10
+
+    result = dispatcher.send("openDeal", "uuid", "BTC_USDT")
+
+    assert not result.ok and result.status_code == 502
+    assert result.attempts == 4
+    assert len(bot.requests) == 4
+
+
+@pytest.mark.parametrize("status", [400, 401, 404, 422])
+def test_client_errors_are_not_retried(bot, dispatcher, status):
+    bot.responses["BTC_USDT"] = [status]
+
+    result = dispatcher.send("openDeal", "uuid", "BTC_USDT")
+
+    assert not result.ok and result.status_code == status
+    assert result.attempts == 1
+    assert len(bot.requests) == 1
+
+
+def test_idempotency_key_is_kept_across_retries(bot, dispatcher):
+    bot.responses["BTC_USDT"] = [503, 429]
+    bot.responses["ETH_USDT"] = [500]
+
+    first = dispatcher.send("openDeal", "uuid", "BTC_USDT")
+    dispatcher.send("openDeal", "uuid", "ETH_USDT", idempotency_key="k-1")
+
+    keys = [r["key"] for r in bot.requests]
+    assert keys == [first.idempotency_key] * 3 + ["k-1"] * 2
+    assert first.idempotency_key != "k-1"
+    assert bot.requests[0]["body"] == {
+        "action": "openDeal",
+        "uuid": "uuid",
+        "symbol": "BTC_USDT",
+    }
+
+
+def test_legs_are_sent_in_parallel(bot, dispatcher):
+    bot.delay = 0.3
+    signals = [("closeDeal", "long", "BTC_USDT"), ("closeDeal", "short", "ETH_USDT")]
+
+    start = time.perf_counter()
+    results = dispatcher.send_many(signals)
+    elapsed = time.perf_counter() - start
+
+    assert [(r.action, r.symbol, r.ok) for r in results] == [
+        ("closeDeal", "BTC_USDT", True),
+        ("closeDeal", "ETH_USDT", True),
+    ]
+    # Las dos peticiones llegan antes de que termine la primera respuesta
+    (btc,), (eth,) = bot.arrivals("BTC_USDT"), bot.arrivals("ETH_USDT")
+    assert abs(btc - eth) < bot.delay
+    assert elapsed < 2 * bot.delay
+
+
+def test_stats(bot, dispatcher):
+    assert dispatcher.stats() == {"sent": 0, "failed": 0}
+
+    bot.responses["BAD_USDT"] = [404]
+    results = [dispatcher.send("openDeal", "uuid", f"S{k}_USDT") for k in range(19)]
+    results.append(dispatcher.send("openDeal", "uuid", "BAD_USDT"))
+    stats = dispatcher.stats()
+
+    latencies = sorted(r.latency_ms for r in results)
+    assert stats["sent"] == 20 and stats["failed"] == 1
+    assert stats["p50_ms"] == pytest.approx((latencies[9] + latencies[10]) / 2)
+    assert stats["p95_ms"] == latencies[18]
+    assert stats["max_ms"] == latencies[-1]
+
+
+def test_opening_is_not_retried_after_read_timeout(bot):
+    bot.delay = 0.2
+    dispatcher = WebhookDispatcher(bot.url, timeout=0.05, max_retries=2, backoff=0)
+    try:
+        opening = dispatcher.send("startDeal", "uuid", "BTC_USDT")
+        closing = dispatcher.send("closeDeal", "uuid", "ETH_USDT")
+    finally:
+        dispatcher.close()
+
+    # La apertura pudo llegar al bot: reintentarla duplicaría el deal
+    assert not opening.ok and opening.attempts == 1
+    assert len(bot.arrivals("BTC_USDT")) == 1
+    assert not closing.ok and closing.attempts == 3
+    assert len(bot.arrivals("ETH_USDT")) == 3
+
+
+def test_opening_is_retried_on_connection_errors():
+    bot = StubBot()
+    url = bot.url
+    bot.close()
+    dispatcher = WebhookDispatcher(url, max_retries=2, backoff=0)
+    try:
+        result = dispatcher.send("startDeal", "uuid", "BTC_USDT")
+    finally:
+        dispatcher.close()
+
+    assert not result.ok and result.status_code is None
+    assert result.attempts == 3